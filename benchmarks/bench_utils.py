@@ -0,0 +1,38 @@
+from elasticsearch import AsyncElasticsearch
+from searcher.repository.elasticsearch_repository import ElasticsearchRepository
+from dotenv import load_dotenv
+import numpy as np
+import os
+
+# Helpers shared by the benchmarks, run them from the repository root with the same environment as the service.
+
+
+def create_es_client(**kwargs) -> AsyncElasticsearch:
+  load_dotenv()
+  return AsyncElasticsearch(
+    os.environ.get('ELASTIC_HOST', 'https://localhost:9200'),
+    basic_auth=(os.environ.get('ELASTIC_USER', 'elastic'), os.environ.get('ELASTIC_PASSWORD', '')),
+    ca_certs=os.environ.get('ELASTIC_CA_PATH', 'certs/_data/ca/ca.crt'),
+    verify_certs=not bool(os.environ.get('ELASTIC_TLS_INSECURE', False)),
+    **kwargs,
+  )
+
+
+def create_repository(**kwargs) -> ElasticsearchRepository:
+  load_dotenv()
+  return ElasticsearchRepository(
+    os.environ.get('ELASTIC_HOST', 'https://localhost:9200'),
+    os.environ.get('ELASTIC_USER', 'elastic'),
+    os.environ.get('ELASTIC_PASSWORD', ''),
+    os.environ.get('ELASTIC_CA_PATH', 'certs/_data/ca/ca.crt'),
+    not bool(os.environ.get('ELASTIC_TLS_INSECURE', False)),
+    **kwargs,
+  )
+
+
+def latency_summary(seconds: list[float]) -> str:
+  ms = np.array(seconds) * 1000
+  return (
+    f"p50 {np.percentile(ms, 50):.1f}ms, p90 {np.percentile(ms, 90):.1f}ms, "
+    f"p99 {np.percentile(ms, 99):.1f}ms, mean {ms.mean():.1f}ms"
+  )
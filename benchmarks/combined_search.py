@@ -0,0 +1,90 @@
+from searcher.repository.elasticsearch_repository import COMBINED_SEARCH_MODES
+from searcher.dto.article_query import ArticleQuery
+from bench_utils import create_repository, latency_summary
+import argparse
+import asyncio
+import random
+import time
+
+# Compares the latency of the combined search modes of the ElasticsearchRepository against the 'articles' index:
+# 2 requests fused in the service ('client'), and the single-request 'linear' and 'rrf' modes.
+# The query vectors are embeddings of random indexed articles, so no embeddings model is needed.
+#
+# python benchmarks/combined_search.py [--requests 500] [--concurrency 8] [--queries-file queries.txt]
+
+DEFAULT_QUERIES = [
+  "election results", "climate change", "stock market", "football transfer", "interest rates",
+  "war in ukraine", "artificial intelligence", "energy prices", "heat wave", "central bank",
+]
+
+
+async def sample_embeddings(repo, count: int) -> list[list[float]]:
+  res = await repo.es.search(
+    index=repo.articles_index,
+    query={"function_score": {"query": {"exists": {"field": "analyzer.embeddings"}}, "random_score": {}}},
+    source_includes=["analyzer.embeddings"],
+    size=count,
+  )
+  return [h["_source"]["analyzer"]["embeddings"] for h in res["hits"]["hits"]]
+
+
+async def benchmark_mode(mode: str, queries: list[str], embeddings: list, args):
+  repo = create_repository(combined_search_mode=mode)
+  try:
+    rng = random.Random(42)
+    requests = [
+      ArticleQuery(query=rng.choice(queries), search_type="combined", page_size=args.page_size)
+      for _ in range(args.requests)
+    ]
+    vectors = [rng.choice(embeddings) for _ in requests]
+
+    for q, v in zip(requests[:20], vectors[:20]):
+      await repo.search_articles_combined(q, v)
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run(q, v):
+      async with semaphore:
+        start = time.perf_counter()
+        await repo.search_articles_combined(q, v)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(q, v) for q, v in zip(requests, vectors)))
+    elapsed = time.perf_counter() - start
+
+    fallback = " (fell back to 'client', not supported by the cluster)" if repo.combined_search_fallback else ""
+    print(f"--- {mode}{fallback}")
+    print(f"{latency_summary(latencies)}, {len(requests) / elapsed:.0f} requests/s")
+  finally:
+    await repo.close()
+
+
+async def main():
+  parser = argparse.ArgumentParser(description="Benchmark the combined search modes.")
+  parser.add_argument("--requests", type=int, default=500)
+  parser.add_argument("--concurrency", type=int, default=1)
+  parser.add_argument("--page-size", type=int, default=10)
+  parser.add_argument("--modes", default=",".join(COMBINED_SEARCH_MODES))
+  parser.add_argument("--queries-file", help="one query per line")
+  args = parser.parse_args()
+
+  queries = DEFAULT_QUERIES
+  if args.queries_file is not None:
+    with open(args.queries_file) as f:
+      queries = [line.strip() for line in f if len(line.strip()) > 0]
+
+  repo = create_repository()
+  try:
+    embeddings = await sample_embeddings(repo, 200)
+  finally:
+    await repo.close()
+
+  print(f"{args.requests} combined searches, concurrency {args.concurrency}, page size {args.page_size}")
+  for mode in args.modes.split(","):
+    await benchmark_mode(mode, queries, embeddings, args)
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,122 @@
+import multiprocessing as mp
+import numpy as np
+import argparse
+import time
+import sys
+import os
+
+# Compares the embeddings backends: load time, encode latency, resident memory and
+# cosine agreement with the torch backend. Every backend runs in a fresh process,
+# so the memory numbers only contain what the backend itself loads.
+#
+# python benchmarks/embeddings_backends.py --container model.pkl --onnx-dir model_onnx
+
+SAMPLE_DOCS = [
+  "election results in the capital",
+  "central bank raises interest rates again",
+  "storm causes flooding along the coast",
+  "new smartphone release date announced",
+  "football club signs young striker",
+  "scientists discover water on distant exoplanet",
+  "government announces new climate policy",
+  "stock markets fall after inflation report",
+  "wildfires spread across the region",
+  "parliament votes on the budget",
+  "vaccine trial shows promising results",
+  "tech company lays off thousands of workers",
+  "peace talks resume between the two countries",
+  "olympic committee picks host city",
+  "record heatwave hits europe",
+  "court rules on data privacy case",
+]
+
+
+def rss_mb() -> float:
+  with open("/proc/self/status") as f:
+    for line in f:
+      if line.startswith("VmRSS:"):
+        return int(line.split()[1]) / 1024
+  return 0.0
+
+
+def run_backend(backend: str, path: str, threads: int, batch_sizes: list[int], repeat: int, results):
+  from searcher.embeddings import load_embeddings_model
+
+  rss_before = rss_mb()
+  start = time.perf_counter()
+  em = load_embeddings_model(path, backend=backend, threads=threads)
+  load_seconds = time.perf_counter() - start
+  rss_loaded = rss_mb()
+
+  # first inference is slower, don't measure it
+  em.encode(SAMPLE_DOCS[:2])
+
+  latencies = {}
+  for batch_size in batch_sizes:
+    docs = (SAMPLE_DOCS * (batch_size // len(SAMPLE_DOCS) + 1))[:batch_size]
+    samples = []
+    for _ in range(repeat):
+      start = time.perf_counter()
+      em.encode(docs)
+      samples.append(time.perf_counter() - start)
+    latencies[batch_size] = (np.percentile(samples, 50) * 1000, np.percentile(samples, 95) * 1000)
+
+  results.put({
+    "backend": backend,
+    "load_seconds": load_seconds,
+    "rss_before_mb": rss_before,
+    "rss_loaded_mb": rss_loaded,
+    "rss_after_mb": rss_mb(),
+    "torch_imported": "torch" in sys.modules,
+    "latencies": latencies,
+    "embeddings": np.asarray(em.encode(SAMPLE_DOCS), dtype=np.float32),
+  })
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+  a = a / np.linalg.norm(a, axis=1, keepdims=True)
+  b = b / np.linalg.norm(b, axis=1, keepdims=True)
+  return (a * b).sum(axis=1)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the embeddings backends.")
+  parser.add_argument("--container", required=True, help="pickled EmbeddingsModelContainer, used by the 'torch' backend")
+  parser.add_argument("--onnx-dir", help="directory exported with 'python -m searcher.embeddings.export onnx'")
+  parser.add_argument("--threads", type=int, default=0)
+  parser.add_argument("--batch-sizes", default="1,8,32")
+  parser.add_argument("--repeat", type=int, default=20)
+  args = parser.parse_args()
+
+  backends = [("torch", args.container)]
+  if args.onnx_dir is not None:
+    backends.append(("onnx", args.onnx_dir))
+    if os.path.exists(os.path.join(args.onnx_dir, "model_int8.onnx")):
+      backends.append(("onnx-int8", args.onnx_dir))
+
+  batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+  ctx = mp.get_context("spawn")
+  reports = []
+  for backend, path in backends:
+    results = ctx.Queue()
+    p = ctx.Process(target=run_backend, args=(backend, path, args.threads, batch_sizes, args.repeat, results))
+    p.start()
+    reports.append(results.get())
+    p.join()
+
+  reference = reports[0]["embeddings"]
+  for r in reports:
+    agreement = cosine(reference, r["embeddings"])
+    print(f"--- {r['backend']}")
+    print(f"load: {r['load_seconds']:.2f}s, torch imported: {r['torch_imported']}")
+    print(
+      f"rss: {r['rss_before_mb']:.0f}MB before load, {r['rss_loaded_mb']:.0f}MB loaded, "
+      f"{r['rss_after_mb']:.0f}MB after encoding"
+    )
+    for batch_size, (p50, p95) in r["latencies"].items():
+      print(f"batch {batch_size}: p50 {p50:.1f}ms, p95 {p95:.1f}ms")
+    print(f"cosine vs torch: mean {agreement.mean():.5f}, min {agreement.min():.5f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,75 @@
+import multiprocessing as mp
+import argparse
+import time
+
+# Compares the startup cost of the pickled EmbeddingsModelContainer with the container directory format:
+# time to load, time to the first encoded query, and how much of the resident memory is
+# private (anonymous) vs file-backed, which is shared through the page cache between processes.
+#
+# python benchmarks/embeddings_container_load.py --pickle model.pkl --dir model_dir [--processes 4]
+
+
+def memory_mb() -> dict:
+  fields = {}
+  with open("/proc/self/status") as f:
+    for line in f:
+      key, _, value = line.partition(":")
+      if key in ("VmRSS", "RssAnon", "RssFile"):
+        fields[key] = int(value.split()[0]) / 1024
+  return fields
+
+
+def run_load(path: str, start_barrier, results):
+  start_barrier.wait()
+
+  start = time.perf_counter()
+  from searcher.embeddings import EmbeddingsModelContainer, EmbeddingsModel
+  em = EmbeddingsModel(EmbeddingsModelContainer.load(path))
+  load_seconds = time.perf_counter() - start
+
+  em.encode(["first query after startup"])
+  first_query_seconds = time.perf_counter() - start
+
+  results.put({
+    "load_seconds": load_seconds,
+    "first_query_seconds": first_query_seconds,
+    "memory": memory_mb(),
+  })
+
+
+def benchmark(name: str, path: str, processes: int):
+  ctx = mp.get_context("spawn")
+  results = ctx.Queue()
+  barrier = ctx.Barrier(processes)
+  workers = [ctx.Process(target=run_load, args=(path, barrier, results)) for _ in range(processes)]
+  for w in workers:
+    w.start()
+  reports = [results.get() for _ in workers]
+  for w in workers:
+    w.join()
+
+  n = len(reports)
+  load = sum(r["load_seconds"] for r in reports) / n
+  first_query = sum(r["first_query_seconds"] for r in reports) / n
+  rss = sum(r["memory"].get("VmRSS", 0) for r in reports) / n
+  anon = sum(r["memory"].get("RssAnon", 0) for r in reports) / n
+  file = sum(r["memory"].get("RssFile", 0) for r in reports) / n
+
+  print(f"--- {name}, {processes} concurrent process(es)")
+  print(f"load (with imports): {load:.2f}s, first query: {first_query:.2f}s")
+  print(f"rss per process: {rss:.0f}MB, private: {anon:.0f}MB, file-backed/shareable: {file:.0f}MB")
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark loading the embeddings model container formats.")
+  parser.add_argument("--pickle", required=True, help="pickled EmbeddingsModelContainer")
+  parser.add_argument("--dir", required=True, help="container directory, see 'python -m searcher.embeddings.export container'")
+  parser.add_argument("--processes", type=int, default=1, help="number of processes loading the model at the same time")
+  args = parser.parse_args()
+
+  benchmark("pickle", args.pickle, args.processes)
+  benchmark("container directory", args.dir, args.processes)
+
+
+if __name__ == "__main__":
+  main()
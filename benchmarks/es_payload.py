@@ -0,0 +1,113 @@
+from searcher.repository.elasticsearch_repository import article_source_options, ARTICLE_PROJECTIONS
+from searcher.repository.document_mapping import map_to_articles, filter_source, PARAGRAPHS_PREVIEW_FIELD, PARAGRAPHS_PREVIEW_COUNT
+from bench_utils import create_es_client
+import argparse
+import asyncio
+import random
+import json
+import time
+
+# Measures the bytes per hit of article searches, and the time to decode and map them, for every article projection.
+# By default the responses are built the way Elasticsearch builds them, from synthetic articles of the given length,
+# with --target the responses of a real cluster are measured (re-serialized, so without HTTP compression).
+#
+# python benchmarks/es_payload.py [--hits 40] [--paragraphs 30] [--paragraph-chars 600] [--target]
+
+RETURN_ATTRIBUTES = {
+  "every attribute": None,
+  "title, paragraphs": ["title", "paragraphs"],
+  "title, url": ["title", "url"],
+  "id": ["id"],
+}
+
+
+def synthetic_source(i: int, paragraphs: int, paragraph_chars: int) -> dict:
+  words = ["election", "market", "climate", "football", "science", "health", "policy", "energy"]
+
+  def text(chars: int) -> str:
+    return " ".join(random.choice(words) for _ in range(chars // 7))[:chars]
+
+  return {
+    "article": {
+      "id": f"article-{i}",
+      "url": f"https://news.example/{i}",
+      "source": "news.example",
+      "publish_date": "2024-03-01T12:00:00",
+      "image": f"https://news.example/{i}.jpg",
+      "author": ["author"],
+      "title": [text(80)],
+      "paragraphs": [text(paragraph_chars) for _ in range(paragraphs)],
+      "categories": {"ids": ["c1", "c2"], "names": ["politics", "economy"]},
+    },
+    "analyzer": {"category_ids": ["c1"]},
+    "topics": {"topic_ids": ["t1"], "topic_names": ["topic"]},
+  }
+
+
+def project(source: dict, options: dict) -> dict:
+  # what Elasticsearch returns for a hit with the search options
+  hit = {"_index": "articles", "_id": source["article"]["id"], "_score": 1.0}
+  if "script_fields" in options:
+    hit["fields"] = {PARAGRAPHS_PREVIEW_FIELD: source["article"]["paragraphs"][:PARAGRAPHS_PREVIEW_COUNT]}
+  if options.get("source", True) is not False:
+    projected = filter_source(source, options.get("source_includes", None))
+    for path in options.get("source_excludes", []):
+      keys = path.split(".")
+      parent = projected
+      for k in keys[:-1]:
+        parent = parent.get(k, {})
+      parent.pop(keys[-1], None)
+    hit["_source"] = projected
+  return hit
+
+
+def measure(body: bytes, hits: int, repeat: int) -> tuple[float, float]:
+  start = time.perf_counter()
+  for _ in range(repeat):
+    map_to_articles(json.loads(body)["hits"])
+  return len(body) / max(hits, 1), (time.perf_counter() - start) / repeat
+
+
+def synthetic_body(sources: list[dict], options: dict) -> bytes:
+  hits = [project(json.loads(json.dumps(s)), options) for s in sources]
+  return json.dumps({"took": 1, "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits}}).encode()
+
+
+async def cluster_body(es, size: int, options: dict) -> bytes:
+  res = await es.search(index="articles", query={"match_all": {}}, size=size, **options)
+  return json.dumps(res.body).encode()
+
+
+async def main():
+  parser = argparse.ArgumentParser(description="Measure the payload of the article projections.")
+  parser.add_argument("--hits", type=int, default=40)
+  parser.add_argument("--paragraphs", type=int, default=30)
+  parser.add_argument("--paragraph-chars", type=int, default=600)
+  parser.add_argument("--repeat", type=int, default=50)
+  parser.add_argument("--target", action="store_true", help="measure the responses of the configured cluster")
+  args = parser.parse_args()
+
+  es = create_es_client() if args.target else None
+  sources = [synthetic_source(i, args.paragraphs, args.paragraph_chars) for i in range(args.hits)]
+  try:
+    for name, return_attributes in RETURN_ATTRIBUTES.items():
+      print(f"--- {name}")
+      for projection in ARTICLE_PROJECTIONS:
+        options = article_source_options(return_attributes, projection)
+        if es is not None:
+          body = await cluster_body(es, args.hits, options)
+        else:
+          body = synthetic_body(sources, options)
+        hits = len(json.loads(body)["hits"]["hits"])
+        bytes_per_hit, seconds = measure(body, hits, args.repeat)
+        print(
+          f"{projection:>6}: {bytes_per_hit:8.0f} bytes/hit, {len(body) / 1024:7.1f}KiB per page, "
+          f"decode and map {seconds * 1000:6.2f}ms per page"
+        )
+  finally:
+    if es is not None:
+      await es.close()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
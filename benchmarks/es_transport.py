@@ -0,0 +1,163 @@
+from elasticsearch import AsyncElasticsearch, exceptions
+from elastic_transport import TransportError
+from searcher.repository.elasticsearch_options import TransportOptions
+from bench_utils import latency_summary
+from aiohttp import web
+import multiprocessing
+import argparse
+import asyncio
+import random
+import json
+import time
+
+# Compares the transport options of the Elasticsearch client: throughput, latency and errors of concurrent searches.
+# The searches go to a local Elasticsearch stand-in, which answers with a canned article page after a delay,
+# fails a share of the requests with 503, and answers a share of them slowly.
+# The stand-in runs in its own process, pass --target to use a real cluster instead (the failures are not injected then).
+#
+# python benchmarks/es_transport.py [--concurrency 64] [--requests 3000] [--latency-ms 5] [--fail-rate 0.02]
+
+SETTINGS = {
+  "default": TransportOptions(),
+  "connections_per_node=1": TransportOptions(connections_per_node=1),
+  "connections_per_node=4": TransportOptions(connections_per_node=4),
+  "connections_per_node=32": TransportOptions(connections_per_node=32),
+  "connections_per_node=64": TransportOptions(connections_per_node=64),
+  "http_compress": TransportOptions(connections_per_node=32, http_compress=True),
+  "httpxasync": TransportOptions(connections_per_node=32, node_class="httpxasync"),
+  "no-retries": TransportOptions(connections_per_node=32, max_retries=0),
+  "retries=3": TransportOptions(connections_per_node=32, max_retries=3, retry_on_status=[503]),
+  "request_timeout=0.1s": TransportOptions(connections_per_node=32, request_timeout=0.1),
+  "request_timeout=0.1s+retry_on_timeout": TransportOptions(connections_per_node=32, request_timeout=0.1, retry_on_timeout=True),
+  "connections_per_node=4+connect_timeout=0.05s": TransportOptions(connections_per_node=4, connect_timeout=0.05),
+}
+
+
+def article_page(size: int) -> bytes:
+  hits = [{
+    "_index": "articles",
+    "_id": f"article-{i}",
+    "_score": 1.0,
+    "_source": {
+      "article": {
+        "title": [f"title of article {i}"],
+        "paragraphs": [f"paragraph {p} of article {i} " * 20 for p in range(3)],
+        "source": "source",
+        "publish_date": "2024-03-01T12:00:00",
+      },
+    },
+    "sort": [1709294400000, 1.0],
+  } for i in range(size)]
+  return json.dumps({
+    "took": 1,
+    "timed_out": False,
+    "hits": {"total": {"value": 10000, "relation": "gte"}, "hits": hits},
+  }).encode()
+
+
+def run_stand_in(port: int, latency: float, fail_rate: float, slow_rate: float, slow_latency: float, page_size: int):
+  body = article_page(page_size)
+  headers = {"X-Elastic-Product": "Elasticsearch", "Content-Type": "application/json"}
+
+  async def info(request: web.Request) -> web.Response:
+    return web.Response(body=b'{"version": {"number": "8.12.2"}}', headers=headers)
+
+  async def search(request: web.Request) -> web.Response:
+    await request.read()
+    r = random.random()
+    if r < fail_rate:
+      return web.Response(status=503, body=b'{"error": "unavailable"}', headers=headers)
+    await asyncio.sleep(slow_latency if r < fail_rate + slow_rate else latency)
+    # like Elasticsearch with 'http.compression', only if the client accepts it
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+      response = web.Response(body=body, headers=headers)
+      response.enable_compression(web.ContentCoding.gzip)
+      return response
+    return web.Response(body=body, headers=headers)
+
+  app = web.Application()
+  app.router.add_route("HEAD", "/", info)
+  app.router.add_route("GET", "/", info)
+  app.router.add_route("*", "/{index}/_search", search)
+  web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+async def benchmark_setting(name: str, options: TransportOptions, args):
+  try:
+    client_options = options.to_client_options()
+  except ValueError as e:
+    print(f"--- {name}: skipped, {e}")
+    return
+
+  es = AsyncElasticsearch(args.target, **client_options)
+  try:
+    # a connection for the first request, without warming up
+    start = time.perf_counter()
+    await es.ping()
+    first_seconds = time.perf_counter() - start
+
+    latencies = []
+    errors = {}
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+      queue.put_nowait(None)
+
+    async def worker():
+      while not queue.empty():
+        queue.get_nowait()
+        start = time.perf_counter()
+        try:
+          await es.search(index="articles", query={"match": {"article.title": "article"}}, size=args.page_size)
+          latencies.append(time.perf_counter() - start)
+        except (exceptions.ApiError, TransportError) as e:
+          errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    seconds = time.perf_counter() - start
+
+    print(f"--- {name}: {options.model_dump(exclude_defaults=True)}")
+    print(f"first request: {first_seconds * 1000:.1f}ms")
+    print(f"throughput: {len(latencies) / seconds:.0f} searches/s, errors: {errors if errors else 0}")
+    if len(latencies) > 0:
+      print(f"latency: {latency_summary(latencies)}")
+  finally:
+    await es.close()
+
+
+async def main():
+  parser = argparse.ArgumentParser(description="Benchmark the transport options of the Elasticsearch client.")
+  parser.add_argument("--concurrency", type=int, default=64)
+  parser.add_argument("--requests", type=int, default=3000)
+  parser.add_argument("--page-size", type=int, default=10)
+  parser.add_argument("--latency-ms", type=float, default=5)
+  parser.add_argument("--fail-rate", type=float, default=0.02, help="share of the requests answered with 503")
+  parser.add_argument("--slow-rate", type=float, default=0.01, help="share of the requests answered slowly")
+  parser.add_argument("--slow-latency-ms", type=float, default=500)
+  parser.add_argument("--port", type=int, default=19200)
+  parser.add_argument("--target", default=None, help="a real cluster instead of the stand-in, e.g. http://localhost:9200")
+  parser.add_argument("--settings", default=",".join(SETTINGS.keys()))
+  args = parser.parse_args()
+
+  stand_in = None
+  if args.target is None:
+    args.target = f"http://127.0.0.1:{args.port}"
+    stand_in = multiprocessing.Process(
+      target=run_stand_in,
+      args=(args.port, args.latency_ms / 1000, args.fail_rate, args.slow_rate, args.slow_latency_ms / 1000, args.page_size),
+      daemon=True,
+    )
+    stand_in.start()
+    await asyncio.sleep(1)
+
+  try:
+    print(f"{args.requests} searches, {args.concurrency} concurrent, against {args.target}")
+    for name in args.settings.split(","):
+      await benchmark_setting(name, SETTINGS[name], args)
+  finally:
+    if stand_in is not None:
+      stand_in.terminate()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
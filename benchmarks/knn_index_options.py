@@ -0,0 +1,150 @@
+from elasticsearch import helpers, exceptions
+from searcher.repository.elasticsearch_options import VectorIndexOptions
+from bench_utils import create_es_client, latency_summary
+import numpy as np
+import argparse
+import asyncio
+import time
+
+# Compares dense_vector index options: kNN latency, recall against exact search, and memory.
+# Every setting gets its own temporary single-shard index with the same vectors.
+#
+# python benchmarks/knn_index_options.py [--docs 50000] [--from-articles]
+
+SETTINGS = {
+  "hnsw-cosine": VectorIndexOptions(similarity="cosine", index_type="hnsw"),
+  "hnsw-dot_product": VectorIndexOptions(similarity="dot_product", index_type="hnsw"),
+  "int8_hnsw-dot_product": VectorIndexOptions(similarity="dot_product", index_type="int8_hnsw"),
+  "int8_hnsw-dot_product-m32-ef200": VectorIndexOptions(similarity="dot_product", index_type="int8_hnsw", m=32, ef_construction=200),
+}
+
+# HNSW defaults of Elasticsearch
+DEFAULT_M = 16
+
+
+def estimate_vector_memory(options: VectorIndexOptions, count: int) -> int:
+  # off-heap memory needed to keep the vectors and the graph in the page cache, based on the Elasticsearch docs
+  m = options.m if options.m is not None else DEFAULT_M
+  if options.index_type == "int8_hnsw":
+    vectors = count * (options.dims + 4)
+  else:
+    vectors = count * options.dims * 4
+  return vectors + count * 4 * m
+
+
+async def load_vectors(es, args) -> np.ndarray:
+  if not args.from_articles:
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((args.docs, args.dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+  vectors = []
+  async for doc in helpers.async_scan(es, index="articles", _source_includes=["analyzer.embeddings"], size=1000):
+    embeddings = doc["_source"].get("analyzer", {}).get("embeddings", None)
+    if embeddings is not None:
+      vectors.append(embeddings)
+    if len(vectors) >= args.docs:
+      break
+  vectors = np.array(vectors, dtype=np.float32)
+  return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def benchmark_setting(es, name: str, options: VectorIndexOptions, vectors: np.ndarray, queries: np.ndarray, args):
+  index = f"bench-knn-{name}".lower()
+  await es.options(ignore_status=404).indices.delete(index=index)
+  await es.indices.create(
+    index=index,
+    settings={"number_of_shards": 1, "number_of_replicas": 0, "refresh_interval": -1},
+    mappings={"properties": {"embeddings": options.to_mapping()}},
+  )
+
+  start = time.perf_counter()
+  await helpers.async_bulk(
+    es,
+    ({"_index": index, "_id": str(i), "embeddings": v.tolist()} for i, v in enumerate(vectors)),
+    chunk_size=500,
+  )
+  await es.indices.refresh(index=index)
+  await es.indices.forcemerge(index=index, max_num_segments=1, request_timeout=3600)
+  index_seconds = time.perf_counter() - start
+
+  exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+  async def knn(q: np.ndarray) -> dict:
+    return await es.search(
+      index=index,
+      knn={"field": "embeddings", "query_vector": q.tolist(), "k": args.k, "num_candidates": args.num_candidates},
+      size=args.k,
+      source=False,
+    )
+
+  # load the graph into the page cache
+  for q in queries[:20]:
+    await knn(q)
+
+  round_trips = []
+  took = []
+  recalls = []
+  for q, expected in zip(queries, exact):
+    start = time.perf_counter()
+    res = await knn(q)
+    round_trips.append(time.perf_counter() - start)
+    took.append(res["took"] / 1000)
+    found = set(int(h["_id"]) for h in res["hits"]["hits"])
+    recalls.append(len(found.intersection(expected.tolist())) / args.k)
+
+  stats = await es.indices.stats(index=index, metric="store")
+  store_bytes = stats["indices"][index]["primaries"]["store"]["size_in_bytes"]
+
+  knn_bytes = None
+  try:
+    usage = await es.indices.disk_usage(index=index, run_expensive_tasks=True)
+    knn_bytes = usage[index]["fields"]["embeddings"]["knn_vectors_in_bytes"]
+  except (exceptions.ApiError, KeyError):
+    pass
+
+  print(f"--- {name}: {options.to_mapping()}")
+  print(f"indexing + force merge: {index_seconds:.1f}s")
+  print(f"round trip: {latency_summary(round_trips)}")
+  print(f"took:       {latency_summary(took)}")
+  print(f"recall@{args.k}: {np.mean(recalls):.3f}")
+  print(f"store: {store_bytes / 2**20:.1f}MB")
+  if knn_bytes is not None:
+    print(f"knn vectors on disk: {knn_bytes / 2**20:.1f}MB")
+  print(f"estimated memory for the vector search: {estimate_vector_memory(options, len(vectors)) / 2**20:.1f}MB")
+
+  if not args.keep:
+    await es.indices.delete(index=index)
+
+
+async def main():
+  parser = argparse.ArgumentParser(description="Benchmark dense_vector index options.")
+  parser.add_argument("--docs", type=int, default=20000)
+  parser.add_argument("--dims", type=int, default=384)
+  parser.add_argument("--queries", type=int, default=200)
+  parser.add_argument("--k", type=int, default=15)
+  parser.add_argument("--num-candidates", type=int, default=50)
+  parser.add_argument("--from-articles", action="store_true", help="use the embeddings of the 'articles' index instead of random vectors")
+  parser.add_argument("--settings", default=",".join(SETTINGS.keys()))
+  parser.add_argument("--keep", action="store_true", help="keep the benchmark indices")
+  args = parser.parse_args()
+
+  es = create_es_client(request_timeout=120)
+  try:
+    vectors = await load_vectors(es, args)
+    args.dims = vectors.shape[1]
+    rng = np.random.default_rng(7)
+    # queries close to indexed docs, like real queries close to real articles
+    queries = vectors[rng.choice(len(vectors), args.queries)] + rng.normal(0, 0.05, (args.queries, args.dims)).astype(np.float32)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"{len(vectors)} vectors, {args.dims} dims, {args.queries} queries, k={args.k}, num_candidates={args.num_candidates}")
+    for name in args.settings.split(","):
+      options = SETTINGS[name].model_copy(update={"dims": args.dims})
+      await benchmark_setting(es, name, options, vectors, queries, args)
+  finally:
+    await es.close()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
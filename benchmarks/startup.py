@@ -0,0 +1,91 @@
+import urllib.request
+import urllib.error
+import subprocess
+import argparse
+import socket
+import time
+import sys
+import os
+
+# Measures how fast the service starts: the import time of the app module, then, with the server started
+# in a subprocess, the time until '/health/live' and '/health/ready' return 200, the first text search
+# is served, and the first semantic search is served (not 503, while the embeddings model is loading).
+# Compare the runs with and without EMBEDDINGS_LOAD_IN_BACKGROUND=true and ASSERT_INDICES=false.
+#
+# python benchmarks/startup.py [--runs 3] [--timeout 300]
+
+
+def free_port() -> int:
+  with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    return s.getsockname()[1]
+
+
+def import_seconds() -> float:
+  # a fresh interpreter, so nothing is imported yet
+  code = "import time; start = time.perf_counter(); import searcher.searcher_main; print(time.perf_counter() - start)"
+  out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, env=os.environ)
+  return float(out.stdout.strip().splitlines()[-1])
+
+
+def status_of(url: str) -> int | None:
+  try:
+    with urllib.request.urlopen(url, timeout=5) as response:
+      return response.status
+  except urllib.error.HTTPError as e:
+    return e.code
+  except (urllib.error.URLError, OSError):
+    # not listening yet
+    return None
+
+
+def server_timings(timeout: float) -> dict:
+  port = free_port()
+  base = f"http://127.0.0.1:{port}"
+  probes = {
+    "live": f"{base}/health/live",
+    "ready": f"{base}/health/ready",
+    "text_search": f"{base}/api/v1/search/articles?query=news&search_type=text",
+    "semantic_search": f"{base}/api/v1/search/articles?query=news&search_type=semantic",
+  }
+
+  start = time.perf_counter()
+  server = subprocess.Popen(
+    [sys.executable, "-m", "uvicorn", "searcher.searcher_main:app", "--port", str(port), "--log-level", "warning"],
+    env=os.environ,
+  )
+  timings = {}
+  try:
+    while len(timings) < len(probes) and time.perf_counter() - start < timeout:
+      if server.poll() is not None:
+        raise RuntimeError(f"the server exited with {server.returncode}")
+      for name, url in probes.items():
+        if name not in timings and status_of(url) == 200:
+          timings[name] = time.perf_counter() - start
+      time.sleep(0.05)
+  finally:
+    server.terminate()
+    server.wait()
+  return timings
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the import and startup time of the service.")
+  parser.add_argument("--runs", type=int, default=3, help="number of imports and server starts measured")
+  parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for a server to be fully served")
+  args = parser.parse_args()
+
+  imports = [import_seconds() for _ in range(args.runs)]
+  print(f"import searcher.searcher_main: min {min(imports):.2f}s, mean {sum(imports) / len(imports):.2f}s")
+
+  runs = [server_timings(args.timeout) for _ in range(args.runs)]
+  for name in ["live", "ready", "text_search", "semantic_search"]:
+    seconds = [r[name] for r in runs if name in r]
+    if len(seconds) < len(runs):
+      print(f"{name}: not served within {args.timeout:.0f}s in {len(runs) - len(seconds)} of {len(runs)} run(s)")
+    if len(seconds) > 0:
+      print(f"{name}: min {min(seconds):.2f}s, mean {sum(seconds) / len(seconds):.2f}s")
+
+
+if __name__ == "__main__":
+  main()
@@ -3,6 +3,7 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from ..dto.exceptions import QueryValidationException
+from ..embeddings import EmbeddingsNotReadyException
 
 
 # for Pydantic custom validation errors
@@ -29,8 +30,17 @@ def handle_request_validation_errors(request: Request, e: RequestValidationError
     content=jsonable_encoder({"detail": errors})
   )
 
+# for the semantic searches while the embeddings model is loading
+def handle_embeddings_not_ready(request: Request, e: EmbeddingsNotReadyException) -> JSONResponse:
+  return JSONResponse(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    content=jsonable_encoder({"detail": [{"msg": e.message}]}),
+    headers={"Retry-After": "5"},
+  )
+
 handlers = [
   # (ValidationError, handle_validation_errors),
   (QueryValidationException, handle_query_validation_errors),
   (RequestValidationError, handle_request_validation_errors),
+  (EmbeddingsNotReadyException, handle_embeddings_not_ready),
 ]
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from ..searcher_setup import search_service, search_warmup, READINESS_REQUIRES_EMBEDDINGS
+
+
+router = APIRouter(
+  prefix="/health",
+  tags=["Health"],
+)
+
+@router.get("/live")
+async def get_liveness() -> dict:
+  # the process is up and serving requests
+  return {"live": True}
+
+@router.get("/ready")
+async def get_readiness() -> JSONResponse:
+  checks = await search_service.readiness()
+  required = ["repository", "embeddings"] if READINESS_REQUIRES_EMBEDDINGS else ["repository"]
+  if search_warmup is not None:
+    checks["warmup"] = search_warmup.done
+    required.append("warmup")
+  ready = all(checks[check] for check in required)
+
+  return JSONResponse(
+    status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    content={"ready": ready, "checks": checks},
+  )
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Response
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from ..searcher_setup import search_service
+from ..utils.metrics import StatsCollector
+
+
+router = APIRouter(
+  tags=["Stats"],
+)
+
+# the cache counters are read from the service's stats when scraped
+REGISTRY.register(StatsCollector(search_service.stats))
+
+@router.get("/metrics")
+async def get_metrics() -> Response:
+  return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
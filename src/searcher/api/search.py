@@ -7,7 +7,15 @@ from ..dto.topic_query import *
 from ..dto.topic_result import *
 from ..dto.category_result import *
 from ..dto.category_query import *
+from ..dto.count_result import *
+from ..dto.article_facet_query import *
+from ..dto.article_facet_result import *
+from ..dto.article_histogram_query import *
+from ..dto.article_histogram_result import *
+from ..dto.batch_query import *
+from ..dto.batch_result import *
 from ..searcher_setup import search_service
+from ..utils.metrics import VALIDATION_SECONDS
 
 
 router = APIRouter(
@@ -33,7 +41,8 @@ async def search_articles(
   # ISO8601 date format
   # not using Annotated here because of dynamic default values, and default value param order
   date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
-  date_max: datetime = Query(default_factory=datetime.now),
+  # now if not set
+  date_max: datetime | None = None,
 
   topic_ids: Annotated[list[str] | None, Query()] = None,
   topic: Annotated[str | None, Query()] = None,
@@ -53,27 +62,166 @@ async def search_articles(
   # return only a subset of an ArticleResult
   # None or [] means return all attributes
   return_attributes: Annotated[list[str], Query()] = [],
+
+  # page with the returned 'next_cursor' instead of 'page', not for 'semantic' search
+  use_cursor: Annotated[bool, Query()] = False,
+  cursor: Annotated[str | None, Query()] = None,
+
+  # 'exact', 'off', or the number of hits to count exactly
+  track_total_hits: Annotated[str | None, Query()] = None,
 ) -> ArticleResults:
-  article_query = ArticleQuery(
-    ids=ids,
-    query=query,
-    category_ids=cateogry_ids,
-    categories=categories,
-    source=source,
-    author=author,
-    date_min=date_min,
-    date_max=date_max,
-    topic_ids=topic_ids,
-    topic=topic,
-    page=page,
-    page_size=page_size,
-    sort_field=sort_field,
-    sort_dir=sort_dir,
-    search_type=search_type,
-    return_attributes=return_attributes,
-  )
+  with VALIDATION_SECONDS.time():
+    article_query = ArticleQuery(
+      ids=ids,
+      query=query,
+      category_ids=cateogry_ids,
+      categories=categories,
+      source=source,
+      author=author,
+      date_min=date_min,
+      date_max=date_max,
+      topic_ids=topic_ids,
+      topic=topic,
+      page=page,
+      page_size=page_size,
+      sort_field=sort_field,
+      sort_dir=sort_dir,
+      search_type=search_type,
+      return_attributes=return_attributes,
+      use_cursor=use_cursor,
+      cursor=cursor,
+      track_total_hits=track_total_hits,
+    )
   return await search_service.search_articles(article_query)
 
+@router.get(
+  "/articles/count",
+  response_model=CountResult,
+)
+async def count_articles(
+  # empty list because None doesn't work properly for OpenAPI here
+  ids: Annotated[list[str], Query()] = [],
+
+  # counts the lexical matches
+  query: Annotated[str | None, Query()] = None,
+  cateogry_ids: Annotated[list[str] | None, Query()] = None,
+  categories: Annotated[str | None, Query()] = None,
+  source: Annotated[str | None, Query()] = None,
+  author: Annotated[str | None, Query()] = None,
+
+  # ISO8601 date format
+  # not using Annotated here because of dynamic default values, and default value param order
+  date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
+  # now if not set
+  date_max: datetime | None = None,
+
+  topic_ids: Annotated[list[str] | None, Query()] = None,
+  topic: Annotated[str | None, Query()] = None,
+) -> CountResult:
+  with VALIDATION_SECONDS.time():
+    article_query = ArticleQuery(
+      ids=ids,
+      query=query,
+      category_ids=cateogry_ids,
+      categories=categories,
+      source=source,
+      author=author,
+      date_min=date_min,
+      date_max=date_max,
+      topic_ids=topic_ids,
+      topic=topic,
+    )
+  return await search_service.count_articles(article_query)
+
+@router.get(
+  "/articles/facets",
+  response_model=ArticleFacetResults,
+)
+async def facet_articles(
+  # empty list because None doesn't work properly for OpenAPI here
+  ids: Annotated[list[str], Query()] = [],
+
+  # counts the facets of the lexical matches
+  query: Annotated[str | None, Query()] = None,
+  cateogry_ids: Annotated[list[str] | None, Query()] = None,
+  categories: Annotated[str | None, Query()] = None,
+  source: Annotated[str | None, Query()] = None,
+  author: Annotated[str | None, Query()] = None,
+
+  # ISO8601 date format
+  # not using Annotated here because of dynamic default values, and default value param order
+  date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
+  # now if not set
+  date_max: datetime | None = None,
+
+  topic_ids: Annotated[list[str] | None, Query()] = None,
+  topic: Annotated[str | None, Query()] = None,
+
+  # 'source', 'categories', 'topics', [] means every facet
+  facets: Annotated[list[str], Query()] = [],
+  # number of the most frequent values returned for each facet
+  facet_size: Annotated[int, Query(ge=1, le=100)] = 10,
+) -> ArticleFacetResults:
+  with VALIDATION_SECONDS.time():
+    facet_query = ArticleFacetQuery(
+      ids=ids,
+      query=query,
+      category_ids=cateogry_ids,
+      categories=categories,
+      source=source,
+      author=author,
+      date_min=date_min,
+      date_max=date_max,
+      topic_ids=topic_ids,
+      topic=topic,
+      facets=facets,
+      facet_size=facet_size,
+    )
+  return await search_service.facet_articles(facet_query)
+
+@router.get(
+  "/articles/histogram",
+  response_model=ArticleHistogramResults,
+)
+async def histogram_articles(
+  # empty list because None doesn't work properly for OpenAPI here
+  ids: Annotated[list[str], Query()] = [],
+
+  # counts the lexical matches
+  query: Annotated[str | None, Query()] = None,
+  cateogry_ids: Annotated[list[str] | None, Query()] = None,
+  categories: Annotated[str | None, Query()] = None,
+  source: Annotated[str | None, Query()] = None,
+  author: Annotated[str | None, Query()] = None,
+
+  # ISO8601 date format
+  # not using Annotated here because of dynamic default values, and default value param order
+  date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
+  # now if not set
+  date_max: datetime | None = None,
+
+  topic_ids: Annotated[list[str] | None, Query()] = None,
+  topic: Annotated[str | None, Query()] = None,
+
+  # size of the buckets, in UTC
+  interval: Annotated[HistogramInterval, Query()] = HistogramInterval.day,
+) -> ArticleHistogramResults:
+  with VALIDATION_SECONDS.time():
+    histogram_query = ArticleHistogramQuery(
+      ids=ids,
+      query=query,
+      category_ids=cateogry_ids,
+      categories=categories,
+      source=source,
+      author=author,
+      date_min=date_min,
+      date_max=date_max,
+      topic_ids=topic_ids,
+      topic=topic,
+      interval=interval,
+    )
+  return await search_service.histogram_articles(histogram_query)
+
 @router.get(
   "/topic-batches", 
   response_model=TopicBatchResults, 
@@ -92,7 +240,8 @@ async def search_topic_batches(
   # ISO8601 date format
   # not using Annotated here because of dynamic default values, and default value param order
   date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
-  date_max: datetime = Query(default_factory=datetime.now),
+  # now if not set
+  date_max: datetime | None = None,
   
   # pagination
   page: Annotated[int, Query(ge=0)] = 0,
@@ -108,23 +257,66 @@ async def search_topic_batches(
   # return only a subset of an ArticleResult
   # None or [] means return all attributes
   return_attributes: Annotated[list[str], Query()] = [],
+
+  # page with the returned 'next_cursor' instead of 'page'
+  use_cursor: Annotated[bool, Query()] = False,
+  cursor: Annotated[str | None, Query()] = None,
+
+  # 'exact', 'off', or the number of hits to count exactly
+  track_total_hits: Annotated[str | None, Query()] = None,
 ) -> TopicBatchResults:
-  topic_query = TopicBatchQuery(
-    ids=ids,
-    count_min=count_min,
-    count_max=count_max,
-    topic_count_min=topic_count_min,
-    topic_count_max=topic_count_max,
-    date_min=date_min,
-    date_max=date_max,
-    page=page,
-    page_size=page_size,
-    sort_field=sort_field,
-    sort_dir=sort_dir,
-    return_attributes=return_attributes,
-  )
+  with VALIDATION_SECONDS.time():
+    topic_query = TopicBatchQuery(
+      ids=ids,
+      count_min=count_min,
+      count_max=count_max,
+      topic_count_min=topic_count_min,
+      topic_count_max=topic_count_max,
+      date_min=date_min,
+      date_max=date_max,
+      page=page,
+      page_size=page_size,
+      sort_field=sort_field,
+      sort_dir=sort_dir,
+      return_attributes=return_attributes,
+      use_cursor=use_cursor,
+      cursor=cursor,
+      track_total_hits=track_total_hits,
+    )
   return await search_service.search_topic_batches(topic_query)
 
+@router.get(
+  "/topic-batches/count",
+  response_model=CountResult,
+)
+async def count_topic_batches(
+  # empty list because None doesn't work properly for OpenAPI here
+  ids: Annotated[list[str], Query()] = [],
+
+  count_min: Annotated[int | None, Query()] = None,
+  count_max: Annotated[int | None, Query()] = None,
+
+  topic_count_min: Annotated[int | None, Query()] = None,
+  topic_count_max: Annotated[int | None, Query()] = None,
+
+  # ISO8601 date format
+  # not using Annotated here because of dynamic default values, and default value param order
+  date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
+  # now if not set
+  date_max: datetime | None = None,
+) -> CountResult:
+  with VALIDATION_SECONDS.time():
+    topic_batch_query = TopicBatchQuery(
+      ids=ids,
+      count_min=count_min,
+      count_max=count_max,
+      topic_count_min=topic_count_min,
+      topic_count_max=topic_count_max,
+      date_min=date_min,
+      date_max=date_max,
+    )
+  return await search_service.count_topic_batches(topic_batch_query)
+
 @router.get(
   "/topics", 
   response_model=TopicResults, 
@@ -142,7 +334,8 @@ async def search_topics(
   # ISO8601 date format
   # not using Annotated here because of dynamic default values, and default value param order
   date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
-  date_max: datetime = Query(default_factory=datetime.now),
+  # now if not set
+  date_max: datetime | None = None,
   
   # pagination
   page: Annotated[int, Query(ge=0)] = 0,
@@ -159,23 +352,64 @@ async def search_topics(
   # None or [] means return all attributes
   return_attributes: Annotated[list[str], Query()] = [],
 
+  # page with the returned 'next_cursor' instead of 'page'
+  use_cursor: Annotated[bool, Query()] = False,
+  cursor: Annotated[str | None, Query()] = None,
+
+  # 'exact', 'off', or the number of hits to count exactly
+  track_total_hits: Annotated[str | None, Query()] = None,
 ) -> TopicResults:
-  topic_query = TopicQuery(
-    ids=ids,
-    batch_ids=batch_ids,
-    topic=topic,
-    count_min=count_min,
-    count_max=count_max,
-    date_min=date_min,
-    date_max=date_max,
-    page=page,
-    page_size=page_size,
-    sort_field=sort_field,
-    sort_dir=sort_dir,
-    return_attributes=return_attributes,
-  )
+  with VALIDATION_SECONDS.time():
+    topic_query = TopicQuery(
+      ids=ids,
+      batch_ids=batch_ids,
+      topic=topic,
+      count_min=count_min,
+      count_max=count_max,
+      date_min=date_min,
+      date_max=date_max,
+      page=page,
+      page_size=page_size,
+      sort_field=sort_field,
+      sort_dir=sort_dir,
+      return_attributes=return_attributes,
+      use_cursor=use_cursor,
+      cursor=cursor,
+      track_total_hits=track_total_hits,
+    )
   return await search_service.search_topics(topic_query)
     
+@router.get(
+  "/topics/count",
+  response_model=CountResult,
+)
+async def count_topics(
+  # empty list because None doesn't work properly for OpenAPI here
+  ids: Annotated[list[str], Query()] = [],
+  batch_ids: Annotated[list[str], Query()] = [],
+
+  topic: Annotated[str | None, Query()] = None,
+  count_min: Annotated[int | None, Query()] = None,
+  count_max: Annotated[int | None, Query()] = None,
+
+  # ISO8601 date format
+  # not using Annotated here because of dynamic default values, and default value param order
+  date_min: datetime = datetime.fromisoformat('1000-01-01T00:00:00'),
+  # now if not set
+  date_max: datetime | None = None,
+) -> CountResult:
+  with VALIDATION_SECONDS.time():
+    topic_query = TopicQuery(
+      ids=ids,
+      batch_ids=batch_ids,
+      topic=topic,
+      count_min=count_min,
+      count_max=count_max,
+      date_min=date_min,
+      date_max=date_max,
+    )
+  return await search_service.count_topics(topic_query)
+
 @router.get(
   "/categories", 
   response_model=CategoryResults, 
@@ -189,10 +423,20 @@ async def search_categories(
   page: Annotated[int, Query(ge=0)] = 0,
   page_size: Annotated[int, Query(ge=0, le=50)] = 10,
 ) -> CategoryResults:
-  category_query = CategoryQuery(
-    ids=ids,
-    query=query,
-    page=page,
-    page_size=page_size,
-  )
-  return await search_service.search_categories(category_query)
\ No newline at end of file
+  with VALIDATION_SECONDS.time():
+    category_query = CategoryQuery(
+      ids=ids,
+      query=query,
+      page=page,
+      page_size=page_size,
+    )
+  return await search_service.search_categories(category_query)
+
+@router.post(
+  "/batch",
+  response_model=BatchResults,
+  response_model_exclude_none=True,
+)
+async def search_batch(batch_query: BatchQuery) -> BatchResults:
+  # several searches in a single request, the failed ones have an 'error' instead of a 'result'
+  return await search_service.search_batch(batch_query)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from ..searcher_setup import search_service, search_warmup
+
+
+router = APIRouter(
+  prefix="/api/v1/stats",
+  tags=["Stats"],
+)
+
+@router.get("")
+async def get_stats() -> dict:
+  stats = search_service.stats()
+  if search_warmup is not None:
+    stats["warmup"] = search_warmup.stats()
+  return stats
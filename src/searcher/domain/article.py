@@ -37,4 +37,7 @@ class Article(pydantic.BaseModel):
 
 class ArticleList(pydantic.BaseModel):
   articles: list[Article]
-  total_count: int
+  # None if the total isn't tracked, 'gte' relation if it's only a lower bound
+  total_count: int | None
+  total_relation: str | None = None
+  next_cursor: str | None = None
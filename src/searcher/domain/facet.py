@@ -0,0 +1,11 @@
+import pydantic
+
+
+class FacetValue(pydantic.BaseModel):
+  value: str
+  count: int
+
+
+class ArticleFacets(pydantic.BaseModel):
+  total_count: int
+  facets: dict[str, list[FacetValue]]
@@ -0,0 +1,11 @@
+import pydantic
+from datetime import datetime
+
+
+class HistogramBucket(pydantic.BaseModel):
+  start: datetime
+  count: int
+
+
+class ArticleHistogram(pydantic.BaseModel):
+  buckets: list[HistogramBucket]
@@ -34,8 +34,11 @@ class Topic(pydantic.BaseModel):
 
 
 class TopicList(pydantic.BaseModel):
-  total_count: int
+  # None if the total isn't tracked, 'gte' relation if it's only a lower bound
+  total_count: int | None
+  total_relation: str | None = None
   topics: list[Topic]
+  next_cursor: str | None = None
 
 
 class TopicBatch(pydantic.BaseModel):
@@ -46,5 +49,8 @@ class TopicBatch(pydantic.BaseModel):
   create_time: datetime | None = None
 
 class TopicBatchList(pydantic.BaseModel):
-  total_count: int
-  batches: list[TopicBatch]
\ No newline at end of file
+  # None if the total isn't tracked, 'gte' relation if it's only a lower bound
+  total_count: int | None
+  total_relation: str | None = None
+  batches: list[TopicBatch]
+  next_cursor: str | None = None
\ No newline at end of file
@@ -0,0 +1,33 @@
+from pydantic import Field, field_validator
+from typing import Annotated
+from .article_query import ArticleQuery
+from .exceptions import QueryValidationException
+
+
+# attributes of the articles whose values can be counted
+article_facet_keys = set([
+  "source",
+  "categories",
+  "topics",
+])
+
+
+# the filters of an article query, and the facets to count for the matching articles
+class ArticleFacetQuery(ArticleQuery):
+  # None or [] means every facet
+  facets: Annotated[list[str] | None, Field(validate_default=True)] = None
+
+  # number of the most frequent values returned for each facet
+  facet_size: Annotated[int, Field(ge=1, le=100)] = 10
+
+  @field_validator("facets")
+  @classmethod
+  def validate_facets(cls, v: list[str] | None) -> list[str]:
+    if v is None or len(v) == 0:
+      return sorted(article_facet_keys)
+
+    for key in v:
+      if key not in article_facet_keys:
+        raise QueryValidationException(f"Invalid facet '{key}'. Must be one of {article_facet_keys}.")
+
+    return sorted(set(v))
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class FacetValueResult(BaseModel):
+  value: str
+  # number of matching articles with the value
+  count: int
+
+
+class ArticleFacetResults(BaseModel):
+  # number of matching articles
+  total: int
+  # facet -> its most frequent values, most frequent first
+  facets: dict[str, list[FacetValueResult]]
@@ -0,0 +1,16 @@
+from pydantic import Field
+from typing import Annotated
+from enum import Enum
+from .article_query import ArticleQuery
+
+
+class HistogramInterval(str, Enum):
+  day = "day"
+  # starting on Monday, like Elasticsearch's calendar weeks
+  week = "week"
+  month = "month"
+
+
+# the filters of an article query, and the interval of the buckets of the matching articles, in UTC
+class ArticleHistogramQuery(ArticleQuery):
+  interval: Annotated[HistogramInterval, Field()] = HistogramInterval.day
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class HistogramBucketResult(BaseModel):
+  # start of the bucket, in UTC
+  date: datetime
+  count: int
+
+
+class ArticleHistogramResults(BaseModel):
+  interval: str
+  # from the first to the last bucket with articles, the buckets in between are present with a count of 0
+  buckets: list[HistogramBucketResult]
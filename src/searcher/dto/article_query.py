@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum
 from .article_result import ArticleResult
 from .sort_direction import SortDirection
-from .utils import flatten_model_attributes
+from .utils import flatten_model_attributes, parse_track_total_hits
 from .exceptions import QueryValidationException
 
   
@@ -40,7 +40,8 @@ class ArticleQuery(BaseModel):
 
   # ISO8601 date format, see pydantic docs
   date_min: Annotated[datetime | None, Field()] = datetime.fromisoformat('1000-01-01T00:00:00')
-  date_max: Annotated[datetime | None, Field(default_factory=datetime.now)]
+  # None is now, filled in by the service
+  date_max: Annotated[datetime | None, Field()] = None
 
   topic_ids: Annotated[list[str] | None, Field()] = None
   topic: Annotated[str | None, Field()] = None
@@ -61,6 +62,25 @@ class ArticleQuery(BaseModel):
   # None means return all attributes
   return_attributes: Annotated[list[str] | None, Field()] = None
 
+  # return a cursor for paging through the results instead of 'page', not supported by semantic search
+  # text search: the pages come from the same snapshot of the index (point in time), every page costs the same
+  # combined search: a deeper fused result list is kept on the server
+  use_cursor: Annotated[bool, Field()] = False
+
+  # 'next_cursor' of the previous page
+  # text search: send the same query options, 'page' is ignored
+  # combined search: every other option than 'page_size' is ignored, the results belong to the original query
+  cursor: Annotated[str | None, Field()] = None
+
+  # 'exact', 'off', or the number of hits to count exactly, anything above is reported as a lower bound
+  # None uses the deployment's default
+  track_total_hits: Annotated[bool | int | None, Field()] = None
+
+
+  @field_validator("track_total_hits", mode="before")
+  @classmethod
+  def validate_track_total_hits(cls, v: str | bool | int | None) -> bool | int | None:
+    return parse_track_total_hits(v)
 
   @field_validator("return_attributes")
   @classmethod
@@ -97,6 +117,7 @@ class ArticleQuery(BaseModel):
     return self
 
   # limitation of manually combining the text and semantic search results...
+  # the results are only consistent across pages when they come from the same fused result list, paged with 'cursor'
   @model_validator(mode='after')
   def paging_disabled_for_combined_search(self):
     if (
@@ -104,6 +125,17 @@ class ArticleQuery(BaseModel):
         self.page != 0
       )
     ):
-      raise QueryValidationException(f"'page' must be 0 for 'combined' search.")
+      raise QueryValidationException(f"'page' must be 0 for 'combined' search, use 'use_cursor' and 'cursor' to page.")
+    return self
+
+  # semantic search always returns the same limited number of nearest neighbours, paged with 'page'
+  @model_validator(mode='after')
+  def cursor_disabled_for_semantic_search(self):
+    if (
+      (self.search_type == ArticleQueryType.semantic) and (
+        self.use_cursor or self.cursor is not None
+      )
+    ):
+      raise QueryValidationException(f"'use_cursor' and 'cursor' aren't supported by 'semantic' search, use 'page'.")
     return self
    
@@ -17,5 +17,11 @@ class ArticleResult(BaseModel):
 
 
 class ArticleResults(BaseModel):
-  total: int
+  # missing if 'track_total_hits' is 'off'
+  total: int | None = None
+  # 'eq', or 'gte' if the total is only a lower bound, because of the 'track_total_hits' limit
+  total_relation: str | None = None
   results: list[ArticleResult]
+
+  # only with 'use_cursor', pass it as 'cursor' to get the next page, missing after the last page
+  next_cursor: str | None = None
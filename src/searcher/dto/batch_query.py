@@ -0,0 +1,46 @@
+from pydantic import BaseModel, field_validator, Field
+from typing import Annotated, Literal, Union
+from .article_query import ArticleQuery
+from .topic_query import TopicQuery
+from .topic_batch_query import TopicBatchQuery
+from .category_query import CategoryQuery
+from .exceptions import QueryValidationException
+
+BATCH_MAX_SEARCHES = 20
+
+
+# the queries have the same options as the query parameters of the endpoints with the same name
+
+class ArticleSearch(BaseModel):
+  type: Literal["articles"]
+  query: ArticleQuery
+
+class TopicSearch(BaseModel):
+  type: Literal["topics"]
+  query: TopicQuery
+
+class TopicBatchSearch(BaseModel):
+  type: Literal["topic-batches"]
+  query: TopicBatchQuery
+
+class CategorySearch(BaseModel):
+  type: Literal["categories"]
+  query: CategoryQuery
+
+BatchSearch = Annotated[
+  Union[ArticleSearch, TopicSearch, TopicBatchSearch, CategorySearch],
+  Field(discriminator="type")
+]
+
+
+class BatchQuery(BaseModel):
+  searches: Annotated[list[BatchSearch], Field()]
+
+  @field_validator("searches")
+  @classmethod
+  def limit_searches(cls, v: list) -> list:
+    if len(v) == 0:
+      raise QueryValidationException("'searches' must not be empty")
+    if len(v) > BATCH_MAX_SEARCHES:
+      raise QueryValidationException(f"'searches' contains too many items, at most {BATCH_MAX_SEARCHES} are allowed")
+    return v
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Union
+from .article_result import ArticleResults
+from .topic_result import TopicResults
+from .topic_batch_result import TopicBatchResults
+from .category_result import CategoryResults
+
+
+# either the 'result' or the 'error' of a search is present
+
+class ArticleSearchResult(BaseModel):
+  type: Literal["articles"] = "articles"
+  result: ArticleResults | None = None
+  error: str | None = None
+
+class TopicSearchResult(BaseModel):
+  type: Literal["topics"] = "topics"
+  result: TopicResults | None = None
+  error: str | None = None
+
+class TopicBatchSearchResult(BaseModel):
+  type: Literal["topic-batches"] = "topic-batches"
+  result: TopicBatchResults | None = None
+  error: str | None = None
+
+class CategorySearchResult(BaseModel):
+  type: Literal["categories"] = "categories"
+  result: CategoryResults | None = None
+  error: str | None = None
+
+BatchSearchResult = Annotated[
+  Union[ArticleSearchResult, TopicSearchResult, TopicBatchSearchResult, CategorySearchResult],
+  Field(discriminator="type")
+]
+
+
+class BatchResults(BaseModel):
+  # in the order of the searches
+  results: list[BatchSearchResult]
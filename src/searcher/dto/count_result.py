@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class CountResult(BaseModel):
+  # exact number of matches, without returning them
+  count: int
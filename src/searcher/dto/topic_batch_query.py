@@ -2,7 +2,7 @@ from pydantic import BaseModel, field_validator, Field
 
 from typing import Annotated
 from datetime import datetime
-from .utils import flatten_model_attributes
+from .utils import flatten_model_attributes, parse_track_total_hits
 from .topic_batch_result import TopicBatchResult
 from .sort_direction import SortDirection
 from .exceptions import QueryValidationException
@@ -28,7 +28,8 @@ class TopicBatchQuery(BaseModel):
 
   # ISO8601 date format
   date_min: Annotated[datetime | None, Field()] = datetime.fromisoformat('1000-01-01T00:00:00')
-  date_max: Annotated[datetime | None, Field(default_factory=datetime.now)]
+  # None is now, filled in by the service
+  date_max: Annotated[datetime | None, Field()] = None
   
   # pagination
   page: Annotated[int, Field(ge=0)] = 0
@@ -44,6 +45,21 @@ class TopicBatchQuery(BaseModel):
   # None means return all attributes
   return_attributes: Annotated[list[str] | None, Field()] = None
 
+  # return a cursor for paging through the results of the same snapshot of the index instead of 'page'
+  use_cursor: Annotated[bool, Field()] = False
+
+  # 'next_cursor' of the previous page, send the same query options, 'page' is ignored
+  cursor: Annotated[str | None, Field()] = None
+
+  # 'exact', 'off', or the number of hits to count exactly, anything above is reported as a lower bound
+  # None uses the deployment's default
+  track_total_hits: Annotated[bool | int | None, Field()] = None
+
+
+  @field_validator("track_total_hits", mode="before")
+  @classmethod
+  def validate_track_total_hits(cls, v: str | bool | int | None) -> bool | int | None:
+    return parse_track_total_hits(v)
 
   @field_validator("return_attributes")
   @classmethod
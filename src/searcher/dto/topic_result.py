@@ -19,5 +19,11 @@ class TopicResult(BaseModel):
 
 
 class TopicResults(BaseModel):
-  total: int
-  results: list[TopicResult]
\ No newline at end of file
+  # missing if 'track_total_hits' is 'off'
+  total: int | None = None
+  # 'eq', or 'gte' if the total is only a lower bound, because of the 'track_total_hits' limit
+  total_relation: str | None = None
+  results: list[TopicResult]
+
+  # only with 'use_cursor', pass it as 'cursor' to get the next page, missing after the last page
+  next_cursor: str | None = None
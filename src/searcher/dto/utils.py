@@ -1,6 +1,7 @@
 import pydantic
 import typing
 import types
+from .exceptions import QueryValidationException
 
 def flatten_model_attributes(d: pydantic.BaseModel, keys: set, parent_key: str=''):
   """Returns model attributes separated by '.' for nested models, in the 'keys' set."""
@@ -21,4 +22,21 @@ def flatten_model_attributes(d: pydantic.BaseModel, keys: set, parent_key: str='
         else:
           keys.add(key_name)
     else:
-      keys.add(key_name)
\ No newline at end of file
+      keys.add(key_name)
+
+
+def parse_track_total_hits(v: str | bool | int | None) -> bool | int | None:
+  """'exact' (True), 'off' (False), or the number of hits counted exactly, anything above is only a lower bound."""
+  if v is None or isinstance(v, bool):
+    return v
+  if isinstance(v, str):
+    if v == "exact":
+      return True
+    if v == "off":
+      return False
+    if not v.isdigit():
+      raise QueryValidationException(f"Invalid 'track_total_hits' '{v}'. Must be 'exact', 'off' or a non-negative number.")
+    v = int(v)
+  if not isinstance(v, int) or v < 0:
+    raise QueryValidationException(f"Invalid 'track_total_hits' '{v}'. Must be 'exact', 'off' or a non-negative number.")
+  return v
@@ -1,2 +1,7 @@
 from .embeddings_container import EmbeddingsModelContainer
-from .embeddings_model import EmbeddingsModel
\ No newline at end of file
+from .embeddings_model import EmbeddingsModel
+from .embeddings_executor import EmbeddingsExecutor
+from .embeddings_cache import EmbeddingsCache
+from .loader import load_embeddings_model, EMBEDDINGS_BACKENDS
+from .embeddings_process_pool import EmbeddingsProcessPool, EmbeddingsWorkerException
+from .deferred_model import DeferredEmbeddingsModel, EmbeddingsNotReadyException
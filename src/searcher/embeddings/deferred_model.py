@@ -0,0 +1,87 @@
+from ..utils import log_utils
+from typing import Callable
+import numpy as np
+import threading
+import logging
+import time
+
+
+class EmbeddingsNotReadyException(Exception):
+
+  def __init__(self, message):
+    self.message = message
+
+
+class DeferredEmbeddingsModel:
+  """
+  Loads the embeddings model in a background thread after 'start', so the server can serve everything else meanwhile.
+  Has the same blocking 'encode' as EmbeddingsModel, which raises EmbeddingsNotReadyException until the model is loaded.
+  """
+
+  def __init__(self, load: Callable[[], object], log_level: int = logging.INFO):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    # returns the EmbeddingsModel or the started EmbeddingsProcessPool
+    self.load = load
+
+    self.em = None
+    self.error: BaseException | None = None
+    self.loader: threading.Thread | None = None
+    self.load_seconds: float | None = None
+    self.closed = False
+
+  def start(self):
+    if self.loader is None:
+      self.loader = threading.Thread(target=self.__load, name="embeddings-loader", daemon=True)
+      self.loader.start()
+
+  def __load(self):
+    self.log.info("loading the embeddings model in the background")
+    start = time.perf_counter()
+    try:
+      em = self.load()
+    except BaseException as e:
+      self.error = e
+      self.log.error("failed to load the embeddings model", exc_info=e)
+      return
+
+    self.load_seconds = time.perf_counter() - start
+    if self.closed:
+      # closed while it was loading
+      em.close()
+      return
+    self.em = em
+    self.log.info(f"loaded the embeddings model '{em.name}' in {self.load_seconds:.3f}s")
+
+  @property
+  def ready(self) -> bool:
+    return self.em is not None
+
+  @property
+  def name(self) -> str | None:
+    return self.em.name if self.em is not None else None
+
+  def encode(self, docs: list[str]) -> np.ndarray:
+    em = self.em
+    if em is None:
+      if self.error is not None:
+        raise EmbeddingsNotReadyException("the embeddings model failed to load")
+      raise EmbeddingsNotReadyException("the embeddings model is still loading")
+    return em.encode(docs)
+
+  def stats(self) -> dict:
+    stats = {
+      "ready": self.ready,
+      "load_seconds": self.load_seconds,
+      "error": repr(self.error) if self.error is not None else None,
+    }
+    if self.em is not None:
+      stats.update(self.em.stats())
+    return stats
+
+  def close(self):
+    self.closed = True
+    if self.em is not None:
+      self.em.close()
@@ -0,0 +1,175 @@
+from ..utils import log_utils
+from collections import OrderedDict
+from typing import Callable
+import redis.asyncio as redis
+import numpy as np
+import hashlib
+import logging
+import time
+
+
+def normalize_text(text: str) -> str:
+  # collapse whitespace, so trivially different spellings of a query share an entry
+  return " ".join(text.split())
+
+
+class EmbeddingsCache:
+  """
+  Caches query embeddings, keyed by the normalized query text and the name of the embeddings model.
+  The first tier is a bounded in-process LRU, the optional second tier is shared through Redis.
+  """
+
+  def __init__(
+      self,
+      model_name: str | Callable[[], str],
+      max_entries: int = 10000,
+      ttl_seconds: float = 3600,
+      redis_url: str | None = None,
+      redis_ttl_seconds: int = 86400,
+      redis_key_prefix: str = "searcher:embeddings",
+      log_level: int = logging.INFO
+  ):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+
+    # a function for the models loaded in the background, their name is only known when they're loaded
+    self.model_name = model_name
+    self.max_entries = max_entries
+    self.ttl = ttl_seconds
+
+    # key -> (expiry time, embeddings)
+    self.local: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+
+    self.redis = None
+    self.redis_ttl = redis_ttl_seconds
+    self.redis_key_prefix = redis_key_prefix
+    if redis_url is not None:
+      self.log.info("using Redis as the shared embeddings cache")
+      self.redis = redis.Redis.from_url(redis_url)
+
+    self.local_hits = 0
+    self.redis_hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.redis_errors = 0
+
+  def __key(self, text: str) -> str:
+    return self.__model_name() + ":" + normalize_text(text)
+
+  def __model_name(self) -> str | None:
+    return self.model_name() if callable(self.model_name) else self.model_name
+
+  def __redis_key(self, key: str) -> str:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return f"{self.redis_key_prefix}:{digest}"
+
+  async def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+    """Returns the cached embeddings for every text, None where the embeddings aren't cached."""
+
+    keys = [self.__key(t) for t in texts]
+    results = [self.__get_local(k) for k in keys]
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if len(missing) > 0 and self.redis is not None:
+      found = await self.__get_redis([keys[i] for i in missing])
+      for i, embeddings in zip(missing, found):
+        if embeddings is not None:
+          self.redis_hits += 1
+          self.__set_local(keys[i], embeddings)
+          results[i] = embeddings
+
+    self.misses += sum(1 for r in results if r is None)
+    return results
+
+  async def get(self, text: str) -> np.ndarray | None:
+    return (await self.get_many([text]))[0]
+
+  async def set_many(self, texts: list[str], embeddings: list[np.ndarray]):
+    keys = [self.__key(t) for t in texts]
+    vectors = [self.__to_float32(e) for e in embeddings]
+
+    for k, v in zip(keys, vectors):
+      self.__set_local(k, v)
+
+    if self.redis is not None:
+      await self.__set_redis(keys, vectors)
+
+  async def set(self, text: str, embeddings: np.ndarray):
+    await self.set_many([text], [embeddings])
+
+  def __to_float32(self, embeddings: np.ndarray) -> np.ndarray:
+    # cached arrays are shared between requests, they must not be modified
+    vector = np.array(embeddings, dtype=np.float32)
+    vector.setflags(write=False)
+    return vector
+
+  def __get_local(self, key: str) -> np.ndarray | None:
+    entry = self.local.get(key, None)
+    if entry is None:
+      return None
+
+    expires, embeddings = entry
+    if expires < time.monotonic():
+      del self.local[key]
+      return None
+
+    self.local.move_to_end(key)
+    self.local_hits += 1
+    return embeddings
+
+  def __set_local(self, key: str, embeddings: np.ndarray):
+    if self.max_entries <= 0:
+      return
+
+    self.local[key] = (time.monotonic() + self.ttl, embeddings)
+    self.local.move_to_end(key)
+    while len(self.local) > self.max_entries:
+      self.local.popitem(last=False)
+      self.evictions += 1
+
+  async def __get_redis(self, keys: list[str]) -> list[np.ndarray | None]:
+    # the shared cache is an optimization, being unable to reach it must never fail a search
+    try:
+      values = await self.redis.mget([self.__redis_key(k) for k in keys])
+    except redis.RedisError as e:
+      self.redis_errors += 1
+      self.log.warning(f"failed to read embeddings from Redis: {e}")
+      return [None] * len(keys)
+
+    return [self.__from_bytes(v) if v is not None else None for v in values]
+
+  async def __set_redis(self, keys: list[str], vectors: list[np.ndarray]):
+    try:
+      async with self.redis.pipeline(transaction=False) as pipe:
+        for k, v in zip(keys, vectors):
+          pipe.set(self.__redis_key(k), v.tobytes(), ex=self.redis_ttl)
+        await pipe.execute()
+    except redis.RedisError as e:
+      self.redis_errors += 1
+      self.log.warning(f"failed to write embeddings to Redis: {e}")
+
+  def __from_bytes(self, value: bytes) -> np.ndarray:
+    # read-only view over the bytes returned by Redis
+    return np.frombuffer(value, dtype=np.float32)
+
+  def stats(self) -> dict:
+    lookups = self.local_hits + self.redis_hits + self.misses
+    return {
+      "model_name": self.__model_name(),
+      "entries": len(self.local),
+      "max_entries": self.max_entries,
+      "local_hits": self.local_hits,
+      "redis_hits": self.redis_hits,
+      "misses": self.misses,
+      "hit_rate": (self.local_hits + self.redis_hits) / lookups if lookups > 0 else 0.0,
+      "evictions": self.evictions,
+      "redis_enabled": self.redis is not None,
+      "redis_errors": self.redis_errors,
+    }
+
+  async def close(self):
+    if self.redis is not None:
+      self.log.info("closing Redis embeddings cache connection")
+      await self.redis.aclose()
@@ -1,7 +1,18 @@
 import pickle
+import json
+import os
 from datetime import date
 
 # Contains the embeddings model
+#
+# Two formats are supported:
+# - a pickle of the whole object, needs sentence-transformers and copies every weight on load
+# - a versioned directory: a JSON manifest, safetensors weights, the transformer config and the tokenizer,
+#   the weights are memory-mapped on load, see 'save_dir'
+
+MANIFEST_FILE = "manifest.json"
+CONTAINER_FORMAT = "searcher-embeddings-container"
+CONTAINER_FORMAT_VERSION = 1
 
 class EmbeddingsModelContainer: pass
 
@@ -23,8 +34,45 @@ class EmbeddingsModelContainer:
       pickle.dump(d, f, protocol=pickle.HIGHEST_PROTOCOL)
       print(f"saved {self.__class__.__name__} at {filename}")
 
+  def save_dir(self, directory):
+    # only sentence-transformers models can be saved, needs the full sentence-transformers installation
+    from safetensors.torch import save_file
+    from . import pipeline_config
+
+    self.save_date = date.today()
+    st = self.embeddings_model
+    transformer = pipeline_config.get_transformer(st)
+    model = transformer.auto_model
+
+    os.makedirs(directory, exist_ok=True)
+    pipeline_config.save_tokenizer(st, directory, "tokenizer.json")
+    model.config.to_json_file(os.path.join(directory, "config.json"))
+
+    # non-persistent buffers are saved too, the model is built without running its initialization on load
+    tensors = dict(model.named_parameters()) | dict(model.named_buffers())
+    save_file(
+      {name: t.detach().clone().contiguous() for name, t in tensors.items()},
+      os.path.join(directory, "model.safetensors"),
+    )
+
+    manifest = pipeline_config.get_pipeline_config(st) | {
+      "format": CONTAINER_FORMAT,
+      "format_version": CONTAINER_FORMAT_VERSION,
+      "embeddings_model_name": self.embeddings_model_name,
+      "save_date": self.save_date.isoformat(),
+      "weights": "model.safetensors",
+      "config": "config.json",
+      "tokenizer": "tokenizer.json",
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+      json.dump(manifest, f, indent=2)
+    print(f"saved {self.__class__.__name__} at {directory}")
+
   @classmethod
   def load(cls, filename) -> EmbeddingsModelContainer:
+    if os.path.isdir(filename):
+      return cls.load_dir(filename)
+
     with open(filename, 'rb') as f:
       print(f"loading {cls.__name__} from {filename}")
       d = pickle.load(f)
@@ -34,4 +82,28 @@ class EmbeddingsModelContainer:
       ec = EmbeddingsModelContainer(embeddings_model, embeddings_model_name)
       ec.save_date = save_date
       print(f"loaded {cls.__name__} from {filename}")
-      return ec
\ No newline at end of file
+      return ec
+
+  @classmethod
+  def load_dir(cls, directory) -> EmbeddingsModelContainer:
+    from .transformer_backend import TransformerEmbeddingsBackend
+
+    print(f"loading {cls.__name__} from {directory}")
+    with open(os.path.join(directory, MANIFEST_FILE), 'r') as f:
+      manifest = json.load(f)
+
+    if manifest.get("format", None) != CONTAINER_FORMAT:
+      raise ValueError(f"{directory} doesn't contain an {cls.__name__}")
+    if manifest["format_version"] > CONTAINER_FORMAT_VERSION:
+      raise ValueError(
+        f"unsupported {cls.__name__} format version {manifest['format_version']}, "
+        f"the newest supported version is {CONTAINER_FORMAT_VERSION}"
+      )
+
+    ec = EmbeddingsModelContainer(
+      TransformerEmbeddingsBackend(directory, manifest),
+      manifest["embeddings_model_name"]
+    )
+    ec.save_date = date.fromisoformat(manifest["save_date"])
+    print(f"loaded {cls.__name__} from {directory}")
+    return ec
@@ -0,0 +1,213 @@
+from ..utils import log_utils
+from ..utils.metrics import ENCODE_SECONDS
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import asyncio
+import logging
+import time
+
+
+# upper bounds of the batch size histogram buckets reported in the stats
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+
+class EmbeddingsExecutor:
+  """
+  Runs the embeddings model in worker threads, so inference never blocks the event loop.
+  Concurrent 'encode' calls are merged into a single batched call of the model.
+  """
+
+  def __init__(
+      self,
+      em,
+      max_batch_size: int = 32,
+      max_wait_ms: float = 2.0,
+      workers: int = 1,
+      log_level: int = logging.INFO
+  ):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+
+    # EmbeddingsModel or EmbeddingsProcessPool, anything with a blocking 'encode(docs) -> np.ndarray' method
+    self.em = em
+
+    self.max_batch_size = max(1, max_batch_size)
+    self.max_wait = max(0.0, max_wait_ms) / 1000
+    self.workers = max(1, workers)
+    self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embeddings")
+
+    # created lazily, they have to be bound to the running event loop
+    self.queue: asyncio.Queue | None = None
+    self.free_workers: asyncio.Semaphore | None = None
+    self.batcher: asyncio.Task | None = None
+    self.batch_tasks: set[asyncio.Task] = set()
+
+    # request taken from the queue which didn't fit into the previous batch
+    self.carry = None
+
+    self.requests = 0
+    self.docs = 0
+    self.batches = 0
+    self.failed_batches = 0
+    self.max_batch = 0
+    self.in_flight_batches = 0
+    self.inference_seconds = 0.0
+    self.batch_size_histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+  @property
+  def ready(self) -> bool:
+    # the models loaded in the background aren't ready until they're loaded
+    return getattr(self.em, "ready", True)
+
+  async def encode(self, docs: list[str]) -> np.ndarray:
+    self.__ensure_started()
+
+    future = asyncio.get_running_loop().create_future()
+    self.queue.put_nowait((docs, future))
+    self.requests += 1
+    return await future
+
+  def __ensure_started(self):
+    if self.batcher is not None and not self.batcher.done():
+      return
+
+    self.queue = asyncio.Queue()
+    self.free_workers = asyncio.Semaphore(self.workers)
+    self.carry = None
+    self.batcher = asyncio.create_task(self.__run_batcher())
+    self.log.info(
+      f"started embeddings executor, max batch size: {self.max_batch_size}, "
+      f"max wait: {self.max_wait * 1000}ms, workers: {self.workers}"
+    )
+
+  async def __run_batcher(self):
+    while True:
+      first = self.carry if self.carry is not None else await self.queue.get()
+      self.carry = None
+
+      # while every worker is busy, requests keep piling up in the queue,
+      # so the next batch grows with the load
+      await self.free_workers.acquire()
+      try:
+        batch = await self.__collect_batch(first)
+      except BaseException:
+        self.free_workers.release()
+        raise
+
+      if len(batch) == 0:
+        self.free_workers.release()
+        continue
+
+      self.in_flight_batches += 1
+      task = asyncio.create_task(self.__run_batch(batch))
+      self.batch_tasks.add(task)
+      task.add_done_callback(self.batch_tasks.discard)
+
+  async def __collect_batch(self, first) -> list:
+    batch = []
+    self.__add_to_batch(batch, first)
+    self.__drain_queue(batch)
+
+    # give concurrent requests a short window to join the batch
+    if self.carry is None and self.__batch_size(batch) < self.max_batch_size and self.max_wait > 0:
+      await asyncio.sleep(self.max_wait)
+      self.__drain_queue(batch)
+
+    return batch
+
+  def __drain_queue(self, batch: list):
+    # take everything that's already waiting, until the batch is full
+    while self.carry is None and self.__batch_size(batch) < self.max_batch_size and not self.queue.empty():
+      self.__add_to_batch(batch, self.queue.get_nowait())
+
+  def __add_to_batch(self, batch: list, item):
+    docs, future = item
+
+    # the caller went away while waiting in the queue
+    if future.done():
+      return
+
+    if len(batch) > 0 and self.__batch_size(batch) + len(docs) > self.max_batch_size:
+      self.carry = item
+      return
+
+    batch.append(item)
+
+  def __batch_size(self, batch: list) -> int:
+    return sum(len(docs) for docs, _ in batch)
+
+  async def __run_batch(self, batch: list):
+    docs = [doc for item_docs, _ in batch for doc in item_docs]
+    self.__record_batch(len(docs))
+
+    start = time.perf_counter()
+    try:
+      embeddings = await asyncio.get_running_loop().run_in_executor(self.pool, self.em.encode, docs)
+    except Exception as e:
+      self.failed_batches += 1
+      self.log.error(f"embeddings batch of {len(docs)} docs failed", exc_info=e)
+      for _, future in batch:
+        if not future.done():
+          future.set_exception(e)
+      return
+    finally:
+      seconds = time.perf_counter() - start
+      self.inference_seconds += seconds
+      ENCODE_SECONDS.observe(seconds)
+      self.in_flight_batches -= 1
+      self.free_workers.release()
+
+    # split the batched result between the callers
+    offset = 0
+    for item_docs, future in batch:
+      end = offset + len(item_docs)
+      if not future.done():
+        future.set_result(embeddings[offset:end])
+      offset = end
+
+  def __record_batch(self, size: int):
+    self.batches += 1
+    self.docs += size
+    self.max_batch = max(self.max_batch, size)
+
+    for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+      if size <= bound:
+        self.batch_size_histogram[i] += 1
+        return
+    self.batch_size_histogram[-1] += 1
+
+  def queue_depth(self) -> int:
+    if self.queue is None:
+      return 0
+    return self.queue.qsize() + (1 if self.carry is not None else 0)
+
+  def stats(self) -> dict:
+    buckets = {str(bound): count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_size_histogram)}
+    buckets["+Inf"] = self.batch_size_histogram[-1]
+
+    return {
+      "queue_depth": self.queue_depth(),
+      "in_flight_batches": self.in_flight_batches,
+      "requests": self.requests,
+      "docs": self.docs,
+      "batches": self.batches,
+      "failed_batches": self.failed_batches,
+      "mean_batch_size": self.docs / self.batches if self.batches > 0 else 0.0,
+      "max_batch_size": self.max_batch,
+      "batch_size_histogram": buckets,
+      "inference_seconds": self.inference_seconds,
+      "model": self.em.stats(),
+    }
+
+  async def close(self):
+    self.log.info("closing embeddings executor")
+    if self.batcher is not None:
+      self.batcher.cancel()
+      try:
+        await self.batcher
+      except asyncio.CancelledError:
+        pass
+      self.batcher = None
+    self.pool.shutdown(wait=False, cancel_futures=True)
@@ -9,3 +9,15 @@ class EmbeddingsModel:
 
   def encode(self, docs) -> np.ndarray:
     return self.ec.embeddings_model.encode(docs)
+
+  @property
+  def name(self) -> str:
+    return self.ec.embeddings_model_name
+
+  def stats(self) -> dict:
+    return {
+      "name": self.name,
+    }
+
+  def close(self):
+    pass
@@ -0,0 +1,285 @@
+from ..utils import log_utils
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import numpy as np
+import logging
+import queue
+import time
+import os
+
+
+class EmbeddingsWorkerException(Exception):
+
+  def __init__(self, message, crashed: bool = False):
+    super().__init__(message)
+    self.message = message
+    # the worker process died or hung, and has to be restarted
+    self.crashed = crashed
+
+
+def _run_worker(conn, model_path: str, backend: str, threads: int, capacity: int):
+  # runs in the worker process, started with 'spawn', so nothing is inherited from the server process
+  if threads > 0:
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+
+  from .loader import load_embeddings_model
+
+  try:
+    em = load_embeddings_model(model_path, backend=backend, threads=threads)
+    # also warms up the model
+    dims = em.encode(["embeddings worker started"]).shape[1]
+  except Exception as e:
+    conn.send(("error", f"{type(e).__name__}: {e}"))
+    return
+  conn.send(("ready", em.name, dims))
+
+  # the server process creates the buffer after learning the dimensions
+  _, shm_name = conn.recv()
+  shm = shared_memory.SharedMemory(name=shm_name)
+  out = np.ndarray((capacity, dims), dtype=np.float32, buffer=shm.buf)
+
+  try:
+    while True:
+      try:
+        msg = conn.recv()
+      except EOFError:
+        # the server process went away
+        break
+      if msg is None:
+        break
+
+      _, docs = msg
+      try:
+        out[:len(docs)] = em.encode(docs)
+      except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        continue
+      conn.send(("ok", len(docs)))
+  finally:
+    del out
+    shm.close()
+
+
+class EmbeddingsWorker:
+  """Handle of a single worker process, used by one thread at a time."""
+
+  def __init__(self, id: int, pool):
+    self.id = id
+    self.pool = pool
+    self.process = None
+    self.conn = None
+    self.shm = None
+    self.out = None
+    self.dims = None
+    self.model_name = None
+
+    self.started = 0.0
+    self.busy_seconds = 0.0
+    self.requests = 0
+    self.docs = 0
+    self.errors = 0
+    self.restarts = -1
+
+  def start(self):
+    ctx = mp.get_context("spawn")
+    self.conn, child_conn = ctx.Pipe()
+    self.process = ctx.Process(
+      target=_run_worker,
+      args=(child_conn, self.pool.model_path, self.pool.backend, self.pool.threads, self.pool.capacity),
+      name=f"embeddings-worker-{self.id}",
+      daemon=True,
+    )
+    self.process.start()
+    child_conn.close()
+    self.restarts += 1
+
+  def wait_ready(self, timeout: float):
+    if not self.conn.poll(timeout):
+      raise EmbeddingsWorkerException(f"embeddings worker {self.id} didn't start in {timeout}s")
+
+    try:
+      msg = self.conn.recv()
+    except EOFError:
+      raise EmbeddingsWorkerException(f"embeddings worker {self.id} exited while starting, exit code: {self.process.exitcode}")
+
+    if msg[0] == "error":
+      raise EmbeddingsWorkerException(f"embeddings worker {self.id} failed to load the model: {msg[1]}")
+
+    _, self.model_name, self.dims = msg
+    self.shm = shared_memory.SharedMemory(create=True, size=self.pool.capacity * self.dims * 4)
+    self.out = np.ndarray((self.pool.capacity, self.dims), dtype=np.float32, buffer=self.shm.buf)
+    self.conn.send(("shm", self.shm.name))
+
+    # utilization is measured over the lifetime of the pool, including restarts
+    if self.started == 0:
+      self.started = time.monotonic()
+
+  def encode(self, docs: list[str]) -> np.ndarray:
+    results = []
+    for start in range(0, len(docs), self.pool.capacity):
+      results.append(self.__encode_chunk(docs[start:start + self.pool.capacity]))
+
+    if len(results) == 0:
+      return np.empty((0, self.dims), dtype=np.float32)
+    return results[0] if len(results) == 1 else np.concatenate(results)
+
+  def __encode_chunk(self, docs: list[str]) -> np.ndarray:
+    start = time.monotonic()
+    try:
+      self.conn.send(("encode", docs))
+      if not self.conn.poll(self.pool.request_timeout):
+        raise EmbeddingsWorkerException(
+          f"embeddings worker {self.id} didn't respond in {self.pool.request_timeout}s",
+          crashed=True
+        )
+      status, value = self.conn.recv()
+    except (EOFError, OSError) as e:
+      raise EmbeddingsWorkerException(f"embeddings worker {self.id} crashed: {e}", crashed=True)
+    finally:
+      self.busy_seconds += time.monotonic() - start
+
+    if status == "error":
+      self.errors += 1
+      raise EmbeddingsWorkerException(f"embeddings worker {self.id} failed to encode: {value}")
+
+    self.requests += 1
+    self.docs += value
+
+    # copy out of the shared buffer, it's overwritten by the next request
+    return self.out[:value].copy()
+
+  def stop(self, timeout: float = 5.0):
+    if self.process is None:
+      return
+
+    try:
+      if self.process.is_alive():
+        self.conn.send(None)
+    except OSError:
+      pass
+    self.process.join(timeout)
+    if self.process.is_alive():
+      self.process.kill()
+      self.process.join()
+    self.conn.close()
+
+    if self.shm is not None:
+      self.out = None
+      self.shm.close()
+      self.shm.unlink()
+      self.shm = None
+    self.process = None
+
+  def stats(self) -> dict:
+    uptime = time.monotonic() - self.started if self.started > 0 else 0.0
+    return {
+      "pid": self.process.pid if self.process is not None else None,
+      "alive": self.process is not None and self.process.is_alive(),
+      "requests": self.requests,
+      "docs": self.docs,
+      "errors": self.errors,
+      "restarts": self.restarts,
+      "busy_seconds": self.busy_seconds,
+      "utilization": min(1.0, self.busy_seconds / uptime) if uptime > 0 else 0.0,
+    }
+
+
+class EmbeddingsProcessPool:
+  """
+  Runs the embeddings model in long-lived worker processes instead of the server process.
+  Every worker writes its results into its own shared-memory float32 buffer, only the doc count is sent back.
+  Has the same blocking 'encode' as EmbeddingsModel, meant to be called from the EmbeddingsExecutor's threads.
+  """
+
+  def __init__(
+      self,
+      model_path: str,
+      backend: str = "torch",
+      processes: int = 2,
+      threads: int = 1,
+      capacity: int = 64,
+      restart_on_crash: bool = True,
+      start_timeout: float = 300,
+      request_timeout: float = 60,
+      log_level: int = logging.INFO
+  ):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+
+    self.model_path = model_path
+    self.backend = backend
+    # inference threads in each worker process
+    self.threads = threads
+    # max number of docs a worker encodes at once, larger requests are split
+    self.capacity = max(1, capacity)
+    self.restart_on_crash = restart_on_crash
+    self.start_timeout = start_timeout
+    self.request_timeout = request_timeout
+
+    self.workers = [EmbeddingsWorker(i, self) for i in range(max(1, processes))]
+    self.idle: queue.Queue[EmbeddingsWorker] = queue.Queue()
+
+  def start(self):
+    self.log.info(f"starting {len(self.workers)} embeddings worker processes, backend: {self.backend}")
+
+    # start every process first, so the models are loaded in parallel
+    for w in self.workers:
+      w.start()
+    for w in self.workers:
+      w.wait_ready(self.start_timeout)
+      self.idle.put(w)
+
+    self.log.info(f"embeddings worker processes ready, model: {self.name}")
+
+  @property
+  def name(self) -> str:
+    return self.workers[0].model_name
+
+  def encode(self, docs: list[str]) -> np.ndarray:
+    try:
+      worker = self.idle.get(timeout=self.request_timeout)
+    except queue.Empty:
+      raise EmbeddingsWorkerException(f"no embeddings worker became available in {self.request_timeout}s")
+
+    healthy = True
+    try:
+      return worker.encode(docs)
+    except EmbeddingsWorkerException as e:
+      if e.crashed:
+        healthy = self.__restart(worker)
+      raise
+    finally:
+      # workers which couldn't be restarted are taken out of the pool
+      if healthy:
+        self.idle.put(worker)
+
+  def __restart(self, worker: EmbeddingsWorker) -> bool:
+    self.log.error(f"embeddings worker {worker.id} crashed or hung, exit code: {worker.process.exitcode}")
+    worker.stop(timeout=0)
+    if not self.restart_on_crash:
+      return False
+
+    self.log.info(f"restarting embeddings worker {worker.id}")
+    try:
+      worker.start()
+      worker.wait_ready(self.start_timeout)
+    except EmbeddingsWorkerException as e:
+      self.log.error(f"failed to restart embeddings worker {worker.id}: {e.message}")
+      worker.stop(timeout=0)
+      return False
+    return True
+
+  def stats(self) -> dict:
+    return {
+      "name": self.name,
+      "backend": self.backend,
+      "idle_workers": self.idle.qsize(),
+      "workers": [w.stats() for w in self.workers],
+    }
+
+  def close(self):
+    self.log.info("stopping embeddings worker processes")
+    for w in self.workers:
+      w.stop()
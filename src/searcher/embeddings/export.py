@@ -0,0 +1,92 @@
+from .embeddings_container import EmbeddingsModelContainer
+from . import onnx_backend
+from . import pipeline_config
+from datetime import date
+import argparse
+import json
+import os
+
+# Converts a pickled EmbeddingsModelContainer to the formats of the other embeddings backends.
+# Needs the full sentence-transformers/torch installation, unlike the backends it exports to.
+#
+# python -m searcher.embeddings.export onnx --container model.pkl --out model_onnx [--quantize]
+# python -m searcher.embeddings.export container --container model.pkl --out model_dir
+
+
+def export_onnx(container_path: str, out_dir: str, quantize: bool = False, opset: int = 14):
+  import torch
+
+  ec = EmbeddingsModelContainer.load(container_path)
+  st = ec.embeddings_model
+  config = pipeline_config.get_pipeline_config(st)
+  input_names = config["input_names"]
+
+  os.makedirs(out_dir, exist_ok=True)
+  pipeline_config.save_tokenizer(st, out_dir, onnx_backend.TOKENIZER_FILE)
+
+  # trace with a small dummy batch, batch size and sequence length are dynamic
+  transformer = pipeline_config.get_transformer(st)
+  dummy = transformer.tokenizer(["embeddings export", "dummy input"], padding=True, return_tensors="pt")
+  model = transformer.auto_model.eval()
+  model_path = os.path.join(out_dir, onnx_backend.ONNX_MODEL_FILE)
+  print(f"exporting ONNX model to {model_path}")
+  with torch.no_grad():
+    torch.onnx.export(
+      model,
+      tuple(dummy[n] for n in input_names),
+      model_path,
+      input_names=input_names,
+      output_names=["last_hidden_state"],
+      dynamic_axes={n: {0: "batch", 1: "sequence"} for n in input_names + ["last_hidden_state"]},
+      opset_version=opset,
+      do_constant_folding=True,
+    )
+
+  quantized_model = None
+  if quantize:
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantized_model = onnx_backend.ONNX_QUANTIZED_MODEL_FILE
+    quantized_path = os.path.join(out_dir, quantized_model)
+    print(f"quantizing ONNX model to {quantized_path}")
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+
+  config |= {
+    "embeddings_model_name": ec.embeddings_model_name,
+    "save_date": date.today().isoformat(),
+    "model": onnx_backend.ONNX_MODEL_FILE,
+    "quantized_model": quantized_model,
+    "tokenizer": onnx_backend.TOKENIZER_FILE,
+  }
+  with open(os.path.join(out_dir, onnx_backend.ONNX_CONFIG_FILE), 'w') as f:
+    json.dump(config, f, indent=2)
+  print(f"exported {ec.embeddings_model_name} to {out_dir}")
+
+
+def export_container(container_path: str, out_dir: str):
+  EmbeddingsModelContainer.load(container_path).save_dir(out_dir)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Export a pickled EmbeddingsModelContainer to other embeddings backends.")
+  subparsers = parser.add_subparsers(dest="format", required=True)
+
+  onnx_parser = subparsers.add_parser("onnx", help="ONNX Runtime model, optionally with a dynamically quantized int8 variant")
+  onnx_parser.add_argument("--container", required=True, help="path of the pickled EmbeddingsModelContainer")
+  onnx_parser.add_argument("--out", required=True, help="output directory")
+  onnx_parser.add_argument("--quantize", action="store_true", help="also export an int8 quantized model")
+  onnx_parser.add_argument("--opset", type=int, default=14)
+
+  container_parser = subparsers.add_parser("container", help="versioned container directory with memory-mappable safetensors weights")
+  container_parser.add_argument("--container", required=True, help="path of the pickled EmbeddingsModelContainer")
+  container_parser.add_argument("--out", required=True, help="output directory")
+
+  args = parser.parse_args()
+  if args.format == "onnx":
+    export_onnx(args.container, args.out, quantize=args.quantize, opset=args.opset)
+  elif args.format == "container":
+    export_container(args.container, args.out)
+
+
+if __name__ == "__main__":
+  main()
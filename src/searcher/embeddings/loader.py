@@ -0,0 +1,27 @@
+from .embeddings_container import EmbeddingsModelContainer
+from .embeddings_model import EmbeddingsModel
+
+# 'torch': EmbeddingsModelContainer, either pickled or a container directory, see EmbeddingsModelContainer.save_dir
+# 'onnx', 'onnx-int8': directory exported with 'python -m searcher.embeddings.export onnx'
+EMBEDDINGS_BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+def load_embeddings_model(path: str, backend: str = "torch", threads: int = 0) -> EmbeddingsModel:
+  if backend == "torch":
+    em = EmbeddingsModel(EmbeddingsModelContainer.load(path))
+    if threads > 0:
+      # torch is already imported by loading the model
+      import torch
+      torch.set_num_threads(threads)
+    return em
+
+  if backend == "onnx" or backend == "onnx-int8":
+    # imported here, so onnxruntime is only needed when it's used
+    from .onnx_backend import OnnxEmbeddingsBackend
+    return EmbeddingsModel(OnnxEmbeddingsBackend.load(
+      path,
+      quantized=backend == "onnx-int8",
+      intra_op_threads=threads,
+    ))
+
+  raise ValueError(f"unknown embeddings backend '{backend}', must be one of {EMBEDDINGS_BACKENDS}")
@@ -0,0 +1,69 @@
+from .embeddings_container import EmbeddingsModelContainer
+from . import text_encoding
+import numpy as np
+import json
+import os
+
+# ONNX Runtime embeddings backend, doesn't import torch or sentence-transformers.
+# The model directory is created from a pickled EmbeddingsModelContainer by 'python -m searcher.embeddings.export onnx'.
+
+ONNX_CONFIG_FILE = "onnx_config.json"
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddingsBackend:
+
+  def __init__(self, directory: str, quantized: bool = False, intra_op_threads: int = 0):
+    try:
+      import onnxruntime
+    except ImportError as e:
+      raise ImportError("the 'onnx' embeddings backend requires 'onnxruntime', install the 'onnx' extra") from e
+
+    with open(os.path.join(directory, ONNX_CONFIG_FILE), 'r') as f:
+      self.config = json.load(f)
+
+    model_file = self.config["quantized_model"] if quantized else self.config["model"]
+    if model_file is None:
+      raise ValueError(f"no quantized model was exported to {directory}")
+
+    self.quantized = quantized
+    self.pooling = self.config["pooling"]
+    self.normalize = self.config["normalize"]
+    self.input_names = self.config["input_names"]
+    self.tokenizer = text_encoding.load_tokenizer(
+      os.path.join(directory, self.config["tokenizer"]),
+      max_seq_length=self.config["max_seq_length"],
+      pad_token=self.config["pad_token"],
+      pad_id=self.config["pad_id"],
+    )
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # 0 lets onnxruntime decide
+    options.intra_op_num_threads = intra_op_threads
+    self.session = onnxruntime.InferenceSession(
+      os.path.join(directory, model_file),
+      sess_options=options,
+      providers=["CPUExecutionProvider"],
+    )
+
+  def encode(self, docs: list[str]) -> np.ndarray:
+    if len(docs) == 0:
+      return np.empty((0, self.config["dims"]), dtype=np.float32)
+
+    features = text_encoding.tokenize(self.tokenizer, docs, self.input_names)
+    token_embeddings = self.session.run(["last_hidden_state"], features)[0]
+
+    embeddings = text_encoding.pool(token_embeddings, features["attention_mask"], self.pooling)
+    if self.normalize:
+      embeddings = text_encoding.normalize(embeddings)
+    return embeddings.astype(np.float32, copy=False)
+
+  @classmethod
+  def load(cls, directory: str, quantized: bool = False, intra_op_threads: int = 0) -> EmbeddingsModelContainer:
+    backend = cls(directory, quantized=quantized, intra_op_threads=intra_op_threads)
+    ec = EmbeddingsModelContainer(backend, backend.config["embeddings_model_name"])
+    ec.save_date = backend.config.get("save_date", None)
+    return ec
@@ -0,0 +1,49 @@
+import os
+
+# Describes the 'Transformer -> Pooling -> Normalize' pipeline of a sentence-transformers model,
+# so it can be reproduced without sentence-transformers, see text_encoding.py.
+# Only used when exporting models, needs sentence-transformers.
+
+
+def get_transformer(st):
+  from sentence_transformers import models
+
+  transformer = st[0]
+  if not isinstance(transformer, models.Transformer):
+    raise ValueError(f"the first module of the model must be a Transformer, got {type(transformer)}")
+  return transformer
+
+
+def get_pipeline_config(st) -> dict:
+  from sentence_transformers import models
+
+  transformer = get_transformer(st)
+  pooling = next((m for m in st if isinstance(m, models.Pooling)), None)
+  if pooling is None:
+    raise ValueError("the model has no Pooling module")
+
+  if pooling.pooling_mode_cls_token:
+    pooling_mode = "cls"
+  elif pooling.pooling_mode_max_tokens:
+    pooling_mode = "max"
+  elif pooling.pooling_mode_mean_tokens:
+    pooling_mode = "mean"
+  else:
+    raise ValueError(f"unsupported pooling configuration: {pooling.get_config_dict()}")
+
+  tokenizer = transformer.tokenizer
+  return {
+    "input_names": [n for n in ["input_ids", "attention_mask", "token_type_ids"] if n in tokenizer.model_input_names],
+    "max_seq_length": st.max_seq_length,
+    "pad_token": tokenizer.pad_token,
+    "pad_id": tokenizer.pad_token_id,
+    "pooling": pooling_mode,
+    "normalize": any(isinstance(m, models.Normalize) for m in st),
+    "dims": st.get_sentence_embedding_dimension(),
+  }
+
+
+def save_tokenizer(st, directory: str, tokenizer_file: str):
+  get_transformer(st).tokenizer.save_pretrained(directory)
+  if not os.path.exists(os.path.join(directory, tokenizer_file)):
+    raise ValueError(f"the model doesn't have a fast tokenizer, '{tokenizer_file}' could not be saved")
@@ -0,0 +1,45 @@
+from tokenizers import Tokenizer
+import numpy as np
+
+# Tokenization and pooling shared by the embeddings backends which don't use sentence-transformers.
+# These reproduce the 'Transformer -> Pooling -> Normalize' pipeline of a sentence-transformers model.
+
+POOLING_MODES = ["mean", "cls", "max"]
+
+
+def load_tokenizer(path: str, max_seq_length: int, pad_token: str, pad_id: int) -> Tokenizer:
+  tokenizer = Tokenizer.from_file(path)
+  tokenizer.enable_truncation(max_length=max_seq_length)
+  tokenizer.enable_padding(pad_id=pad_id, pad_token=pad_token)
+  return tokenizer
+
+
+def tokenize(tokenizer: Tokenizer, docs: list[str], input_names: list[str]) -> dict[str, np.ndarray]:
+  encodings = tokenizer.encode_batch(docs)
+
+  features = {
+    "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+    "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+    "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+  }
+  return {name: features[name] for name in input_names}
+
+
+def pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+  if mode == "cls":
+    return token_embeddings[:, 0]
+
+  mask = attention_mask[:, :, np.newaxis].astype(token_embeddings.dtype)
+  if mode == "max":
+    masked = np.where(mask > 0, token_embeddings, np.finfo(token_embeddings.dtype).min)
+    return masked.max(axis=1)
+
+  # mean of the embeddings of the non-padding tokens
+  summed = (token_embeddings * mask).sum(axis=1)
+  counts = np.clip(mask.sum(axis=1), a_min=1e-9, a_max=None)
+  return summed / counts
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+  norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+  return embeddings / np.clip(norms, a_min=1e-12, a_max=None)
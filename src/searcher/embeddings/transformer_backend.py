@@ -0,0 +1,109 @@
+from . import text_encoding
+import numpy as np
+import struct
+import json
+import mmap
+import os
+
+# torch embeddings backend for the container directory format, see EmbeddingsModelContainer.save_dir.
+# Doesn't need sentence-transformers, the weights are memory-mapped from the safetensors file,
+# so every worker process on a host shares the same pages from the page cache.
+
+SAFETENSORS_DTYPES = {
+  "F64": "float64",
+  "F32": "float32",
+  "F16": "float16",
+  "BF16": "bfloat16",
+  "I64": "int64",
+  "I32": "int32",
+  "I16": "int16",
+  "I8": "int8",
+  "U8": "uint8",
+  "BOOL": "bool",
+}
+
+
+def load_safetensors_mmap(path: str) -> tuple[dict, mmap.mmap]:
+  """Returns torch tensors backed by a memory map of the safetensors file, and the memory map itself."""
+  import torch
+
+  with open(path, 'rb') as f:
+    header_size = struct.unpack("<Q", f.read(8))[0]
+    header = json.loads(f.read(header_size))
+
+    # copy-on-write mapping: pages are shared through the page cache as long as they're only read,
+    # unlike a read-only mapping it can back writable tensors
+    weights = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+  data_start = 8 + header_size
+  tensors = {}
+  for name, info in header.items():
+    if name == "__metadata__":
+      continue
+
+    dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+    start, end = info["data_offsets"]
+    if start == end:
+      tensors[name] = torch.empty(info["shape"], dtype=dtype)
+      continue
+
+    count = (end - start) // dtype.itemsize
+    tensors[name] = torch.frombuffer(weights, dtype=dtype, count=count, offset=data_start + start).reshape(info["shape"])
+
+  return tensors, weights
+
+
+class TransformerEmbeddingsBackend:
+
+  def __init__(self, directory: str, manifest: dict):
+    import torch
+    from transformers import AutoConfig, AutoModel
+
+    self.manifest = manifest
+    self.pooling = manifest["pooling"]
+    self.normalize = manifest["normalize"]
+    self.input_names = manifest["input_names"]
+    self.tokenizer = text_encoding.load_tokenizer(
+      os.path.join(directory, manifest["tokenizer"]),
+      max_seq_length=manifest["max_seq_length"],
+      pad_token=manifest["pad_token"],
+      pad_id=manifest["pad_id"],
+    )
+
+    # build the model without allocating or initializing any weights, they are assigned from the memory map
+    config = AutoConfig.from_pretrained(os.path.join(directory, manifest["config"]))
+    with torch.device("meta"):
+      model = AutoModel.from_config(config)
+
+    tensors, self.weights = load_safetensors_mmap(os.path.join(directory, manifest["weights"]))
+    for name, tensor in tensors.items():
+      module_name, _, attr = name.rpartition(".")
+      module = model.get_submodule(module_name)
+      if attr in module._parameters:
+        module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+      elif attr in module._buffers:
+        module._buffers[attr] = tensor
+      else:
+        raise ValueError(f"unexpected tensor '{name}' in {manifest['weights']}")
+
+    missing = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if len(missing) > 0:
+      raise ValueError(f"no weights found for {missing} in {manifest['weights']}")
+
+    self.model = model.eval()
+
+  def encode(self, docs: list[str]) -> np.ndarray:
+    import torch
+
+    if len(docs) == 0:
+      return np.empty((0, self.manifest["dims"]), dtype=np.float32)
+
+    features = text_encoding.tokenize(self.tokenizer, docs, self.input_names)
+    with torch.inference_mode():
+      output = self.model(**{k: torch.from_numpy(v) for k, v in features.items()})
+    token_embeddings = output[0].float().numpy()
+
+    embeddings = text_encoding.pool(token_embeddings, features["attention_mask"], self.pooling)
+    if self.normalize:
+      embeddings = text_encoding.normalize(embeddings)
+    return embeddings.astype(np.float32, copy=False)
@@ -1,2 +1,8 @@
 from .repository import Repository
-from .elasticsearch_repository import ElasticsearchRepository
\ No newline at end of file
+from .elasticsearch_repository import ElasticsearchRepository
+from .delegating_repository import DelegatingRepository
+from .hot_window_repository import HotWindowRepository
+from .sqlite_repository import SqliteRepository
+from .categories_snapshot_repository import CategoriesSnapshotRepository
+from .topics_replica_repository import TopicsReplicaRepository
+from .article_rollup_repository import ArticleRollupRepository
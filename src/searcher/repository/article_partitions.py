@@ -0,0 +1,73 @@
+from .document_mapping import to_epoch_ms
+from datetime import datetime, timezone
+import re
+
+
+class ArticlePartitions:
+  """
+  The monthly article indices behind the articles alias, named '<alias>-YYYY.MM' after the UTC month of the articles' publish date.
+  The searches are only sent to the indices of the months their date range overlaps.
+  """
+
+  def __init__(self, alias: str):
+    self.alias = alias
+    self.pattern = re.compile(re.escape(alias) + r"-(\d{4})\.(\d{2})")
+    # (start, end) of the month in epoch milliseconds, and its index, by start
+    self.months: list[tuple[int, int, str]] = []
+
+    self.searches = 0
+    self.pruned = 0
+
+  def index_name(self, date: datetime | int) -> str:
+    date = datetime.fromtimestamp(to_epoch_ms(date) / 1000, tz=timezone.utc)
+    return f"{self.alias}-{date.year:04d}.{date.month:02d}"
+
+  def month_of(self, index: str) -> tuple[int, int] | None:
+    # the start and end of the month of a partition, None if the index isn't one
+    match = self.pattern.fullmatch(index)
+    if match is None:
+      return None
+    year, month = int(match.group(1)), int(match.group(2))
+    if month < 1 or month > 12:
+      return None
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return to_epoch_ms(start), to_epoch_ms(end)
+
+  def update(self, indices: list[str]):
+    months = []
+    for index in indices:
+      month = self.month_of(index)
+      if month is not None:
+        months.append((*month, index))
+    self.months = sorted(months)
+
+  def indices(self, date_min: datetime | int | None, date_max: datetime | int | None) -> str:
+    """The indices to search for articles published between 'date_min' and 'date_max' (both included)."""
+    self.searches += 1
+    if len(self.months) == 0:
+      return self.alias
+
+    min_ms = to_epoch_ms(date_min) if date_min is not None else None
+    max_ms = to_epoch_ms(date_max) if date_max is not None else None
+    selected = [
+      index for start, end, index in self.months
+      if (max_ms is None or start <= max_ms) and (min_ms is None or end > min_ms)
+    ]
+    if len(selected) == len(self.months):
+      return self.alias
+
+    self.pruned += 1
+    if len(selected) == 0:
+      # no article can match, a single index is searched for the empty response
+      return self.months[-1][2]
+    return ",".join(selected)
+
+  def stats(self) -> dict:
+    return {
+      "partitions": len(self.months),
+      "first": self.months[0][2] if len(self.months) > 0 else None,
+      "last": self.months[-1][2] if len(self.months) > 0 else None,
+      "searches": self.searches,
+      "pruned": self.pruned,
+    }
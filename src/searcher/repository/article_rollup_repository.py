@@ -0,0 +1,206 @@
+from ..utils import log_utils
+from ..dto.article_histogram_query import ArticleHistogramQuery, HistogramInterval
+from ..domain.histogram import ArticleHistogram
+from .delegating_repository import DelegatingRepository
+from .repository import Repository
+from .document_mapping import tokenize, to_epoch_ms
+from .date_histogram import histogram_of_days, floor_day, ceil_day, to_utc
+from datetime import datetime, timezone
+import logging
+import asyncio
+import time
+
+
+class ArticleRollupRepository(DelegatingRepository):
+  """
+  Serves article histograms from daily rollups: the number of articles published on each day,
+  in total and by source, category id and topic id.
+  A day is rolled up once it ended 'close_delay_seconds' ago, so the articles indexed late are still counted,
+  the days after it are counted by the wrapped repository, with every search.
+  The rollups are rebuilt every 'rebuild_seconds', for the articles indexed even later, or deleted.
+  Only the histograms filtered by the rollup dimensions can be served, by a single category or topic id,
+  the rest are passed on to the wrapped repository.
+  """
+
+  def __init__(
+      self,
+      repo: Repository,
+      refresh_seconds: float = 300,
+      close_delay_seconds: float = 3600,
+      rebuild_seconds: float = 86400,
+      log_level: int = logging.INFO
+  ):
+    super().__init__(repo)
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    self.refresh_seconds = refresh_seconds
+    self.close_delay_ms = int(close_delay_seconds * 1000)
+    self.rebuild_seconds = rebuild_seconds
+
+    # day (epoch milliseconds of its UTC start) -> {"total": count, dimension: {value: count}}
+    self.days: dict[int, dict] = {}
+    # the days before this are rolled up, None until the first build
+    self.closed_until: int | None = None
+    self.sources: set[str] = set()
+
+    self.refresher: asyncio.Task | None = None
+    self.rebuild_at = 0.0
+    self.generation = 0
+
+    self.served = 0
+    self.passed_on = 0
+    self.builds = 0
+    self.failed_builds = 0
+    self.build_seconds = 0.0
+    self.built_at: datetime | None = None
+
+  async def start(self):
+    await super().start()
+    # histograms are passed on until the first build is done
+    self.refresher = asyncio.create_task(self.__refresh_periodically())
+
+  async def __refresh_periodically(self):
+    while True:
+      try:
+        await self.refresh()
+      except asyncio.CancelledError:
+        raise
+      except Exception as e:
+        self.failed_builds += 1
+        self.log.error("failed to build the article rollups", exc_info=e)
+      await asyncio.sleep(self.refresh_seconds)
+
+  async def refresh(self):
+    start = time.perf_counter()
+    closed_until = floor_day(to_epoch_ms(datetime.now(timezone.utc)) - self.close_delay_ms)
+    rebuild = self.closed_until is None or time.monotonic() >= self.rebuild_at
+
+    if rebuild:
+      days = {}
+      date_min = None
+    elif closed_until > self.closed_until:
+      # only the days closed since the last build
+      days = dict(self.days)
+      date_min = to_utc(self.closed_until)
+    else:
+      return
+
+    rolled_up = 0
+    async for day, rollup in self.repo.scan_article_rollups(date_min, to_utc(closed_until)):
+      days[day] = rollup
+      rolled_up += 1
+
+    if rebuild:
+      self.rebuild_at = time.monotonic() + self.rebuild_seconds
+    self.days = days
+    self.closed_until = closed_until
+    self.sources = set(source for rollup in days.values() for source in rollup["source"])
+    self.generation += 1
+
+    self.builds += 1
+    self.build_seconds = time.perf_counter() - start
+    self.built_at = datetime.now(timezone.utc)
+    self.log.info(
+      f"{'rebuilt' if rebuild else 'updated'} article rollups with {rolled_up} days in {self.build_seconds:.3f}s, "
+      f"rolled up until {to_utc(closed_until).isoformat()}"
+    )
+
+  def __rollup_selection(self, histogram_query: ArticleHistogramQuery) -> tuple[str | None, list[str]] | None:
+    # the dimension and its values the query is filtered by, None if the rollups can't serve it
+    q = histogram_query
+    if q.query or q.author or q.categories or q.topic or q.ids:
+      return None
+
+    selections = []
+    if q.source:
+      # an article has a single source, so the counts of every matching one are summed up
+      # matched like the 'match' query of the source, by any of its tokens
+      tokens = set(tokenize(q.source))
+      selections.append(("source", [s for s in self.sources if len(tokens & set(tokenize(s))) > 0]))
+    # an article can have several categories and topics, their counts can't be summed up
+    for dimension, values in [("category_ids", q.category_ids), ("topic_ids", q.topic_ids)]:
+      if values:
+        if len(set(values)) > 1:
+          return None
+        selections.append((dimension, list(set(values))))
+
+    if len(selections) > 1:
+      return None
+    return selections[0] if len(selections) > 0 else (None, [])
+
+  async def histogram_articles(self, histogram_query: ArticleHistogramQuery) -> ArticleHistogram:
+    selection = self.__rollup_selection(histogram_query) if self.closed_until is not None else None
+    if selection is None:
+      self.passed_on += 1
+      return await self.repo.histogram_articles(histogram_query)
+
+    days, closed_until = self.days, self.closed_until
+    date_min = to_epoch_ms(histogram_query.date_min) if histogram_query.date_min is not None else None
+    date_max = to_epoch_ms(histogram_query.date_max) if histogram_query.date_max is not None else None
+
+    # the whole days of the queried range which are rolled up
+    first = ceil_day(date_min) if date_min is not None else None
+    end = closed_until if date_max is None else min(closed_until, floor_day(date_max + 1))
+    if first is not None and first >= end:
+      self.passed_on += 1
+      return await self.repo.histogram_articles(histogram_query)
+
+    self.served += 1
+    dimension, values = selection
+    counts = {}
+    for day, rollup in days.items():
+      if (first is None or day >= first) and day < end:
+        counts[day] = rollup["total"] if dimension is None else sum(rollup[dimension].get(v, 0) for v in values)
+
+    # the partial first day, and the days which aren't rolled up yet, are counted by the wrapped repository
+    live_ranges = []
+    if date_min is not None and date_min < first:
+      live_ranges.append((date_min, first - 1))
+    if date_max is None or end <= date_max:
+      live_ranges.append((end, date_max))
+    live = await asyncio.gather(*[
+      self.repo.histogram_articles(histogram_query.model_copy(update={
+        "date_min": to_utc(live_min),
+        "date_max": to_utc(live_max) if live_max is not None else None,
+        "interval": HistogramInterval.day,
+      })) for live_min, live_max in live_ranges
+    ])
+    for histogram in live:
+      for bucket in histogram.buckets:
+        day = to_epoch_ms(bucket.start)
+        counts[day] = counts.get(day, 0) + bucket.count
+
+    return histogram_of_days(counts, histogram_query.interval)
+
+  async def index_generations(self) -> dict[str, object]:
+    # the histograms change when the rollups are rebuilt, which is later than the index
+    generations = await self.repo.index_generations()
+    generations["articles"] = (generations.get("articles", None), self.generation)
+    return generations
+
+  async def close(self):
+    if self.refresher is not None:
+      self.refresher.cancel()
+      try:
+        await self.refresher
+      except asyncio.CancelledError:
+        pass
+      self.refresher = None
+    await super().close()
+
+  def stats(self) -> dict:
+    stats = self.repo.stats()
+    stats["article_rollups"] = {
+      "ready": self.closed_until is not None,
+      "days": len(self.days),
+      "closed_until": to_utc(self.closed_until).isoformat() if self.closed_until is not None else None,
+      "built_at": self.built_at.isoformat() if self.built_at is not None else None,
+      "build_seconds": self.build_seconds,
+      "builds": self.builds,
+      "failed_builds": self.failed_builds,
+      "served": self.served,
+      "passed_on": self.passed_on,
+    }
+    return stats
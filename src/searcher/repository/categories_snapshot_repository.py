@@ -0,0 +1,158 @@
+from ..utils import log_utils
+from ..dto.category_query import CategoryQuery
+from ..domain.category import Category, CategoryList
+from .delegating_repository import DelegatingRepository
+from .repository import Repository, BatchSearch, BatchSearchResult
+from .token_index import TokenIndex
+from datetime import datetime, timezone
+import logging
+import asyncio
+import time
+
+
+class CategoriesSnapshot:
+  """
+  Every category, with a token index of the names for 'match' queries.
+  Query tokens without an exact match match the tokens starting with them, so partially typed names find their category.
+  """
+
+  def __init__(self, docs: list[dict]):
+    self.ids = [d["_id"] for d in docs]
+    self.names = [d["_source"]["name"] for d in docs]
+    self.id_to_row = {id: row for row, id in enumerate(self.ids)}
+    self.name_index = TokenIndex(self.names)
+
+  def search(self, category_query: CategoryQuery) -> CategoryList:
+    rows = None
+    if category_query.ids is not None and len(category_query.ids) > 0:
+      rows = set(self.id_to_row[id] for id in category_query.ids if id in self.id_to_row)
+
+    if category_query.query is not None:
+      scores = self.name_index.score(category_query.query, expand_prefixes=True)
+      matches = [(row, score) for row, score in scores.items() if rows is None or row in rows]
+      # like Elasticsearch, the best matches first, then in index order
+      matches.sort(key=lambda m: (-m[1], m[0]))
+      matched = [row for row, _ in matches]
+    elif rows is not None:
+      matched = sorted(rows)
+    else:
+      matched = range(len(self.ids))
+
+    start = category_query.page * category_query.page_size
+    end = start + category_query.page_size
+    return CategoryList(
+      total_count=len(matched),
+      categories=[Category(id=self.ids[row], name=self.names[row]) for row in matched[start:end]],
+    )
+
+
+class CategoriesSnapshotRepository(DelegatingRepository):
+  """
+  Serves category searches from an in-memory snapshot of every category, without requests to Elasticsearch.
+  The snapshot is reloaded in the background, so it's at most 'refresh_seconds' behind.
+  """
+
+  def __init__(
+      self,
+      repo: Repository,
+      refresh_seconds: float = 300,
+      log_level: int = logging.INFO
+  ):
+    super().__init__(repo)
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    self.refresh_seconds = refresh_seconds
+
+    self.snapshot: CategoriesSnapshot | None = None
+    self.refresher: asyncio.Task | None = None
+    self.generation = 0
+
+    self.served = 0
+    self.passed_on = 0
+    self.load_seconds = 0.0
+    self.failed_loads = 0
+    self.loaded_at: datetime | None = None
+
+  async def start(self):
+    await super().start()
+    # searches are passed on until the first load is done
+    self.refresher = asyncio.create_task(self.__refresh_periodically())
+
+  async def __refresh_periodically(self):
+    while True:
+      try:
+        await self.refresh()
+      except asyncio.CancelledError:
+        raise
+      except Exception as e:
+        self.failed_loads += 1
+        self.log.error("failed to load the categories", exc_info=e)
+      await asyncio.sleep(self.refresh_seconds)
+
+  async def refresh(self):
+    start = time.perf_counter()
+    docs = [doc async for doc in self.repo.scan_categories()]
+    self.snapshot = CategoriesSnapshot(docs)
+    self.generation += 1
+    self.load_seconds = time.perf_counter() - start
+    self.loaded_at = datetime.now(timezone.utc)
+    self.log.info(f"loaded {len(docs)} categories in {self.load_seconds:.3f}s")
+
+  async def search_categories(self, category_query: CategoryQuery) -> CategoryList:
+    snapshot = self.snapshot
+    if snapshot is None:
+      self.passed_on += 1
+      return await self.repo.search_categories(category_query)
+    self.served += 1
+    return snapshot.search(category_query)
+
+  async def search_batch(self, searches: list[BatchSearch]) -> list[BatchSearchResult]:
+    if self.snapshot is None:
+      return await self.repo.search_batch(searches)
+
+    results = [None] * len(searches)
+    passed_on = []
+    for i, (query, _) in enumerate(searches):
+      if isinstance(query, CategoryQuery):
+        results[i] = await self.search_categories(query)
+      else:
+        passed_on.append(i)
+
+    if len(passed_on) > 0:
+      passed_on_results = await self.repo.search_batch([searches[i] for i in passed_on])
+      for i, result in zip(passed_on, passed_on_results):
+        results[i] = result
+    return results
+
+  async def index_generations(self) -> dict[str, object]:
+    # the category searches change when the snapshot is reloaded
+    generations = await self.repo.index_generations()
+    generations["categories"] = (generations.get("categories", None), self.generation)
+    return generations
+
+  async def close(self):
+    if self.refresher is not None:
+      self.refresher.cancel()
+      try:
+        await self.refresher
+      except asyncio.CancelledError:
+        pass
+      self.refresher = None
+    await super().close()
+
+  def stats(self) -> dict:
+    snapshot = self.snapshot
+    stats = self.repo.stats()
+    stats["categories_snapshot"] = {
+      "ready": snapshot is not None,
+      "categories": len(snapshot.ids) if snapshot is not None else 0,
+      "tokens": len(snapshot.name_index.tokens) if snapshot is not None else 0,
+      "loaded_at": self.loaded_at.isoformat() if self.loaded_at is not None else None,
+      "load_seconds": self.load_seconds,
+      "failed_loads": self.failed_loads,
+      "served": self.served,
+      "passed_on": self.passed_on,
+    }
+    return stats
@@ -0,0 +1,52 @@
+from ..dto.article_histogram_query import HistogramInterval
+from ..domain.histogram import ArticleHistogram, HistogramBucket
+from datetime import datetime, timedelta, timezone
+
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def floor_day(epoch_ms: int) -> int:
+  return epoch_ms - epoch_ms % DAY_MS
+
+
+def ceil_day(epoch_ms: int) -> int:
+  return floor_day(epoch_ms + DAY_MS - 1)
+
+
+def to_utc(epoch_ms: int) -> datetime:
+  return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+
+
+def bucket_start(day: datetime, interval: HistogramInterval) -> datetime:
+  if interval == HistogramInterval.week:
+    return day - timedelta(days=day.weekday())
+  if interval == HistogramInterval.month:
+    return day.replace(day=1)
+  return day
+
+
+def next_bucket(start: datetime, interval: HistogramInterval) -> datetime:
+  if interval == HistogramInterval.week:
+    return start + timedelta(days=7)
+  if interval == HistogramInterval.month:
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+  return start + timedelta(days=1)
+
+
+def histogram_of_days(day_counts: dict[int, int], interval: HistogramInterval) -> ArticleHistogram:
+  # sums up the counts of the days (epoch milliseconds of their UTC start) into the buckets of the interval,
+  # from the first to the last bucket with articles, like Elasticsearch's 'date_histogram' without bounds
+  counts: dict[datetime, int] = {}
+  for day, count in day_counts.items():
+    if count > 0:
+      start = bucket_start(to_utc(day), interval)
+      counts[start] = counts.get(start, 0) + count
+
+  buckets = []
+  if len(counts) > 0:
+    start, last = min(counts), max(counts)
+    while start <= last:
+      buckets.append(HistogramBucket(start=start, count=counts.get(start, 0)))
+      start = next_bucket(start, interval)
+  return ArticleHistogram(buckets=buckets)
@@ -0,0 +1,98 @@
+from .repository import Repository, BatchSearch, BatchSearchResult
+from ..dto.article_query import ArticleQuery
+from ..dto.topic_query import TopicQuery
+from ..dto.topic_batch_query import TopicBatchQuery
+from ..dto.category_query import CategoryQuery
+from ..dto.article_facet_query import ArticleFacetQuery
+from ..dto.article_histogram_query import ArticleHistogramQuery
+from ..domain.article import ArticleList
+from ..domain.topic import TopicList, TopicBatchList
+from ..domain.category import CategoryList
+from ..domain.facet import ArticleFacets
+from ..domain.histogram import ArticleHistogram
+from datetime import datetime
+from typing import AsyncIterator
+
+
+class DelegatingRepository(Repository):
+  """
+  Forwards every call to the wrapped repository.
+  Subclasses override the calls they can serve themselves, and fall back to the wrapped repository otherwise.
+  """
+
+  def __init__(self, repo: Repository):
+    self.repo = repo
+
+  async def search_articles_combined(self, article_query: ArticleQuery, embeddings: list, depth: int | None = None) -> ArticleList:
+    return await self.repo.search_articles_combined(article_query, embeddings, depth)
+
+  async def search_articles_text(self, article_query: ArticleQuery) -> ArticleList:
+    return await self.repo.search_articles_text(article_query)
+
+  async def search_articles_embeddings(self, article_query: ArticleQuery, embeddings: list) -> ArticleList:
+    return await self.repo.search_articles_embeddings(article_query, embeddings)
+
+  async def get_topic_batches(self, topic_batch_query: TopicBatchQuery) -> TopicBatchList:
+    return await self.repo.get_topic_batches(topic_batch_query)
+
+  async def search_topics(self, topic_query: TopicQuery) -> TopicList:
+    return await self.repo.search_topics(topic_query)
+
+  async def facet_articles(self, facet_query: ArticleFacetQuery) -> ArticleFacets:
+    return await self.repo.facet_articles(facet_query)
+
+  async def histogram_articles(self, histogram_query: ArticleHistogramQuery) -> ArticleHistogram:
+    return await self.repo.histogram_articles(histogram_query)
+
+  async def search_categories(self, category_query: CategoryQuery) -> CategoryList:
+    return await self.repo.search_categories(category_query)
+
+  async def search_batch(self, searches: list[BatchSearch]) -> list[BatchSearchResult]:
+    return await self.repo.search_batch(searches)
+
+  async def count_articles(self, article_query: ArticleQuery) -> int:
+    return await self.repo.count_articles(article_query)
+
+  async def count_topics(self, topic_query: TopicQuery) -> int:
+    return await self.repo.count_topics(topic_query)
+
+  async def count_topic_batches(self, topic_batch_query: TopicBatchQuery) -> int:
+    return await self.repo.count_topic_batches(topic_batch_query)
+
+  async def index_generations(self) -> dict[str, object]:
+    return await self.repo.index_generations()
+
+  # the wrapped Elasticsearch repository's scans, so the wrappers can be stacked
+
+  def scan_articles(self, date_min: datetime) -> AsyncIterator[dict]:
+    return self.repo.scan_articles(date_min)
+
+  def scan_categories(self) -> AsyncIterator[dict]:
+    return self.repo.scan_categories()
+
+  def scan_article_rollups(self, date_min: datetime | None, date_max: datetime) -> AsyncIterator[tuple[int, dict]]:
+    return self.repo.scan_article_rollups(date_min, date_max)
+
+  def scan_topics(self, create_time_min: int | None = None) -> AsyncIterator[dict]:
+    return self.repo.scan_topics(create_time_min)
+
+  def scan_topic_batches(self, create_time_min: int | None = None) -> AsyncIterator[dict]:
+    return self.repo.scan_topic_batches(create_time_min)
+
+  async def latest_create_times(self) -> dict[str, int | None]:
+    return await self.repo.latest_create_times()
+
+  async def assert_indices(self):
+    await self.repo.assert_indices()
+
+  async def ping(self) -> bool:
+    return await self.repo.ping()
+
+  async def start(self):
+    await self.repo.start()
+
+  async def close(self):
+    await self.repo.close()
+
+  def stats(self) -> dict:
+    return self.repo.stats()
@@ -0,0 +1,337 @@
+from ..domain.article import *
+from ..domain.topic import *
+from ..domain.category import *
+from ..domain.facet import *
+from datetime import datetime, timezone
+import re
+
+
+# Elasticsearch returns this many hits when no 'size' is given, the kNN search relies on it
+ES_DEFAULT_SIZE = 10
+
+# only this many paragraphs of an article are returned
+PARAGRAPHS_PREVIEW_COUNT = 3
+# the script field of the first paragraphs, when they aren't fetched from '_source'
+PARAGRAPHS_PREVIEW_FIELD = "paragraphs_preview"
+
+# maps requested keys to the model's keys, for selecting returned attributes
+article_search_keys_to_repo_model = {
+  "id": "id_is_always_returned", # causes nothing to be returned for the 'id', but the source's '_id' is used which is always returned
+  "categories": [
+    "article.categories",
+    "analyzer.category_ids",
+  ],
+  "topics": "topics",
+  "url": "article.url",
+  "publish_date": "article.publish_date",
+  "source": "article.source",
+  "image": "article.image",
+  "author": "article.author",
+  "title": "article.title",
+  "paragraphs": "article.paragraphs",
+}
+
+# maps requested keys to the model's keys, for selecting returned attributes
+topic_search_keys_to_repo_model = {
+  "id": "id_is_always_returned", # causes nothing to be returned for the 'id', but the source's '_id' is used which is always returned
+  "batch_id": "batch_id",
+  "batch_query": "batch_query",
+  "topic": "topic",
+  "count": "count",
+  "representative_articles": "representative_articles",
+}
+
+# maps requested sort keys to the model's keys, for creating the sort query
+topic_sort_keys_to_repo_model = {
+  "date_min": "query.publish_date.start",
+  "date_max": "query.publish_date.end",
+  "count": "count",
+}
+
+topic_batch_search_keys_to_repo_model = {
+  "id": "id_is_always_returned", # causes nothing to be returned for the 'id', but the source's '_id' is used which is always returned
+  "query": "query",
+  "article_count": "article_count",
+  "create_time": "create_time",
+}
+
+
+# maps requested facets to the keyword fields whose values are counted
+article_facet_keys_to_repo_model = {
+  "source": "article.source.keyword",
+  "categories": "article.categories.names.keyword",
+  "topics": "topics.topic_ids",
+}
+
+# the dimensions of the daily article rollups, and the keyword fields whose values they're counted by
+article_rollup_dimensions_to_repo_model = {
+  "source": "article.source.keyword",
+  "category_ids": "article.categories.ids",
+  "topic_ids": "topics.topic_ids",
+}
+
+
+def map_keys(keys: list[str] | None, mapping: dict) -> list[str] | None:
+  # reverse mapping from DTO keys to repo model
+  if keys is None:
+    # returns every key by default
+    return None 
+
+  mapped = []
+  for k in keys:
+    if type(mapping[k]) == str:
+      mapped.append(mapping[k])
+    elif type(mapping[k]) == list:
+      mapped.extend(mapping[k])
+  return mapped
+
+
+def tokenize(text: str) -> list[str]:
+  # close to Elasticsearch's standard analyzer
+  return re.findall(r"\w+", text.lower())
+
+
+def to_epoch_ms(date: datetime | str | int) -> int:
+  if isinstance(date, int):
+    return date
+  if isinstance(date, str):
+    date = datetime.fromisoformat(date)
+  # Elasticsearch treats dates without a timezone as UTC
+  if date.tzinfo is None:
+    date = date.replace(tzinfo=timezone.utc)
+  return int(date.timestamp() * 1000)
+
+
+def get_path(source: dict, path: list[str]):
+  value = source
+  for k in path:
+    if not isinstance(value, dict):
+      return None
+    value = value.get(k, None)
+  return value
+
+
+def filter_source(source: dict, includes: list[str] | None) -> dict:
+  # same as Elasticsearch's '_source' filtering with 'source_includes', for documents held in memory
+  if includes is None:
+    return source
+
+  filtered = {}
+  for path in includes:
+    keys = path.split('.')
+    value = source
+    for k in keys:
+      if not isinstance(value, dict) or k not in value:
+        value = None
+        break
+      value = value[k]
+    if value is None:
+      continue
+
+    target = filtered
+    for k in keys[:-1]:
+      target = target.setdefault(k, {})
+    target[keys[-1]] = value
+  return filtered
+
+
+def map_total(doc_hits: dict) -> tuple[int | None, str | None]:
+  # the total is missing if it isn't tracked, and only a lower bound ('gte') if it's tracked up to a limit
+  total = doc_hits.get('total', None)
+  if total is None:
+    return None, None
+  return total['value'], total.get('relation', None)
+
+
+def map_to_articles(doc_hits: dict) -> ArticleList:
+  # map from repo model to domain model
+
+  articles: list[Article] = []
+
+  total_count, total_relation = map_total(doc_hits)
+
+  for doc in doc_hits["hits"]:
+    # missing if only the ids are requested
+    source = doc.get('_source', {})
+
+    # at least the '_id' field should always be present
+    id = doc.get('_id', None)
+
+    if id is None:
+      raise ValueError(f"no '_id' field found in doc: {doc}")
+
+    article = Article(id=id)
+    if 'article' in source:
+      art = source['article']
+      article.url = art.get('url', None)
+      article.source = art.get('source', None)
+      article.publish_date = art.get('publish_date', None)
+      article.image = art.get('image', None)
+      author = art.get('author', None)
+      article.author = "\n".join(author) if author is not None else None
+      title = art.get('title', None)
+      article.title = "\n".join(title) if title is not None else None
+      paragraphs = art.get('paragraphs', None)
+      article.paragraphs = paragraphs[:PARAGRAPHS_PREVIEW_COUNT] if paragraphs is not None else None # only take the first 3 paragraphs
+
+      categories = art.get('categories', None)
+      if categories:
+        article.categories = [
+          Category(
+            id=id,
+            name=name
+          ) for id, name in zip(categories['ids'], categories['names'])
+        ] 
+
+    fields = doc.get('fields', None)
+    if fields is not None and PARAGRAPHS_PREVIEW_FIELD in fields:
+      # already trimmed by Elasticsearch
+      paragraphs = [p for p in fields[PARAGRAPHS_PREVIEW_FIELD] if p is not None]
+      article.paragraphs = paragraphs if len(paragraphs) > 0 else None
+
+    if 'analyzer' in source:
+      # TODO: embeddings are never returned, they are excluded from every search
+      analyzer = source['analyzer']
+      article.embeddings = analyzer.get('embeddings', None)
+
+      # analyzed categories can only be constructed if the merged categories are present
+      analyzer_category_ids = analyzer.get('category_ids', None)
+      if analyzer_category_ids and article.categories:
+        article.analyzed_categories = [cat for cat in article.categories if cat.id in analyzer_category_ids]
+    
+    if 'topics' in source and source['topics'] is not None:
+      topics = source['topics']
+      article_topics = [ArticleTopic(
+        id=id, 
+        topic=topic) for id, topic in zip(topics['topic_ids'], topics['topic_names'])
+      ]
+      if len(article_topics) != 0:
+        article.topics = article_topics
+
+    articles.append(article)
+
+  res = ArticleList(articles=articles, total_count=total_count, total_relation=total_relation)
+  return res
+
+
+def map_to_topics(doc_hits: list[dict]) -> TopicList:
+  # convert to domain model
+
+  topics: list[Topic] = []
+  total_count, total_relation = map_total(doc_hits)
+
+  for doc in doc_hits['hits']:
+    source = doc['_source']
+
+    # at least the '_id' field should always be present
+    id = doc.get('_id', None)
+
+    if id is None:
+      raise ValueError(f"no '_id' field found in doc: {doc}")
+
+    topic = Topic(id=id)
+    topic.batch_id = source.get('batch_id', None)
+    topic.create_time = source.get('create_time', None)
+    topic.topic = source.get('topic', None)
+
+    if 'batch_query' in source:
+      topic.batch_query = TopicArticleQuery(
+        publish_date=PublishDateFilter(
+          start=datetime.fromisoformat(source['batch_query']['publish_date']['start']),
+          end=datetime.fromisoformat(source['batch_query']['publish_date']['end']),
+        )
+      )
+    topic.count = source.get('count', None)
+
+    if 'representative_articles' in source:
+      topic.representative_articles = [
+        TopicArticle(
+          id=ra['_id'],
+          url=ra['url'],
+          image=ra['image'] if 'image' in ra else None,
+          publish_date=datetime.fromisoformat(ra['publish_date']),
+          author=ra['author'],
+          title=ra['title'],
+        ) for ra in source['representative_articles']
+      ]
+
+    topics.append(topic)
+
+  res = TopicList(topics=topics, total_count=total_count, total_relation=total_relation)
+  return res
+
+
+def map_to_topic_batches(doc_hits: list[dict]) -> TopicBatchList:
+  # convert to domain model
+
+  topic_batches: list[TopicBatch] = []
+  total_count, total_relation = map_total(doc_hits)
+
+  for doc in doc_hits['hits']:
+    source = doc['_source']
+
+    # at least the '_id' field should always be present
+    id = doc.get('_id', None)
+
+    if id is None:
+      raise ValueError(f"no '_id' field found in doc: {doc}")
+
+    topic_batch = TopicBatch(id=id)
+
+    if 'query' in source:
+      topic_batch.query = TopicArticleQuery(
+        publish_date=PublishDateFilter(
+          start=datetime.fromisoformat(source['query']['publish_date']['start']),
+          end=datetime.fromisoformat(source['query']['publish_date']['end']),
+        )
+      )
+    topic_batch.article_count = source.get('article_count', None)
+    topic_batch.topic_count = source.get('topic_count', None)
+    topic_batch.create_time = source.get('create_time', None)
+
+    topic_batches.append(topic_batch)
+
+  res = TopicBatchList(batches=topic_batches, total_count=total_count, total_relation=total_relation)
+  return res
+
+
+def map_to_categories(doc_hits: list[dict]) -> CategoryList:
+  categories: list[Category] = []
+  total_count = doc_hits['total']['value']
+
+  for doc in doc_hits['hits']:
+    source = doc['_source']
+
+    # the '_id' field should always be present
+    id = doc.get('_id', None)
+    if id is None:
+      raise ValueError(f"no '_id' field found in doc: {doc}")
+
+    # the 'name' field should always be present
+    name = source.get('name', None)
+    if name is None:
+      raise ValueError(f"no 'name' field found in source of doc: {doc}")
+
+    categories.append(Category(
+      id=id, 
+      name=name
+    ))
+
+  res = CategoryList(
+    total_count=total_count,
+    categories=categories
+  )
+  return res
+
+
+def map_to_article_facets(res: dict) -> ArticleFacets:
+  # the 'terms' aggregations are named after the facets
+  return ArticleFacets(
+    total_count=res['hits']['total']['value'],
+    facets={
+      facet: [
+        FacetValue(value=str(bucket['key']), count=bucket['doc_count'])
+        for bucket in aggregation['buckets']
+      ] for facet, aggregation in res.get('aggregations', {}).items()
+    },
+  )
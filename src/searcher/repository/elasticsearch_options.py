@@ -0,0 +1,127 @@
+import pydantic
+from typing import Literal
+
+
+class VectorIndexOptions(pydantic.BaseModel):
+  # depends on the embeddings model
+  dims: int = 384
+
+  # 'dot_product' is the fastest, but needs unit-length vectors, both indexed and queried
+  similarity: Literal["cosine", "dot_product", "l2_norm", "max_inner_product"] | None = None
+
+  # 'int8_hnsw' keeps a scalar-quantized copy of the vectors for the graph search, ~4x less memory
+  index_type: Literal["hnsw", "int8_hnsw"] | None = None
+
+  # HNSW graph parameters
+  m: int | None = None
+  ef_construction: int | None = None
+
+  def to_mapping(self) -> dict:
+    # unset options are left out, so Elasticsearch uses its defaults
+    mapping = {
+      "type": "dense_vector",
+      "dims": self.dims,
+    }
+
+    if self.similarity is not None:
+      mapping["index"] = True
+      mapping["similarity"] = self.similarity
+
+    index_options = {}
+    if self.index_type is not None:
+      index_options["type"] = self.index_type
+    if self.m is not None:
+      index_options["m"] = self.m
+    if self.ef_construction is not None:
+      index_options["ef_construction"] = self.ef_construction
+
+    if len(index_options) > 0:
+      # 'type' is required once any index option is set
+      index_options.setdefault("type", "hnsw")
+      mapping["index"] = True
+      mapping["index_options"] = index_options
+
+    return mapping
+
+
+class TransportOptions(pydantic.BaseModel):
+  # aiohttp's pool size per Elasticsearch node, requests above it wait for a free connection
+  connections_per_node: int | None = None
+
+  # 'httpxasync' needs elastic-transport 8.13+
+  node_class: Literal["aiohttp", "httpxasync"] | None = None
+
+  # seconds, for the whole request, and for getting a connection (waiting for the pool and connecting)
+  request_timeout: float | None = None
+  connect_timeout: float | None = None
+
+  max_retries: int | None = None
+  retry_on_timeout: bool | None = None
+  retry_on_status: list[int] | None = None
+
+  # gzip the request bodies, and accept gzipped responses
+  http_compress: bool | None = None
+
+  # discover the nodes of the cluster at the first request, and after node failures
+  # the nodes' publish addresses must be reachable from the service
+  sniff: bool = False
+  sniff_interval: float | None = None
+
+  # connections opened at startup, so the first searches don't pay for connecting
+  warmup_connections: int = 0
+
+  def to_client_options(self) -> dict:
+    # unset options are left out, so the client uses its defaults
+    options = {}
+    for key in ["connections_per_node", "request_timeout", "max_retries", "retry_on_timeout", "retry_on_status", "http_compress"]:
+      value = getattr(self, key)
+      if value is not None:
+        options[key] = value
+
+    if self.connect_timeout is not None:
+      if self.node_class not in (None, "aiohttp"):
+        raise ValueError(f"'connect_timeout' is only supported with the 'aiohttp' node class, not '{self.node_class}'")
+      from .elasticsearch_transport import aiohttp_node_class
+      options["node_class"] = aiohttp_node_class(self.connect_timeout)
+    elif self.node_class is not None:
+      from elastic_transport._transport import NODE_CLASS_NAMES
+      if self.node_class not in NODE_CLASS_NAMES:
+        raise ValueError(
+          f"node class '{self.node_class}' isn't available in the installed elastic-transport, "
+          f"'httpxasync' needs elastic-transport 8.13+"
+        )
+      options["node_class"] = self.node_class
+
+    if self.sniff:
+      options["sniff_on_start"] = True
+      options["sniff_on_node_failure"] = True
+      if self.sniff_interval is not None:
+        options["sniff_before_requests"] = True
+        options["min_delay_between_sniffing"] = self.sniff_interval
+
+    return options
+
+
+class ArticleIndexOptions(pydantic.BaseModel):
+  # 'monthly': the articles are in monthly indices, '<articles index>-YYYY.MM' of the UTC month of their publish date,
+  # created from an index template which adds them to the 'articles' alias, the searches are only sent to the months they overlap
+  # the writers have to write every article to the index of its month
+  partitioning: Literal["none", "monthly"] = "none"
+
+  # settings of the created indices, unset ones are left to Elasticsearch's defaults
+  shards: int | None = None
+  replicas: int | None = None
+  refresh_interval: str | None = None
+
+  # how often the monthly indices are listed, the ones created by the writers are only searched after it
+  partitions_refresh_seconds: float = 60
+
+  def to_settings(self) -> dict:
+    settings = {}
+    if self.shards is not None:
+      settings["number_of_shards"] = self.shards
+    if self.replicas is not None:
+      settings["number_of_replicas"] = self.replicas
+    if self.refresh_interval is not None:
+      settings["refresh_interval"] = self.refresh_interval
+    return settings
@@ -1,19 +1,153 @@
 from ..utils import log_utils
+from ..utils.metrics import observe_es
 import logging
 import asyncio
-from elasticsearch import exceptions, AsyncElasticsearch
+import copy
+import time
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from elasticsearch import exceptions, helpers, AsyncElasticsearch
+from typing import AsyncIterator, Callable
 from ..dto.article_query import ArticleQuery
 from ..dto.topic_query import TopicQuery
 from ..dto.topic_batch_query import TopicBatchQuery
 from ..dto.category_query import *
-from .repository import Repository
+from ..dto.article_facet_query import ArticleFacetQuery
+from ..dto.article_histogram_query import ArticleHistogramQuery
+from .repository import Repository, BatchSearch, BatchSearchResult
+from ..dto.article_query import ArticleQueryType
+from ..dto.exceptions import QueryValidationException
+from .elasticsearch_options import VectorIndexOptions, TransportOptions, ArticleIndexOptions
+from .article_partitions import ArticlePartitions
+from .document_mapping import *
+from .rank_fusion import combine_hits
+from .date_histogram import histogram_of_days, floor_day, to_utc, DAY_MS
+from .point_in_time import PointInTimeManager
 from ..domain.article import *
 from ..domain.topic import *
 from ..domain.category import *
+from ..domain.histogram import ArticleHistogram
 
 KNN_NUM_CANDIDATES = 50
 KNN_K = 15
 
+# how combined searches are sent to Elasticsearch:
+# 'client': separate lexical and kNN requests, fused with RRF in the service
+# 'linear': a single request with both 'query' and 'knn', their scores are summed by Elasticsearch
+# 'rrf': a single request fused with Elasticsearch's native reciprocal rank fusion (8.8+, depending on the license)
+COMBINED_SEARCH_MODES = ["client", "linear", "rrf"]
+RRF_RANK_CONSTANT = 60
+
+# how the paragraphs of the articles are fetched, only the first few are ever returned:
+# 'source': every paragraph in '_source', trimmed in the service
+# 'script': only the first few as a script field, the rest isn't sent or decoded (Elasticsearch still reads the whole '_source')
+ARTICLE_PROJECTIONS = ["source", "script"]
+PARAGRAPHS_PREVIEW_SCRIPT = """
+def article = params['_source']['article'];
+def paragraphs = article == null ? null : article['paragraphs'];
+if (paragraphs == null) {
+  return null;
+}
+if (!(paragraphs instanceof List)) {
+  return [paragraphs];
+}
+return new ArrayList(paragraphs.subList(0, (int) Math.min(params.count, paragraphs.size())));
+"""
+
+# days of the daily article rollups per request, and the values per dimension and day, more than there should ever be
+ROLLUP_CHUNK_DAYS = 30
+ROLLUP_TERMS_SIZE = 10000
+
+
+def msearch_body(request: dict) -> dict:
+  # the options of a single search, as the body of a search in '_msearch'
+  # some of them are URL parameters of the search API, every one of them is in the body of '_msearch'
+  body = {}
+  for key, value in request.items():
+    if value is None:
+      continue
+    if key == "from_":
+      body["from"] = value
+    elif key == "source_includes":
+      body.setdefault("_source", {})["includes"] = value
+    elif key == "source_excludes":
+      body.setdefault("_source", {})["excludes"] = value
+    elif key == "source":
+      body["_source"] = value
+    else:
+      body[key] = value
+  return body
+
+
+def msearch_error(response: dict) -> Exception:
+  # a failed search of '_msearch', the others still have their results
+  error = response["error"]
+  reason = error.get("reason", error.get("type", "")) if isinstance(error, dict) else str(error)
+  status = response.get("status", None)
+  if status == 400:
+    return QueryValidationException(f"Invalid search: {reason}")
+  return RuntimeError(f"search failed with status {status}: {reason}")
+
+
+# the error types of a search request the cluster can't parse, or isn't licensed for
+UNSUPPORTED_SEARCH_ERROR_TYPES = {"x_content_parse_exception", "parsing_exception", "illegal_argument_exception", "security_exception"}
+UNSUPPORTED_SEARCH_REASONS = ["unknown", "unrecognized", "not supported", "unsupported", "start_object", "non-compliant"]
+
+
+def unsupported_combined_search(error) -> bool:
+  # whether the error of a single combined request is the cluster not supporting 'rank' or 'knn' with 'query', or its license,
+  # and not the query itself, e.g. a too large result window, which fails the same way with separate requests
+  if not isinstance(error, dict):
+    return False
+  causes = [error, *error.get("root_cause", [])]
+  caused_by = error.get("caused_by", None)
+  while isinstance(caused_by, dict):
+    causes.append(caused_by)
+    caused_by = caused_by.get("caused_by", None)
+
+  for cause in causes:
+    reason = str(cause.get("reason", "")).lower()
+    if "license" in reason:
+      return True
+    if cause.get("type", None) not in UNSUPPORTED_SEARCH_ERROR_TYPES:
+      continue
+    if any(param in reason for param in ["[rank]", "[knn]", "rrf"]) and any(r in reason for r in UNSUPPORTED_SEARCH_REASONS):
+      return True
+  return False
+
+
+class UnsupportedCombinedSearchException(Exception):
+
+  def __init__(self, message):
+    self.message = message
+
+
+def article_source_options(return_attributes: list[str] | None, projection: str = "source") -> dict:
+  # the '_source' filtering, and the script fields, of the article searches
+  includes = map_keys(keys=return_attributes, mapping=article_search_keys_to_repo_model)
+  if includes is not None and set(includes) == {article_search_keys_to_repo_model["id"]}:
+    # only the ids, which are always returned
+    return {"source": False}
+
+  options = {}
+  excludes = ["analyzer.embeddings"]
+  if projection == "script" and (includes is None or "article.paragraphs" in includes):
+    excludes.append("article.paragraphs")
+    options["script_fields"] = {
+      PARAGRAPHS_PREVIEW_FIELD: {
+        "script": {
+          "source": PARAGRAPHS_PREVIEW_SCRIPT,
+          "params": {"count": PARAGRAPHS_PREVIEW_COUNT},
+        },
+      },
+    }
+    if includes is not None:
+      includes = [i for i in includes if i != "article.paragraphs"]
+      if len(includes) == 0:
+        return {"source": False, **options}
+
+  return {"source_excludes": excludes, "source_includes": includes, **options}
+
 
 class ElasticsearchRepository(Repository):
 
@@ -25,48 +159,6 @@ class ElasticsearchRepository(Repository):
       level=level
     )
   
-  # maps requested keys to the model's keys, for selecting returned attributes
-  article_search_keys_to_repo_model = {
-    "id": "id_is_always_returned", # causes nothing to be returned for the 'id', but the source's '_id' is used which is always returned
-    "categories": [
-      "article.categories",
-      "analyzer.category_ids",
-    ],
-    "topics": "topics",
-    "url": "article.url",
-    "publish_date": "article.publish_date",
-    "source": "article.source",
-    "image": "article.image",
-    "author": "article.author",
-    "title": "article.title",
-    "paragraphs": "article.paragraphs",
-  }
-
-  # maps requested keys to the model's keys, for selecting returned attributes
-  topic_search_keys_to_repo_model = {
-    "id": "id_is_always_returned", # causes nothing to be returned for the 'id', but the source's '_id' is used which is always returned
-    "batch_id": "batch_id",
-    "batch_query": "batch_query",
-    "topic": "topic",
-    "count": "count",
-    "representative_articles": "representative_articles",
-  }
-
-  # maps requested sort keys to the model's keys, for creating the sort query
-  topic_sort_keys_to_repo_model = {
-    "date_min": "query.publish_date.start",
-    "date_max": "query.publish_date.end",
-    "count": "count",
-  }
-
-  topic_batch_search_keys_to_repo_model = {
-    "id": "id_is_always_returned", # causes nothing to be returned for the 'id', but the source's '_id' is used which is always returned
-    "query": "query",
-    "article_count": "article_count",
-    "create_time": "create_time",
-  }
-
-
   # indices and mappings
   articles_index = "articles"
   articles_mappings = {
@@ -89,6 +181,7 @@ class ElasticsearchRepository(Repository):
             "index": "false",
             "type": "keyword",
           },
+          # replaced by the configured VectorIndexOptions
           "embeddings": {
             "type": "dense_vector",
             "dims": 384, # depends on the embeddings model
@@ -264,33 +357,291 @@ class ElasticsearchRepository(Repository):
       password: str, 
       cacerts: str, 
       verify_certs: bool = True,
+      vector_index_options: VectorIndexOptions | None = None,
+      combined_search_mode: str = "client",
+      pit_keep_alive_seconds: int = 120,
+      pit_max_open: int = 200,
+      track_total_hits: bool | int = 10000,
+      article_projection: str = "source",
+      transport_options: TransportOptions | None = None,
+      article_index_options: ArticleIndexOptions | None = None,
       log_level: int = logging.INFO
   ):
     self.configure_logging(log_level)
 
+    if combined_search_mode not in COMBINED_SEARCH_MODES:
+      raise ValueError(f"unknown combined search mode '{combined_search_mode}', must be one of {COMBINED_SEARCH_MODES}")
+    self.combined_search_mode = combined_search_mode
+    self.combined_search_fallback = False
+
+    if article_projection not in ARTICLE_PROJECTIONS:
+      raise ValueError(f"unknown article projection '{article_projection}', must be one of {ARTICLE_PROJECTIONS}")
+    self.article_projection = article_projection
+
+    # default of the queries without 'track_total_hits', exact counts of large result sets are expensive
+    self.track_total_hits = track_total_hits
+
+    self.vector_index_options = vector_index_options if vector_index_options is not None else VectorIndexOptions()
+    self.articles_mappings = copy.deepcopy(self.articles_mappings)
+    self.articles_mappings["properties"]["analyzer"]["properties"]["embeddings"] = self.vector_index_options.to_mapping()
+
+    # the articles index is an alias of the monthly indices when they're partitioned
+    self.article_index_options = article_index_options if article_index_options is not None else ArticleIndexOptions()
+    self.article_partitions = None
+    if self.article_index_options.partitioning == "monthly":
+      self.article_partitions = ArticlePartitions(self.articles_index)
+    self.partitions_refresher: asyncio.Task | None = None
+
     # TODO: add some form of auth
     self.log.info(f"connecting to Elasticsearch at {conn}")
-    self.es = AsyncElasticsearch(conn, basic_auth=(user, password), ca_certs=cacerts, verify_certs=verify_certs)
+    self.transport_options = transport_options if transport_options is not None else TransportOptions()
+    self.es = AsyncElasticsearch(
+      conn, 
+      basic_auth=(user, password), 
+      ca_certs=cacerts, 
+      verify_certs=verify_certs,
+      **self.transport_options.to_client_options(),
+    )
+
+    # cursor paging of the queries with 'use_cursor'
+    self.pits = PointInTimeManager(
+      self.es, 
+      keep_alive_seconds=pit_keep_alive_seconds, 
+      max_open=pit_max_open, 
+      log_level=log_level
+    )
   
   async def assert_indices(self):
-    await self.assert_index(self.articles_index, self.articles_mappings)
-    await self.assert_index(self.topics_index, self.topics_mappings)
-    await self.assert_index(self.topic_batches_index, self.topic_batches_mappings)
-    await self.assert_index(self.categories_index, self.categories_mappings)
+    async def assert_articles():
+      if self.article_partitions is not None:
+        await self.assert_article_partitions()
+      else:
+        await self.assert_index(self.articles_index, self.articles_mappings, self.article_index_options.to_settings())
+      await self.check_embeddings_mapping()
+
+    # the indices are independent, so they're asserted concurrently, startup waits for the slowest one only
+    start = time.perf_counter()
+    await asyncio.gather(
+      assert_articles(),
+      self.assert_index(self.topics_index, self.topics_mappings),
+      self.assert_index(self.topic_batches_index, self.topic_batches_mappings),
+      self.assert_index(self.categories_index, self.categories_mappings),
+    )
+    self.log.info(f"asserted the indices in {time.perf_counter() - start:.3f}s")
 
 
-  async def assert_index(self, index_name: str, index_mappings: dict):
+  async def assert_index(self, index_name: str, index_mappings: dict, index_settings: dict | None = None):
     try:
       self.log.info(f"creating/asserting index '{index_name}'")
-      await self.es.indices.create(index=index_name, mappings=index_mappings)
+      await self.es.indices.create(index=index_name, mappings=index_mappings, settings=index_settings)
     except exceptions.BadRequestError as e:
       if e.message == "resource_already_exists_exception":
         self.log.info(f"index '{index_name}' already exists")
 
+  async def assert_article_partitions(self):
+    # a single articles index can't become an alias, its articles have to be reindexed into the monthly indices
+    if await self.es.indices.exists(index=self.articles_index) and not await self.es.indices.exists_alias(name=self.articles_index):
+      raise ValueError(
+        f"'{self.articles_index}' is an index, the monthly partitions need it as their alias, "
+        f"reindex its articles into '{self.articles_index}-YYYY.MM' indices and delete it"
+      )
+
+    # the mappings, settings and the alias of every monthly index, including the ones created by the writers
+    self.log.info(f"creating/updating index template '{self.articles_index}'")
+    await self.es.indices.put_index_template(
+      name=self.articles_index,
+      index_patterns=[f"{self.articles_index}-*"],
+      template={
+        "settings": self.article_index_options.to_settings(),
+        "mappings": self.articles_mappings,
+        "aliases": {self.articles_index: {}},
+      },
+    )
+    await self.refresh_article_partitions()
+
+  async def refresh_article_partitions(self):
+    # the current and the next month always exist, so the alias exists, and the month changes without a new partition
+    now = datetime.now(timezone.utc)
+    next_month = now.replace(day=1) + timedelta(days=32)
+    for date in [now, next_month]:
+      index = self.article_partitions.index_name(date)
+      if index not in [i for _, _, i in self.article_partitions.months]:
+        await self.assert_index(index, self.articles_mappings)
+
+    res = await self.es.indices.get_alias(name=self.articles_index)
+    self.article_partitions.update(list(res.body.keys()))
+
+  async def __refresh_article_partitions_periodically(self):
+    while True:
+      await asyncio.sleep(self.article_index_options.partitions_refresh_seconds)
+      try:
+        await self.refresh_article_partitions()
+      except asyncio.CancelledError:
+        raise
+      except Exception as e:
+        self.log.error("failed to refresh the monthly article indices", exc_info=e)
+
+  def __article_index(self, date_min: datetime | int | None, date_max: datetime | int | None) -> str:
+    # the articles alias, or the monthly indices of the date range
+    if self.article_partitions is None:
+      return self.articles_index
+    return self.article_partitions.indices(date_min, date_max)
+
+  def __article_query_index(self, search_options: ArticleQuery) -> str:
+    return self.__article_index(search_options.date_min, search_options.date_max)
+
+  async def check_embeddings_mapping(self):
+    # the mapping of an existing field can't be changed, the index has to be recreated and reindexed
+    try:
+      res = await self.es.indices.get_field_mapping(index=self.articles_index, fields="analyzer.embeddings")
+    except exceptions.ApiError as e:
+      self.log.warning(f"failed to check the embeddings mapping of index '{self.articles_index}': {e}")
+      return
+
+    for index, mappings in res.body.items():
+      existing = mappings["mappings"].get("analyzer.embeddings", {}).get("mapping", {}).get("embeddings", {})
+      expected = self.articles_mappings["properties"]["analyzer"]["properties"]["embeddings"]
+      differing = {k: v for k, v in expected.items() if existing.get(k, None) != v}
+      if len(differing) > 0:
+        self.log.warning(
+          f"the embeddings mapping of index '{index}' differs from the configured one in {differing}, "
+          f"existing mapping: {existing}, reindex to apply the configured vector index options"
+        )
+
+  async def ping(self) -> bool:
+    return await self.es.ping()
+
+  async def start(self):
+    self.pits.start()
+    if self.article_partitions is not None:
+      self.partitions_refresher = asyncio.create_task(self.__refresh_article_partitions_periodically())
+    await self.warm_up_connections()
+
+  async def warm_up_connections(self):
+    # concurrent requests make the pool open that many connections, which are kept alive for the searches
+    count = self.transport_options.warmup_connections
+    if count <= 0:
+      return
+    start = time.perf_counter()
+    res = await asyncio.gather(*[self.es.ping() for _ in range(count)])
+    self.log.info(
+      f"opened {sum(res)}/{count} connections to Elasticsearch in {time.perf_counter() - start:.3f}s"
+    )
+
   async def close(self):
+    if self.partitions_refresher is not None:
+      self.partitions_refresher.cancel()
+      self.partitions_refresher = None
+    await self.pits.close()
     self.log.info("closing async Elasticsearch client")
     await self.es.close()
+
+  def stats(self) -> dict:
+    return {
+      "elasticsearch": {
+        "combined_search_mode": self.combined_search_mode,
+        # the configured single-request mode was rejected by the cluster
+        "combined_search_fallback": self.combined_search_fallback,
+        "point_in_time": self.pits.stats(),
+        "track_total_hits": self.track_total_hits,
+        "article_projection": self.article_projection,
+        "transport": self.transport_options.model_dump(exclude_defaults=True),
+        "article_partitions": self.article_partitions.stats() if self.article_partitions is not None else None,
+      }
+    }
   
+  async def scan_articles(self, date_min: datetime) -> AsyncIterator[dict]:
+    """Every article published since 'date_min', including the embeddings, for building in-memory indices."""
+    async for doc in helpers.async_scan(
+      self.es,
+      index=self.__article_index(date_min, None),
+      query={"query": {"range": {"article.publish_date": {"gte": date_min.isoformat()}}}},
+      size=1000,
+    ):
+      yield doc
+
+  async def scan_categories(self) -> AsyncIterator[dict]:
+    """Every category, for building in-memory indices."""
+    async for doc in helpers.async_scan(self.es, index=self.categories_index, size=1000):
+      yield doc
+
+  async def scan_article_rollups(self, date_min: datetime | None, date_max: datetime) -> AsyncIterator[tuple[int, dict]]:
+    """
+    The number of articles published on each day (epoch milliseconds of its UTC start) between 'date_min' and 'date_max' (excluded),
+    in total and by the values of 'article_rollup_dimensions_to_repo_model', since the first article if 'date_min' is None.
+    """
+    if date_min is None:
+      res = await observe_es("rollups", self.es.search(index=self.articles_index, size=0, aggs={"first": {"min": {"field": "article.publish_date"}}}))
+      first = res["aggregations"]["first"]["value"]
+      if first is None:
+        return
+      date_min = to_utc(int(first))
+
+    # a few days per request, every value of every day is a bucket, which are limited by 'search.max_buckets'
+    start = floor_day(to_epoch_ms(date_min))
+    end = to_epoch_ms(date_max)
+    while start < end:
+      chunk_end = min(start + ROLLUP_CHUNK_DAYS * DAY_MS, end)
+      res = await observe_es("rollups", self.es.search(
+        index=self.__article_index(start, chunk_end - 1),
+        size=0,
+        query={"range": {"article.publish_date": {"gte": start, "lt": chunk_end, "format": "epoch_millis"}}},
+        aggs={
+          "days": {
+            "date_histogram": {"field": "article.publish_date", "calendar_interval": "day", "min_doc_count": 1},
+            "aggs": {
+              dimension: {"terms": {"field": field, "size": ROLLUP_TERMS_SIZE}}
+              for dimension, field in article_rollup_dimensions_to_repo_model.items()
+            },
+          },
+        },
+      ))
+      for bucket in res["aggregations"]["days"]["buckets"]:
+        yield bucket["key"], {
+          "total": bucket["doc_count"],
+          **{
+            dimension: {b["key"]: b["doc_count"] for b in bucket[dimension]["buckets"]}
+            for dimension in article_rollup_dimensions_to_repo_model
+          },
+        }
+      start = chunk_end
+
+  async def scan_topics(self, create_time_min: int | None = None) -> AsyncIterator[dict]:
+    """Every topic created since 'create_time_min' (epoch milliseconds, every topic if None), for building in-memory indices."""
+    async for doc in self.__scan_created(self.topics_index, create_time_min):
+      yield doc
+
+  async def scan_topic_batches(self, create_time_min: int | None = None) -> AsyncIterator[dict]:
+    """Every topic batch created since 'create_time_min' (epoch milliseconds, every batch if None), for building in-memory indices."""
+    async for doc in self.__scan_created(self.topic_batches_index, create_time_min):
+      yield doc
+
+  async def __scan_created(self, index: str, create_time_min: int | None) -> AsyncIterator[dict]:
+    query = None
+    if create_time_min is not None:
+      query = {"query": {"range": {"create_time": {"gte": create_time_min, "format": "epoch_millis"}}}}
+    async for doc in helpers.async_scan(self.es, index=index, query=query, size=1000):
+      yield doc
+
+  async def latest_create_times(self) -> dict[str, int | None]:
+    """The latest 'create_time' of the topics and topic batches, in epoch milliseconds, in a single request."""
+    res = await observe_es("latest_create_times", self.es.search(
+      index=[self.topics_index, self.topic_batches_index],
+      size=0,
+      aggs={
+        "indices": {
+          "terms": {"field": "_index"},
+          "aggs": {"latest": {"max": {"field": "create_time"}}},
+        },
+      },
+    ))
+    latest = {"topics": None, "topic_batches": None}
+    for bucket in res["aggregations"]["indices"]["buckets"]:
+      value = bucket["latest"]["value"]
+      name = "topics" if bucket["key"] == self.topics_index else "topic_batches"
+      latest[name] = int(value) if value is not None else None
+    return latest
+
   # In the case of combined search, pagination doesn't really work as expected.
   # Pagination only applies to the text query,
   # the KNN query always returns the first 'K' most relevant results.
@@ -302,74 +653,317 @@ class ElasticsearchRepository(Repository):
   # --> this can end in duplicating the KNN results, depending on the order after re-ranking
   # (which we have no way of knowing ahead of time, only looking at a single request)
 
-  # for now, this limitation is accepted
-  async def search_articles_combined(self, search_options: ArticleQuery, embeddings: list) -> ArticleList:
-    res_text = asyncio.Task(self.__search_articles_text(search_options))
-    res_em = asyncio.Task(self.__search_articles_embeddings(search_options, embeddings))
-    res_text = await res_text
-    res_em = await res_em
+  # for now, this limitation is accepted, consistent paging is done by the service
+  # on a deeper fused result list (large 'page_size'), so the KNN query returns at least 'page_size' results here
+  async def search_articles_combined(self, search_options: ArticleQuery, embeddings: list, depth: int | None = None) -> ArticleList:
+    if self.combined_search_mode != "client" and not self.combined_search_fallback:
+      try:
+        res = await observe_es("search_combined", self.es.search(**self.__article_combined_single_request(search_options, embeddings, depth)))
+        return map_to_articles(res['hits'])
+      except (exceptions.BadRequestError, exceptions.AuthorizationException) as e:
+        if not unsupported_combined_search(e.info.get("error", None) if isinstance(e.info, dict) else None):
+          raise
+        self.__fall_back_to_client_combined_search(e)
+
+    res_text, res_em = await asyncio.gather(
+      *[observe_es("search_combined", self.es.search(**r)) for r in self.__article_combined_client_requests(search_options, embeddings, depth)]
+    )
+    return map_to_articles(combine_hits(res_text['hits'], res_em['hits'], search_options.page_size))
 
-    res_text_count = res_text['hits']['total']['value']
-    res_em_count = res_em['hits']['total']['value']
+  def __fall_back_to_client_combined_search(self, e: Exception):
+    # older clusters and some licenses don't support the request, it won't work later either
+    self.log.warning(
+      f"combined search mode '{self.combined_search_mode}' isn't supported by the cluster, "
+      f"falling back to separate requests: {e}"
+    )
+    self.combined_search_fallback = True
+
+  def __article_combined_client_requests(self, search_options: ArticleQuery, embeddings: list, depth: int | None = None) -> list[dict]:
+    # a lexical and a kNN search, fused in the service
+    # the result sessions fuse a deeper list, so the kNN search returns at least 'depth' results for them
+    if depth is None:
+      knn_request = self.__article_knn_request(search_options, embeddings)
+    else:
+      k = max(KNN_K, depth)
+      knn_request = self.__article_knn_request(search_options, embeddings, k=k, size=k)
+    return [self.__article_text_request(search_options), knn_request]
+
+  def __article_combined_single_request(self, search_options: ArticleQuery, embeddings: list, depth: int | None = None) -> dict:
+    # both queries in a single request, ranked by relevance, so the sort options don't apply
+    # paging is disabled for combined search, the first page is always returned
+    options = {}
+    if self.combined_search_mode == "rrf":
+      options["rank"] = {
+        "rrf": {
+          "window_size": max(KNN_K, search_options.page_size),
+          "rank_constant": RRF_RANK_CONSTANT,
+        }
+      }
 
-    if res_text_count == 0:
-      return self.__map_to_articles(res_em['hits'])
-    elif res_em_count == 0:
-      return self.__map_to_articles(res_text['hits'])
+    return dict(
+      index=self.__article_query_index(search_options),
+      query=self.__build_article_text_query(search_options),
+      knn=self.__build_article_knn_query(search_options, embeddings, k=max(KNN_K, depth) if depth is not None else KNN_K),
+      size=search_options.page_size,
+      track_total_hits=self.__track_total_hits(search_options),
+      **self.__article_source_options(search_options),
+      **options,
+    )
 
-    reranked_docs = self.__re_rank_rrf(res_text['hits']['hits'], res_em['hits']['hits'])
-    # combine results, swapping parts out so it looks like a single result
-    combined = res_text
+  async def __search_page(self, index: str, paging: ArticleQuery | TopicQuery | TopicBatchQuery, **search_options) -> tuple[dict, str | None]:
+    # 'from_' gets slower the deeper the page, and the pages shift as new documents are indexed,
+    # with 'use_cursor' the pages continue after the last sort values of the previous page, on a point in time
+    if paging.use_cursor or paging.cursor is not None:
+      search_options["track_total_hits"] = self.__track_total_hits(paging)
+      return await self.pits.search(index, paging.cursor, paging.page_size, **search_options)
+
+    res = await observe_es("search", self.es.search(**self.__page_request(index, paging, search_options)))
+    return res, None
+
+  def __page_request(self, index: str, paging: ArticleQuery | TopicQuery | TopicBatchQuery, search_options: dict) -> dict:
+    return dict(
+      index=index,
+      from_=paging.page * paging.page_size,
+      size=paging.page_size,
+      track_total_hits=self.__track_total_hits(paging),
+      **search_options,
+    )
+
+  def __track_total_hits(self, query: ArticleQuery | TopicQuery | TopicBatchQuery) -> bool | int:
+    return query.track_total_hits if query.track_total_hits is not None else self.track_total_hits
+
+  async def search_batch(self, searches: list[BatchSearch]) -> list[BatchSearchResult]:
+    # the searches are sent in a single '_msearch', 
+    # except the cursor pages, which need their point in time, they are sent separately at the same time
+    results = [None] * len(searches)
+    planned = []
+    separate = []
+    for i, (query, embeddings) in enumerate(searches):
+      plan = self.__plan_batch_search(query, embeddings)
+      if plan is None:
+        separate.append(i)
+      else:
+        planned.append((i, *plan))
+
+    # concurrently, one request each
+    search_each = super().search_batch
+
+    async def search_separately(indices: list[int]) -> list[BatchSearchResult]:
+      if len(indices) == 0:
+        return []
+      return await search_each([searches[i] for i in indices])
+
+    msearch_results, separate_results = await asyncio.gather(
+      self.__msearch(planned), 
+      search_separately(separate),
+    )
+    for i, result in zip(separate, separate_results):
+      results[i] = result
+
+    retried = []
+    for (i, _, _, single_combined), result in zip(planned, msearch_results):
+      results[i] = result
+      if single_combined and isinstance(result, UnsupportedCombinedSearchException):
+        # like the combined search of a single query, the cluster doesn't support the request
+        if not self.combined_search_fallback:
+          self.__fall_back_to_client_combined_search(result)
+        retried.append(i)
+
+    for i, result in zip(retried, await search_separately(retried)):
+      results[i] = result
+    return results
+
+  async def __msearch(self, planned: list[tuple]) -> list[BatchSearchResult]:
+    if len(planned) == 0:
+      return []
+
+    body = []
+    for _, requests, _, _ in planned:
+      for request in requests:
+        request = dict(request)
+        body.append({"index": request.pop("index")})
+        body.append(msearch_body(request))
+    res = await observe_es("msearch", self.es.msearch(searches=body))
+
+    results = []
+    responses = iter(res["responses"])
+    for _, requests, to_result, single_combined in planned:
+      search_responses = [next(responses) for _ in requests]
+      errors = [r for r in search_responses if "error" in r]
+      if len(errors) > 0:
+        if single_combined and unsupported_combined_search(errors[0]["error"]):
+          # retried with separate requests
+          results.append(UnsupportedCombinedSearchException(str(errors[0]["error"])))
+        else:
+          results.append(msearch_error(errors[0]))
+        continue
+      try:
+        results.append(to_result(search_responses))
+      except Exception as e:
+        results.append(e)
+    return results
+
+  def __plan_batch_search(
+    self, 
+    query: ArticleQuery | TopicQuery | TopicBatchQuery | CategoryQuery, 
+    embeddings: list | None
+  ) -> tuple[list[dict], Callable[[list[dict]], BatchSearchResult], bool] | None:
+    # the requests of a search, the mapping of their responses to the result, and whether it's a single combined request
+    if isinstance(query, CategoryQuery):
+      return [self.__categories_request(query)], lambda r: map_to_categories(r[0]['hits']), False
+
+    if query.use_cursor or query.cursor is not None:
+      return None
+
+    if isinstance(query, TopicQuery):
+      request = self.__page_request(self.topics_index, query, self.__build_topic_search(query))
+      return [request], lambda r: map_to_topics(r[0]['hits']), False
+    elif isinstance(query, TopicBatchQuery):
+      request = self.__page_request(self.topic_batches_index, query, self.__build_topic_batch_search(query))
+      return [request], lambda r: map_to_topic_batches(r[0]['hits']), False
+
+    if query.search_type == ArticleQueryType.semantic:
+      request = self.__article_knn_request(query, embeddings)
+      return [request], lambda r: self.__map_knn_page(query, r[0]), False
+    elif query.search_type == ArticleQueryType.combined:
+      if self.combined_search_mode != "client" and not self.combined_search_fallback:
+        request = self.__article_combined_single_request(query, embeddings)
+        return [request], lambda r: map_to_articles(r[0]['hits']), True
+      requests = self.__article_combined_client_requests(query, embeddings)
+      return requests, lambda r: map_to_articles(combine_hits(r[0]['hits'], r[1]['hits'], query.page_size)), False
+    return [self.__article_text_request(query)], lambda r: map_to_articles(r[0]['hits']), False
+
+  # counts are always exact, without fetching any documents
+
+  async def count_articles(self, search_options: ArticleQuery) -> int:
+    res = await observe_es("count", self.es.count(index=self.__article_query_index(search_options), query=self.__build_article_text_query(search_options)))
+    return res["count"]
+
+  async def count_topics(self, topic_query: TopicQuery) -> int:
+    res = await observe_es("count", self.es.count(index=self.topics_index, query=self.__build_topic_query(topic_query)))
+    return res["count"]
+
+  async def count_topic_batches(self, topic_batch_query: TopicBatchQuery) -> int:
+    res = await observe_es("count", self.es.count(index=self.topic_batches_index, query=self.__build_topic_batch_query(topic_batch_query)))
+    return res["count"]
+
+  async def facet_articles(self, facet_query: ArticleFacetQuery) -> ArticleFacets:
+    # only aggregations without hits, so the shards' request cache can serve the repeated ones,
+    # as long as the query is the same, which is why the service rounds an unset 'date_max'
+    res = await observe_es("facets", self.es.search(
+      index=self.__article_query_index(facet_query),
+      query=self.__build_article_text_query(facet_query),
+      size=0,
+      track_total_hits=True,
+      aggs={
+        facet: {
+          "terms": {
+            "field": article_facet_keys_to_repo_model[facet],
+            "size": facet_query.facet_size,
+          }
+        } for facet in facet_query.facets
+      },
+      request_cache=True,
+    ))
+    return map_to_article_facets(res)
+
+  async def histogram_articles(self, histogram_query: ArticleHistogramQuery) -> ArticleHistogram:
+    # counted by day and summed up to the interval, the same way as the rollups of the days
+    res = await observe_es("histogram", self.es.search(
+      index=self.__article_query_index(histogram_query),
+      query=self.__build_article_text_query(histogram_query),
+      size=0,
+      aggs={
+        "days": {
+          "date_histogram": {"field": "article.publish_date", "calendar_interval": "day", "min_doc_count": 1},
+        },
+      },
+      request_cache=True,
+    ))
+    days = {b["key"]: b["doc_count"] for b in res["aggregations"]["days"]["buckets"]}
+    return histogram_of_days(days, histogram_query.interval)
+
+  async def index_generations(self) -> dict[str, object]:
+    # the writes and deletes of the primary shards, and their document counts, in a single request
+    # the refresh counts aren't used, the periodic refreshes count without changes too
+    indices = {
+      "articles": self.articles_index,
+      "topics": self.topics_index,
+      "topic_batches": self.topic_batches_index,
+      "categories": self.categories_index,
+    }
+    res = await self.es.indices.stats(index=list(indices.values()), metric=["indexing", "docs"])
+    generations = {}
+    for name, index in indices.items():
+      # the stats are by concrete index, the ones of the monthly article indices are summed up
+      concrete = [index]
+      if name == "articles" and self.article_partitions is not None:
+        concrete = [i for i in res["indices"] if self.article_partitions.month_of(i) is not None]
+      stats = [res["indices"][i]["primaries"] for i in concrete if i in res["indices"]]
+      if len(stats) == 0:
+        continue
+      generations[name] = (
+        sum(s["indexing"]["index_total"] for s in stats),
+        sum(s["indexing"]["delete_total"] for s in stats),
+        sum(s["docs"]["count"] for s in stats),
+      )
+    return generations
 
-    # precise total count cannot be provided because of overlap between the 2 queries, so the max is returned
-    combined['hits']['total']['value'] = max(res_text_count, res_em_count)
-    combined['hits']['hits'] = reranked_docs[:search_options.page_size]
-    
-    return self.__map_to_articles(combined['hits'])
-  
   async def search_articles_text(self, search_options: ArticleQuery) -> ArticleList:
-    res = await self.__search_articles_text(search_options)
-    return self.__map_to_articles(res['hits'])
+    res, next_cursor = await self.__search_page(
+      self.__article_query_index(search_options),
+      search_options, 
+      **self.__build_article_text_search(search_options)
+    )
+    articles = map_to_articles(res['hits'])
+    articles.next_cursor = next_cursor
+    return articles
   
-  async def __search_articles_text(self, search_options: ArticleQuery) -> dict:
+  def __article_source_options(self, search_options: ArticleQuery) -> dict:
+    return article_source_options(search_options.return_attributes, self.article_projection)
+
+  def __article_text_request(self, search_options: ArticleQuery) -> dict:
+    return self.__page_request(self.__article_query_index(search_options), search_options, self.__build_article_text_search(search_options))
+
+  def __build_article_text_search(self, search_options: ArticleQuery) -> dict:
     text_query = self.__build_article_text_query(search_options)
     sort_options = self.__build_article_sort_options(search_options)
-    return await self.es.search(
-      index=self.articles_index, 
+    return dict(
       query=text_query,
-      from_=search_options.page * search_options.page_size,
-      size=search_options.page_size,
       sort=sort_options["sort"],
       track_scores=sort_options["track_scores"],
-      source_excludes=["analyzer.embeddings"],
-      source_includes=self.__map_keys(
-        keys=search_options.return_attributes, 
-        mapping=self.article_search_keys_to_repo_model
-      )
+      **self.__article_source_options(search_options),
     )
   
   async def search_articles_embeddings(self, search_options: ArticleQuery, embeddings: list) -> ArticleList:
-    res = await self.__search_articles_embeddings(search_options, embeddings)
+    res = await observe_es("search_knn", self.es.search(**self.__article_knn_request(search_options, embeddings)))
+    return self.__map_knn_page(search_options, res)
 
+  def __map_knn_page(self, search_options: ArticleQuery, res: dict) -> ArticleList:
     # support paging manually 
     start = search_options.page * search_options.page_size
     end = start + search_options.page_size
     res['hits']['hits'] = res['hits']['hits'][start:end]
-    return self.__map_to_articles(res['hits'])
+    return map_to_articles(res['hits'])
   
-  async def __search_articles_embeddings(self, search_options: ArticleQuery, embeddings: list) -> dict:
-    knn_query = self.__build_article_knn_query(search_options, embeddings)
+  def __article_knn_request(
+    self, 
+    search_options: ArticleQuery, 
+    embeddings: list, 
+    k: int = KNN_K, 
+    size: int | None = None
+  ) -> dict:
+    knn_query = self.__build_article_knn_query(search_options, embeddings, k=k)
     sort_options = self.__build_article_sort_options(search_options)
-    return await self.es.search(
-      index=self.articles_index, 
+    # without 'size', Elasticsearch returns its default number of hits
+    options = {"size": size} if size is not None else {}
+    return dict(
+      index=self.__article_query_index(search_options),
       knn=knn_query, 
       sort=sort_options["sort"],
       track_scores=sort_options["track_scores"],
-      source_excludes=["analyzer.embeddings"],
-      source_includes=self.__map_keys(
-        keys=search_options.return_attributes, 
-        mapping=self.article_search_keys_to_repo_model
-      )
+      **self.__article_source_options(search_options),
+      **options,
     )
   
   def __build_article_text_query(self, search_options: ArticleQuery) -> dict:
@@ -433,7 +1027,7 @@ class ElasticsearchRepository(Repository):
       }
     }
 
-  def __build_article_knn_query(self, search_options: ArticleQuery, embeddings: list) -> dict:
+  def __build_article_knn_query(self, search_options: ArticleQuery, embeddings: list, k: int = KNN_K) -> dict:
     # every search option provided doesn't contribute to the score, 
     # the score is only calculated based on embedding cosine similarity
 
@@ -464,11 +1058,16 @@ class ElasticsearchRepository(Repository):
       filters.append(self.__build_article_topic_ids_query(search_options.topic_ids))
     
 
+    if self.vector_index_options.similarity == "dot_product":
+      # dot product similarity is only valid for unit-length vectors
+      embeddings = np.asarray(embeddings, dtype=np.float32)
+      embeddings = (embeddings / max(float(np.linalg.norm(embeddings)), 1e-12)).tolist()
+
     return {
       "field": "analyzer.embeddings",
       "query_vector": embeddings,
-      "num_candidates": KNN_NUM_CANDIDATES,
-      "k": KNN_K,
+      "num_candidates": max(KNN_NUM_CANDIDATES, k),
+      "k": k,
       "filter": filters,
     }
 
@@ -529,8 +1128,13 @@ class ElasticsearchRepository(Repository):
       }
     }
     
-  def __build_date_range_query(self, field: str, start: datetime, end: datetime) -> dict:
-    return self.__build_range_query(field, start.isoformat(), end.isoformat())
+  def __build_date_range_query(self, field: str, start: datetime | None, end: datetime | None) -> dict:
+    # an unset end is open, the service fills in 'date_max', but not every caller goes through it
+    return self.__build_range_query(
+      field,
+      start.isoformat() if start is not None else None,
+      end.isoformat() if end is not None else None,
+    )
   
   def __build_ids_query(self, ids: list[str]) -> dict:
     return {
@@ -557,7 +1161,7 @@ class ElasticsearchRepository(Repository):
     }
     if article_query.sort_field is not None and article_query.sort_dir is not None:
       option = {
-        self.__map_keys([article_query.sort_field], self.article_search_keys_to_repo_model)[0]: {
+        map_keys([article_query.sort_field], article_search_keys_to_repo_model)[0]: {
           "order": article_query.sort_dir.value,
         }
       }
@@ -569,120 +1173,28 @@ class ElasticsearchRepository(Repository):
       "sort": sort_orders,
     }
 
-  def __re_rank_rrf(self, res1, res2) -> dict: 
-      k = 60
-      docs = {}
-      for i, r in enumerate(res1):
-        docs[r['_id']] = {
-          'doc': r,
-          'rank': 1.0 / (k + i+1)
-        }
-      
-      for i, r in enumerate(res2):
-        id = r['_id']
-        if id in docs:
-          docs[id]['rank'] += 1.0 / (k + i+1)
-        else:
-          docs[id] = {
-            'doc': r,
-            'rank': 1.0 / (k + i+1) 
-          }
-      
-      return [v['doc'] for _, v in sorted(docs.items(), key=lambda doc: doc[1]['rank'], reverse=True)]
-
-  def __map_keys(self, keys: list[str] | None, mapping: dict) -> list[str] | None:
-    # reverse mapping from DTO keys to repo model
-    if keys is None:
-      # returns every key by default
-      return None 
-
-    mapped = []
-    for k in keys:
-      if type(mapping[k]) == str:
-        mapped.append(mapping[k])
-      elif type(mapping[k]) == list:
-        mapped.extend(mapping[k])
-    return mapped
-
-  def __map_to_articles(self, doc_hits: dict) -> ArticleList:
-    # map from repo model to domain model
-
-    articles: list[Article] = []
-
-    total_count = doc_hits['total']['value']
-
-    for doc in doc_hits["hits"]:
-      source = doc['_source']
-
-      # at least the '_id' field should always be present
-      id = doc.get('_id', None)
-
-      if id is None:
-        raise ValueError(f"no '_id' field found in doc: {doc}")
-
-      article = Article(id=id)
-      if 'article' in source:
-        art = source['article']
-        article.url = art.get('url', None)
-        article.source = art.get('source', None)
-        article.publish_date = art.get('publish_date', None)
-        article.image = art.get('image', None)
-        author = art.get('author', None)
-        article.author = "\n".join(author) if author is not None else None
-        title = art.get('title', None)
-        article.title = "\n".join(title) if title is not None else None
-        paragraphs = art.get('paragraphs', None)
-        article.paragraphs = paragraphs[:3] if paragraphs is not None else None # only take the first 3 paragraphs
-
-        categories = art.get('categories', None)
-        if categories:
-          article.categories = [
-            Category(
-              id=id,
-              name=name
-            ) for id, name in zip(categories['ids'], categories['names'])
-          ] 
-
-      if 'analyzer' in source:
-        # TODO: embeddings are never returned, they are excluded from every search
-        analyzer = source['analyzer']
-        article.embeddings = analyzer.get('embeddings', None)
-
-        # analyzed categories can only be constructed if the merged categories are present
-        analyzer_category_ids = analyzer.get('category_ids', None)
-        if analyzer_category_ids and article.categories:
-          article.analyzed_categories = [cat for cat in article.categories if cat.id in analyzer_category_ids]
-      
-      if 'topics' in source and source['topics'] is not None:
-        topics = source['topics']
-        article_topics = [ArticleTopic(
-          id=id, 
-          topic=topic) for id, topic in zip(topics['topic_ids'], topics['topic_names'])
-        ]
-        if len(article_topics) != 0:
-          article.topics = article_topics
-
-      articles.append(article)
-
-    res = ArticleList(articles=articles, total_count=total_count)
-    return res 
-
   async def search_topics(self, topic_query: TopicQuery) -> TopicList:
+    docs, next_cursor = await self.__search_page(
+      self.topics_index, 
+      topic_query,
+      **self.__build_topic_search(topic_query)
+    )
+    topics = map_to_topics(docs["hits"])
+    topics.next_cursor = next_cursor
+    return topics
+
+  def __build_topic_search(self, topic_query: TopicQuery) -> dict:
     query = self.__build_topic_query(topic_query)
     sort_options = self.__build_topic_sort_options(topic_query)
-    docs = await self.es.search(
-      index=self.topics_index, 
+    return dict(
       query=query,
       sort=sort_options["sort"],
       track_scores=sort_options["track_scores"],
-      from_=topic_query.page * topic_query.page_size,
-      size=topic_query.page_size,
-      source_includes=self.__map_keys(
+      source_includes=map_keys(
         keys=topic_query.return_attributes,
-        mapping=self.topic_search_keys_to_repo_model
+        mapping=topic_search_keys_to_repo_model
       )
     )
-    return self.__map_to_topics(docs["hits"])
   
   def __build_topic_query(self, topic_query: TopicQuery) -> dict:
     filters = []
@@ -765,7 +1277,7 @@ class ElasticsearchRepository(Repository):
     ]
     if topic_query.sort_field is not None and topic_query.sort_dir is not None:
       options = [{
-        self.__map_keys([topic_query.sort_field], self.topic_sort_keys_to_repo_model)[0]: {
+        map_keys([topic_query.sort_field], topic_sort_keys_to_repo_model)[0]: {
           "order": topic_query.sort_dir.value,
         }
       }]
@@ -777,68 +1289,28 @@ class ElasticsearchRepository(Repository):
       "sort": sort_orders,
     }
   
-  def __map_to_topics(self, doc_hits: list[dict]) -> TopicList:
-    # convert to domain model
-
-    topics: list[Topic] = []
-    total_count = doc_hits['total']['value']
-
-    for doc in doc_hits['hits']:
-      source = doc['_source']
-
-      # at least the '_id' field should always be present
-      id = doc.get('_id', None)
-
-      if id is None:
-        raise ValueError(f"no '_id' field found in doc: {doc}")
-
-      topic = Topic(id=id)
-      topic.batch_id = source.get('batch_id', None)
-      topic.create_time = source.get('create_time', None)
-      topic.topic = source.get('topic', None)
-
-      if 'batch_query' in source:
-        topic.batch_query = TopicArticleQuery(
-          publish_date=PublishDateFilter(
-            start=datetime.fromisoformat(source['batch_query']['publish_date']['start']),
-            end=datetime.fromisoformat(source['batch_query']['publish_date']['end']),
-          )
-        )
-      topic.count = source.get('count', None)
-
-      if 'representative_articles' in source:
-        topic.representative_articles = [
-          TopicArticle(
-            id=ra['_id'],
-            url=ra['url'],
-            image=ra['image'] if 'image' in ra else None,
-            publish_date=datetime.fromisoformat(ra['publish_date']),
-            author=ra['author'],
-            title=ra['title'],
-          ) for ra in source['representative_articles']
-        ]
-
-      topics.append(topic)
-
-    res = TopicList(topics=topics, total_count=total_count)
-    return res
-
   async def get_topic_batches(self, topic_batch_query: TopicBatchQuery) -> TopicBatchList:
+    docs, next_cursor = await self.__search_page(
+      self.topic_batches_index, 
+      topic_batch_query,
+      **self.__build_topic_batch_search(topic_batch_query)
+    )
+    batches = map_to_topic_batches(docs["hits"])
+    batches.next_cursor = next_cursor
+    return batches
+
+  def __build_topic_batch_search(self, topic_batch_query: TopicBatchQuery) -> dict:
     query = self.__build_topic_batch_query(topic_batch_query)
     sort_options = self.__build_topic_batch_sort_options(topic_batch_query)
-    docs = await self.es.search(
-      index=self.topic_batches_index, 
+    return dict(
       query=query,
       sort=sort_options["sort"],
       track_scores=sort_options["track_scores"],
-      from_=topic_batch_query.page * topic_batch_query.page_size,
-      size=topic_batch_query.page_size,
-      source_includes=self.__map_keys(
+      source_includes=map_keys(
         keys=topic_batch_query.return_attributes,
-        mapping=self.topic_batch_search_keys_to_repo_model
+        mapping=topic_batch_search_keys_to_repo_model
       )
     )
-    return self.__map_to_topic_batches(docs["hits"])
   
   def __build_topic_batch_query(self, topic_batch_query: TopicBatchQuery) -> dict:
     filters = []
@@ -897,7 +1369,7 @@ class ElasticsearchRepository(Repository):
     ]
     if topic_batch_query.sort_field is not None and topic_batch_query.sort_dir is not None:
       options = [{
-        self.__map_keys([topic_batch_query.sort_field], self.topic_batch_search_keys_to_repo_model)[0]: {
+        map_keys([topic_batch_query.sort_field], topic_batch_search_keys_to_repo_model)[0]: {
           "order": topic_batch_query.sort_dir.value,
         }
       }]
@@ -908,48 +1380,17 @@ class ElasticsearchRepository(Repository):
       "sort": sort_orders,
     }
   
-  def __map_to_topic_batches(self, doc_hits: list[dict]) -> TopicBatchList:
-    # convert to domain model
-
-    topic_batches: list[TopicBatch] = []
-    total_count = doc_hits['total']['value']
-
-    for doc in doc_hits['hits']:
-      source = doc['_source']
-
-      # at least the '_id' field should always be present
-      id = doc.get('_id', None)
-
-      if id is None:
-        raise ValueError(f"no '_id' field found in doc: {doc}")
-
-      topic_batch = TopicBatch(id=id)
-
-      if 'query' in source:
-        topic_batch.query = TopicArticleQuery(
-          publish_date=PublishDateFilter(
-            start=datetime.fromisoformat(source['query']['publish_date']['start']),
-            end=datetime.fromisoformat(source['query']['publish_date']['end']),
-          )
-        )
-      topic_batch.article_count = source.get('article_count', None)
-      topic_batch.topic_count = source.get('topic_count', None)
-      topic_batch.create_time = source.get('create_time', None)
-
-      topic_batches.append(topic_batch)
-
-    res = TopicBatchList(batches=topic_batches, total_count=total_count)
-    return res
-
   async def search_categories(self, category_query: CategoryQuery) -> CategoryList:
-    query = self.__build_categories_query(category_query)
-    docs = await self.es.search(
+    docs = await observe_es("search_categories", self.es.search(**self.__categories_request(category_query)))
+    return map_to_categories(docs['hits'])
+
+  def __categories_request(self, category_query: CategoryQuery) -> dict:
+    return dict(
       index=self.categories_index,
-      query=query,
+      query=self.__build_categories_query(category_query),
       from_=category_query.page * category_query.page_size,
       size=category_query.page_size,
     )
-    return self.__map_to_categories(docs['hits'])
 
   def __build_categories_query(self, category_query: CategoryQuery) -> dict:
     filter_queries = []
@@ -968,34 +1409,6 @@ class ElasticsearchRepository(Repository):
       }
     }
 
-  def __map_to_categories(self, doc_hits: list[dict]) -> CategoryList:
-    categories: list[Category] = []
-    total_count = doc_hits['total']['value']
-
-    for doc in doc_hits['hits']:
-      source = doc['_source']
-
-      # the '_id' field should always be present
-      id = doc.get('_id', None)
-      if id is None:
-        raise ValueError(f"no '_id' field found in doc: {doc}")
-
-      # the 'name' field should always be present
-      name = source.get('name', None)
-      if name is None:
-        raise ValueError(f"no 'name' field found in source of doc: {doc}")
-
-      categories.append(Category(
-        id=id, 
-        name=name
-      ))
-
-    res = CategoryList(
-      total_count=total_count,
-      categories=categories
-    )
-    return res
-    
   def __build_category_name_query(self, name: str) -> dict:
     return {
       "match": {
@@ -0,0 +1,34 @@
+from elastic_transport import AiohttpHttpNode
+import aiohttp
+
+
+class ConnectTimeoutSession:
+  """Adds a connect timeout to the requests of an aiohttp session, the rest is passed through."""
+
+  def __init__(self, session: aiohttp.ClientSession, connect_timeout: float):
+    self.session = session
+    self.connect_timeout = connect_timeout
+
+  def request(self, method: str, url: str, timeout: aiohttp.ClientTimeout | None = None, **kwargs):
+    total = timeout.total if timeout is not None else None
+    # 'connect' includes waiting for a free connection of the pool, not only opening one
+    timeout = aiohttp.ClientTimeout(total=total, connect=self.connect_timeout)
+    return self.session.request(method, url, timeout=timeout, **kwargs)
+
+  def __getattr__(self, name: str):
+    return getattr(self.session, name)
+
+
+class ConnectTimeoutAiohttpNode(AiohttpHttpNode):
+  # the aiohttp node of the client only has a total timeout for every request
+  connect_timeout: float | None = None
+
+  def _create_aiohttp_session(self) -> None:
+    super()._create_aiohttp_session()
+    if self.connect_timeout is not None:
+      self.session = ConnectTimeoutSession(self.session, self.connect_timeout)
+
+
+def aiohttp_node_class(connect_timeout: float) -> type[AiohttpHttpNode]:
+  # the client creates the nodes from the class, so the timeout is a class attribute
+  return type("AiohttpNode", (ConnectTimeoutAiohttpNode,), {"connect_timeout": connect_timeout})
@@ -0,0 +1,398 @@
+from ..utils import log_utils
+from ..dto.article_query import ArticleQuery, ArticleQueryType
+from ..dto.sort_direction import SortDirection
+from ..domain.article import ArticleList
+from .delegating_repository import DelegatingRepository
+from .repository import BatchSearch, BatchSearchResult
+from .elasticsearch_repository import ElasticsearchRepository, KNN_K
+from .document_mapping import map_keys, map_to_articles, filter_source, article_search_keys_to_repo_model, tokenize, to_epoch_ms, get_path, ES_DEFAULT_SIZE
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import tempfile
+import logging
+import asyncio
+import time
+import os
+
+
+# the keyword and text fields which can be filtered in the hot window, with the paths of their values in the article source
+FILTER_FIELDS = {
+  "source": ["article", "source"],
+  "categories": ["article", "categories", "names"],
+  "category_ids": ["article", "categories", "ids"],
+  "topics": ["topics", "topic_names"],
+  "topic_ids": ["topics", "topic_ids"],
+}
+
+# text fields are matched by any of their tokens, like the 'match' queries, keywords by exact values
+TEXT_FIELDS = set(["source", "categories", "topics"])
+
+
+class HotWindowIndex:
+  """
+  Immutable snapshot of the articles published in the window, rebuilt as a whole.
+  Rows are ordered by publish date, so date filters are row ranges, the other filters are packed bitmaps.
+  """
+
+  def __init__(self, docs: list[dict], window_start: datetime, directory: str, generation: int, quantize: bool):
+    self.window_start = window_start
+    self.generation = generation
+    self.quantize = quantize
+
+    docs = [d for d in docs if self.__is_indexable(d["_source"])]
+    docs.sort(key=lambda d: to_epoch_ms(d["_source"]["article"]["publish_date"]))
+
+    self.ids = [d["_id"] for d in docs]
+    self.id_to_row = {id: row for row, id in enumerate(self.ids)}
+    self.dates = np.array([to_epoch_ms(d["_source"]["article"]["publish_date"]) for d in docs], dtype=np.int64)
+
+    # the embeddings are only kept in the matrix, and only the first 3 paragraphs are ever returned
+    self.sources = []
+    for d in docs:
+      source = dict(d["_source"])
+      source["analyzer"] = {k: v for k, v in source["analyzer"].items() if k != "embeddings"}
+      article = dict(source["article"])
+      if article.get("paragraphs", None) is not None:
+        article["paragraphs"] = article["paragraphs"][:3]
+      source["article"] = article
+      self.sources.append(source)
+
+    self.path = os.path.join(directory, f"embeddings-{generation}.{'i8' if quantize else 'f32'}")
+    self.__build_matrix([d["_source"]["analyzer"]["embeddings"] for d in docs])
+    self.__build_bitmaps()
+
+  def __is_indexable(self, source: dict) -> bool:
+    return (
+      get_path(source, ["analyzer", "embeddings"]) is not None and
+      get_path(source, ["article", "publish_date"]) is not None
+    )
+
+  def __build_matrix(self, embeddings: list[list[float]]):
+    vectors = np.array(embeddings, dtype=np.float32)
+    if len(embeddings) == 0:
+      vectors = vectors.reshape(0, 0)
+    # cosine similarity is a dot product of unit-length vectors
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    self.dims = vectors.shape[1]
+
+    if self.quantize:
+      # symmetric per-row scalar quantization
+      self.scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+      vectors = np.round(vectors / self.scales[:, None]).astype(np.int8)
+      self.scales = self.scales.astype(np.float32)
+
+    # written out and mapped back read-only, the pages are managed by the OS page cache instead of the heap
+    out = np.memmap(self.path, dtype=vectors.dtype, mode="w+", shape=max(1, vectors.size))
+    out[:vectors.size] = vectors.reshape(-1)
+    out.flush()
+    del out
+    mapped = np.memmap(self.path, dtype=vectors.dtype, mode="r", shape=max(1, vectors.size))
+    self.matrix = np.asarray(mapped)[:vectors.size].reshape(vectors.shape)
+
+  def __build_bitmaps(self):
+    rows = len(self.ids)
+    self.bitmaps: dict[str, dict[str, np.ndarray]] = {}
+
+    for field, path in FILTER_FIELDS.items():
+      postings: dict[str, list[int]] = {}
+      for row, source in enumerate(self.sources):
+        values = get_path(source, path)
+        if values is None:
+          continue
+        if isinstance(values, str):
+          values = [values]
+
+        terms = set()
+        for v in values:
+          terms.update(tokenize(v) if field in TEXT_FIELDS else [v])
+        for t in terms:
+          postings.setdefault(t, []).append(row)
+
+      bitmaps = {}
+      for term, term_rows in postings.items():
+        bits = np.zeros(rows, dtype=bool)
+        bits[term_rows] = True
+        bitmaps[term] = np.packbits(bits)
+      self.bitmaps[field] = bitmaps
+
+  def __any_of(self, field: str, terms: list[str]) -> np.ndarray:
+    packed = np.zeros((len(self.ids) + 7) // 8, dtype=np.uint8)
+    for t in terms:
+      bitmap = self.bitmaps[field].get(t, None)
+      if bitmap is not None:
+        packed |= bitmap
+    return packed
+
+  def memory_bytes(self) -> int:
+    bitmaps = sum(b.nbytes for field in self.bitmaps.values() for b in field.values())
+    scales = self.scales.nbytes if self.quantize else 0
+    return self.matrix.nbytes + scales + bitmaps + self.dates.nbytes
+
+  def can_serve(self, search_options: ArticleQuery) -> bool:
+    date_min = search_options.date_min
+    return (
+      date_min is not None and
+      to_epoch_ms(date_min) >= to_epoch_ms(self.window_start) and
+      # author names are free text, they aren't indexed in the window
+      search_options.author is None
+    )
+
+  def search(self, search_options: ArticleQuery, embeddings, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Exact top 'k' of the rows matching the filters, by cosine similarity. Returns the rows and their scores."""
+
+    # date range
+    start = np.searchsorted(self.dates, to_epoch_ms(search_options.date_min), side="left")
+    end = len(self.dates)
+    if search_options.date_max is not None:
+      end = np.searchsorted(self.dates, to_epoch_ms(search_options.date_max), side="right")
+    if start >= end:
+      return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    # every other filter is an intersection of bitmaps
+    packed = None
+    filters = []
+    if search_options.source:
+      filters.append(self.__any_of("source", tokenize(search_options.source)))
+    if search_options.categories:
+      filters.append(self.__any_of("categories", tokenize(search_options.categories)))
+    if search_options.category_ids:
+      filters.append(self.__any_of("category_ids", search_options.category_ids))
+    if search_options.topic:
+      filters.append(self.__any_of("topics", tokenize(search_options.topic)))
+    if search_options.topic_ids:
+      filters.append(self.__any_of("topic_ids", search_options.topic_ids))
+    for f in filters:
+      packed = f if packed is None else packed & f
+
+    if packed is None:
+      rows = np.arange(start, end)
+    else:
+      mask = np.unpackbits(packed, count=len(self.ids))[start:end].astype(bool)
+      rows = np.flatnonzero(mask) + start
+
+    if search_options.ids and len(search_options.ids) > 0:
+      id_rows = [self.id_to_row[id] for id in search_options.ids if id in self.id_to_row]
+      rows = np.intersect1d(rows, np.array(id_rows, dtype=np.int64))
+
+    if len(rows) == 0:
+      return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    query = np.asarray(embeddings, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    # unless the filters are selective, scoring the whole date range straight from the mapped matrix
+    # is cheaper than gathering the matching rows into a copy
+    if len(rows) * 4 >= end - start:
+      scores = self.__score(self.matrix[start:end], query, slice(start, end))[rows - start]
+    else:
+      scores = self.__score(self.matrix[rows], query, rows)
+
+    if len(rows) > k:
+      top = np.argpartition(-scores, k)[:k]
+      rows = rows[top]
+      scores = scores[top]
+
+    # same score as Elasticsearch's cosine similarity
+    return rows, (1 + scores) / 2
+
+  def __score(self, candidates: np.ndarray, query: np.ndarray, rows) -> np.ndarray:
+    if self.quantize:
+      return (candidates.astype(np.float32) @ query) * self.scales[rows]
+    return candidates @ query
+
+  def close(self):
+    del self.matrix
+    try:
+      os.remove(self.path)
+    except OSError:
+      pass
+
+
+class HotWindowRepository(DelegatingRepository):
+  """
+  Serves semantic searches over the most recent articles from an in-process vector index.
+  Searches reaching outside of the window, and every other search, are passed on to Elasticsearch.
+  The index is rebuilt from Elasticsearch in the background, so it's at most 'refresh_seconds' behind.
+  """
+
+  def __init__(
+      self,
+      repo: ElasticsearchRepository,
+      window_days: float,
+      refresh_seconds: float = 60,
+      quantize: bool = False,
+      directory: str | None = None,
+      log_level: int = logging.INFO
+  ):
+    super().__init__(repo)
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+
+    self.window = timedelta(days=window_days)
+    self.refresh_seconds = refresh_seconds
+    self.quantize = quantize
+    self.directory = directory
+    self.temp_directory = None
+
+    self.index: HotWindowIndex | None = None
+    self.refresher: asyncio.Task | None = None
+    self.generation = 0
+
+    self.served = 0
+    self.passed_on = 0
+    self.search_seconds = 0.0
+    self.build_seconds = 0.0
+    self.failed_builds = 0
+    self.built_at: datetime | None = None
+
+  async def start(self):
+    await super().start()
+
+    if self.directory is None:
+      self.temp_directory = tempfile.TemporaryDirectory(prefix="searcher-hot-window-")
+      self.directory = self.temp_directory.name
+    os.makedirs(self.directory, exist_ok=True)
+
+    # searches are passed on to Elasticsearch until the first build is done, so startup isn't blocked
+    self.refresher = asyncio.create_task(self.__refresh_periodically())
+
+  async def __refresh_periodically(self):
+    while True:
+      try:
+        await self.refresh()
+      except asyncio.CancelledError:
+        raise
+      except Exception as e:
+        self.failed_builds += 1
+        self.log.error("failed to build the hot window index", exc_info=e)
+      await asyncio.sleep(self.refresh_seconds)
+
+  async def refresh(self):
+    start = time.perf_counter()
+    window_start = datetime.now(timezone.utc) - self.window
+
+    docs = [doc async for doc in self.repo.scan_articles(window_start)]
+
+    self.generation += 1
+    index = await asyncio.get_running_loop().run_in_executor(
+      None, HotWindowIndex, docs, window_start, self.directory, self.generation, self.quantize
+    )
+
+    # searches run on the event loop without awaiting, none of them can be using the previous index here
+    previous = self.index
+    self.index = index
+    if previous is not None:
+      previous.close()
+
+    self.build_seconds = time.perf_counter() - start
+    self.built_at = datetime.now(timezone.utc)
+    self.log.info(
+      f"built hot window index of {len(index.ids)} articles since {window_start.isoformat()} "
+      f"in {self.build_seconds:.2f}s, {index.memory_bytes() / 2**20:.1f}MB"
+    )
+
+  async def search_articles_embeddings(self, search_options: ArticleQuery, embeddings: list) -> ArticleList:
+    index = self.index
+    if index is None or not index.can_serve(search_options):
+      self.passed_on += 1
+      return await self.repo.search_articles_embeddings(search_options, embeddings)
+
+    start = time.perf_counter()
+    rows, scores = index.search(search_options, embeddings, KNN_K)
+
+    # sorted like the kNN results of Elasticsearch, by publish date, then by score,
+    # the direction only applies with a sort field, otherwise it's always descending
+    ascending = search_options.sort_field is not None and search_options.sort_dir == SortDirection.asc
+    descending = not ascending
+    dates = index.dates[rows]
+    order = np.lexsort((-scores, -dates if descending else dates))
+    rows = rows[order][:ES_DEFAULT_SIZE]
+
+    includes = map_keys(
+      keys=search_options.return_attributes,
+      mapping=article_search_keys_to_repo_model
+    )
+    hits = [{
+      "_id": index.ids[row],
+      "_source": filter_source(index.sources[row], includes),
+    } for row in rows]
+
+    # support paging manually, like the Elasticsearch repository
+    page_start = search_options.page * search_options.page_size
+    page_end = page_start + search_options.page_size
+    articles = map_to_articles({
+      "total": {"value": len(order)},
+      "hits": hits[page_start:page_end],
+    })
+
+    self.served += 1
+    self.search_seconds += time.perf_counter() - start
+    return articles
+
+  async def search_batch(self, searches: list[BatchSearch]) -> list[BatchSearchResult]:
+    # the semantic searches inside the window are served here, the rest in a single batch by the wrapped repository
+    index = self.index
+    results = [None] * len(searches)
+    passed_on = []
+    for i, (query, embeddings) in enumerate(searches):
+      if (
+        index is None or 
+        not isinstance(query, ArticleQuery) or 
+        query.search_type != ArticleQueryType.semantic or 
+        not index.can_serve(query)
+      ):
+        passed_on.append(i)
+        continue
+      try:
+        results[i] = await self.search_articles_embeddings(query, embeddings)
+      except Exception as e:
+        results[i] = e
+
+    if len(passed_on) > 0:
+      passed_on_results = await self.repo.search_batch([searches[i] for i in passed_on])
+      for i, result in zip(passed_on, passed_on_results):
+        results[i] = result
+    return results
+
+  async def index_generations(self) -> dict[str, object]:
+    # the semantic searches of the window change when it's rebuilt, which is later than the articles index
+    generations = await self.repo.index_generations()
+    generations["articles"] = (generations.get("articles", None), self.generation)
+    return generations
+
+  async def close(self):
+    if self.refresher is not None:
+      self.refresher.cancel()
+      try:
+        await self.refresher
+      except asyncio.CancelledError:
+        pass
+      self.refresher = None
+
+    if self.index is not None:
+      self.index.close()
+      self.index = None
+    if self.temp_directory is not None:
+      self.temp_directory.cleanup()
+
+    await super().close()
+
+  def stats(self) -> dict:
+    index = self.index
+    stats = self.repo.stats()
+    stats["hot_window"] = {
+      "ready": index is not None,
+      "articles": len(index.ids) if index is not None else 0,
+      "window_start": index.window_start.isoformat() if index is not None else None,
+      "built_at": self.built_at.isoformat() if self.built_at is not None else None,
+      "build_seconds": self.build_seconds,
+      "failed_builds": self.failed_builds,
+      "quantized": self.quantize,
+      "memory_bytes": index.memory_bytes() if index is not None else 0,
+      "served": self.served,
+      "passed_on": self.passed_on,
+      "mean_search_ms": self.search_seconds / self.served * 1000 if self.served > 0 else 0.0,
+    }
+    return stats
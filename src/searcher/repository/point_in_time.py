@@ -0,0 +1,163 @@
+from ..utils import log_utils
+from ..utils.metrics import observe_es
+from ..dto.exceptions import QueryValidationException
+from elasticsearch import exceptions, AsyncElasticsearch
+from collections import OrderedDict
+import logging
+import asyncio
+import base64
+import json
+import time
+
+
+def encode_cursor(state: dict) -> str:
+  # opaque to the clients, they only pass it back
+  return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+  try:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+  except (ValueError, TypeError):
+    raise QueryValidationException(f"Invalid 'cursor'.")
+  if not isinstance(state, dict):
+    raise QueryValidationException(f"Invalid 'cursor'.")
+  return state
+
+
+class PointInTimeManager:
+  """
+  Pages through search results with point in times and 'search_after', every page costs the same.
+  A point in time is kept open while its pages are requested, and closed after 'keep_alive_seconds' of inactivity,
+  after the last page, or when more than 'max_open' are open (the least recently used one).
+  The cursors of expired point in times are rejected, their sort values only mean something in their own point in time.
+  """
+
+  def __init__(
+    self,
+    es: AsyncElasticsearch,
+    keep_alive_seconds: int = 120,
+    max_open: int = 200,
+    log_level: int = logging.INFO
+  ):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    self.es = es
+    self.keep_alive_seconds = keep_alive_seconds
+    self.keep_alive = f"{keep_alive_seconds}s"
+    self.max_open = max(1, max_open)
+
+    # point in time id -> last use
+    self.open_pits: OrderedDict[str, float] = OrderedDict()
+    self.reaper: asyncio.Task | None = None
+
+    self.opened = 0
+    self.closed = 0
+    self.expired = 0
+
+  def start(self):
+    if self.reaper is None:
+      self.reaper = asyncio.create_task(self.__reap())
+
+  async def close(self):
+    if self.reaper is not None:
+      self.reaper.cancel()
+      self.reaper = None
+    for pit_id in list(self.open_pits.keys()):
+      await self.__close_pit(pit_id)
+
+  def stats(self) -> dict:
+    return {
+      "open": len(self.open_pits),
+      "opened": self.opened,
+      "closed": self.closed,
+      "expired": self.expired,
+    }
+
+  async def search(self, index: str, cursor: str | None, size: int, **search_options) -> tuple[dict, str | None]:
+    """
+    Search for a page of results, 'search_options' are the same for every page, they need a 'sort'.
+    Returns the results, and the cursor of the next page, or None after the last page.
+    """
+    search_after = None
+    if cursor is not None:
+      state = decode_cursor(cursor)
+      if state.get("index", None) != index or "pit" not in state or "after" not in state:
+        raise QueryValidationException(f"Invalid 'cursor'.")
+      pit_id = state["pit"]
+      search_after = state["after"]
+    else:
+      pit_id = await self.__open_pit(index)
+
+    try:
+      res = await self.__search(pit_id, search_after, size, search_options)
+    except exceptions.NotFoundError:
+      # the point in time expired, or was closed
+      # its last sort values end with the shard and document of a hit, which differ in a new one
+      self.expired += 1
+      self.open_pits.pop(pit_id, None)
+      if cursor is None:
+        raise
+      raise QueryValidationException(f"'cursor' expired, repeat the search without it.")
+
+    # the id can change between requests
+    new_pit_id = res.get("pit_id", pit_id)
+    if new_pit_id != pit_id:
+      self.open_pits.pop(pit_id, None)
+      pit_id = new_pit_id
+
+    hits = res["hits"]["hits"]
+    if len(hits) < size or size == 0:
+      await self.__close_pit(pit_id)
+      return res, None
+
+    self.__touch(pit_id)
+    await self.__close_least_recently_used()
+    return res, encode_cursor({"index": index, "pit": pit_id, "after": hits[-1]["sort"]})
+
+  async def __search(self, pit_id: str, search_after: list | None, size: int, search_options: dict) -> dict:
+    options = {"search_after": search_after} if search_after is not None else {}
+    return await observe_es("search_pit", self.es.search(
+      pit={"id": pit_id, "keep_alive": self.keep_alive},
+      size=size,
+      **options,
+      **search_options,
+    ))
+
+  async def __open_pit(self, index: str) -> str:
+    res = await observe_es("open_pit", self.es.open_point_in_time(index=index, keep_alive=self.keep_alive))
+    self.opened += 1
+    self.__touch(res["id"])
+    return res["id"]
+
+  async def __close_pit(self, pit_id: str):
+    self.open_pits.pop(pit_id, None)
+    try:
+      await self.es.close_point_in_time(id=pit_id)
+      self.closed += 1
+    except exceptions.NotFoundError:
+      self.expired += 1
+    except exceptions.ApiError as e:
+      # it expires anyway
+      self.log.warning(f"failed to close point in time: {e}")
+
+  def __touch(self, pit_id: str):
+    self.open_pits[pit_id] = time.monotonic()
+    self.open_pits.move_to_end(pit_id)
+
+  async def __close_least_recently_used(self):
+    while len(self.open_pits) > self.max_open:
+      pit_id = next(iter(self.open_pits))
+      await self.__close_pit(pit_id)
+
+  async def __reap(self):
+    # Elasticsearch expires them too, closing frees the search contexts earlier
+    while True:
+      await asyncio.sleep(self.keep_alive_seconds / 2)
+      deadline = time.monotonic() - self.keep_alive_seconds
+      idle = [pit_id for pit_id, last_use in self.open_pits.items() if last_use < deadline]
+      for pit_id in idle:
+        await self.__close_pit(pit_id)
@@ -0,0 +1,51 @@
+from ..utils.metrics import RRF_SECONDS
+
+
+def re_rank_rrf(res1: list[dict], res2: list[dict]) -> list[dict]:
+  # reciprocal rank fusion of 2 ranked lists of hits, returns the best ranked first
+  k = 60
+  docs = {}
+  for i, r in enumerate(res1):
+    docs[r['_id']] = {
+      'doc': r,
+      'rank': 1.0 / (k + i+1)
+    }
+  
+  for i, r in enumerate(res2):
+    id = r['_id']
+    if id in docs:
+      docs[id]['rank'] += 1.0 / (k + i+1)
+    else:
+      docs[id] = {
+        'doc': r,
+        'rank': 1.0 / (k + i+1) 
+      }
+  
+  return [v['doc'] for _, v in sorted(docs.items(), key=lambda doc: doc[1]['rank'], reverse=True)]
+
+
+def combine_hits(text_hits: dict, em_hits: dict, size: int) -> dict:
+  # combines the 'hits' of a lexical and a semantic search, so it looks like a single result
+  # the total is missing from the hits if it isn't tracked
+  text_total = text_hits.get('total', None)
+  em_total = em_hits.get('total', None)
+
+  if text_total is not None and text_total['value'] == 0:
+    return {**em_hits, 'hits': em_hits['hits'][:size]}
+  elif em_total is not None and em_total['value'] == 0:
+    return {**text_hits, 'hits': text_hits['hits'][:size]}
+
+  with RRF_SECONDS.time():
+    reranked_docs = re_rank_rrf(text_hits['hits'], em_hits['hits'])
+  combined = {
+    'hits': reranked_docs[:size],
+  }
+
+  totals = [t['value'] for t in [text_total, em_total] if t is not None]
+  if len(totals) > 0:
+    # precise total count cannot be provided because of overlap between the 2 queries, so the max is returned
+    combined['total'] = {
+      'value': max(totals),
+      'relation': 'gte',
+    }
+  return combined
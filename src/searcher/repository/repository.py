@@ -1,18 +1,37 @@
 from abc import ABC, abstractmethod
-from ..dto.article_query import ArticleQuery
+from ..dto.article_query import ArticleQuery, ArticleQueryType
 from ..dto.topic_query import TopicQuery
+from ..dto.article_facet_query import ArticleFacetQuery
+from ..dto.article_histogram_query import ArticleHistogramQuery
 from ..dto.topic_batch_query import TopicBatchQuery
 from ..domain.article import ArticleList
 from ..domain.topic import TopicList, TopicBatchList
 from ..domain.category import CategoryList
+from ..domain.facet import ArticleFacets
+from ..domain.histogram import ArticleHistogram
 from ..dto.category_query import CategoryQuery
+import asyncio
+
+
+# a search of a batch, with the embeddings of the query for semantic and combined article searches
+BatchSearch = tuple[ArticleQuery | TopicQuery | TopicBatchQuery | CategoryQuery, list | None]
+BatchSearchResult = ArticleList | TopicList | TopicBatchList | CategoryList | Exception
+
+# an exactly counted page without results
+COUNT_QUERY_UPDATE = {
+  "page": 0,
+  "page_size": 0,
+  "track_total_hits": True,
+  "use_cursor": False,
+  "cursor": None,
+}
 
 
 class Repository(ABC):
 
   @abstractmethod
-  async def search_articles_combined(self, article_query: ArticleQuery, embeddings: list) -> ArticleList:
-    """Lexical and semantic search combined."""
+  async def search_articles_combined(self, article_query: ArticleQuery, embeddings: list, depth: int | None = None) -> ArticleList:
+    """Lexical and semantic search combined, with 'depth' at least that many semantic results are fused, for the result sessions."""
     raise NotImplementedError
 
   @abstractmethod
@@ -35,7 +54,83 @@ class Repository(ABC):
     """Search and filter for topics."""
     raise NotImplementedError
   
+  @abstractmethod
+  async def facet_articles(self, facet_query: ArticleFacetQuery) -> ArticleFacets:
+    """Number of articles matching the lexical query and filters, and the most frequent values of their facets."""
+    raise NotImplementedError
+
+  @abstractmethod
+  async def histogram_articles(self, histogram_query: ArticleHistogramQuery) -> ArticleHistogram:
+    """Number of articles matching the lexical query and filters, by publish date."""
+    raise NotImplementedError
+
   @abstractmethod
   async def search_categories(self, category_query: CategoryQuery) -> CategoryList:
     """Get the categories that match the query."""
-    raise NotImplementedError
\ No newline at end of file
+    raise NotImplementedError
+
+  async def search_batch(self, searches: list[BatchSearch]) -> list[BatchSearchResult]:
+    """Several searches at once, the results are in the same order, failed searches return their exception."""
+    # concurrently by default, the repositories with a cheaper way override it
+    return await asyncio.gather(*[self.__search(query, embeddings) for query, embeddings in searches], return_exceptions=True)
+
+  async def __search(self, query: ArticleQuery | TopicQuery | TopicBatchQuery | CategoryQuery, embeddings: list | None):
+    if isinstance(query, ArticleQuery):
+      if query.search_type == ArticleQueryType.semantic:
+        return await self.search_articles_embeddings(query, embeddings)
+      elif query.search_type == ArticleQueryType.combined:
+        return await self.search_articles_combined(query, embeddings)
+      return await self.search_articles_text(query)
+    elif isinstance(query, TopicQuery):
+      return await self.search_topics(query)
+    elif isinstance(query, TopicBatchQuery):
+      return await self.get_topic_batches(query)
+    elif isinstance(query, CategoryQuery):
+      return await self.search_categories(query)
+    raise TypeError(f"unknown search '{type(query).__name__}'")
+
+  # counts, done with an empty page by default, the repositories with a cheaper way override them
+
+  async def count_articles(self, article_query: ArticleQuery) -> int:
+    """Number of articles matching the lexical query and filters."""
+    res = await self.search_articles_text(article_query.model_copy(update=COUNT_QUERY_UPDATE))
+    return res.total_count
+
+  async def count_topics(self, topic_query: TopicQuery) -> int:
+    """Number of topics matching the query."""
+    res = await self.search_topics(topic_query.model_copy(update=COUNT_QUERY_UPDATE))
+    return res.total_count
+
+  async def count_topic_batches(self, topic_batch_query: TopicBatchQuery) -> int:
+    """Number of topic batches matching the query."""
+    res = await self.get_topic_batches(topic_batch_query.model_copy(update=COUNT_QUERY_UPDATE))
+    return res.total_count
+
+  async def index_generations(self) -> dict[str, object]:
+    """
+    A cheap marker of the contents of the 'articles', 'topics', 'topic_batches' and 'categories' indices,
+    which changes when their documents change. The indices without one are never known to change.
+    """
+    return {}
+
+  # lifecycle hooks, the repositories which need them override them
+
+  async def assert_indices(self):
+    """Create the indices or tables, if they don't exist yet."""
+    pass
+
+  async def ping(self) -> bool:
+    """Whether the database can be reached."""
+    return True
+
+  async def start(self):
+    """Start background work, called after 'assert_indices'."""
+    pass
+
+  async def close(self):
+    """Release the connections and resources."""
+    pass
+
+  def stats(self) -> dict:
+    """Internal statistics of the repository."""
+    return {}
@@ -0,0 +1,254 @@
+from .sqlite_repository import SCHEMA, embeddings_path
+from .document_mapping import to_epoch_ms, get_path
+import numpy as np
+import argparse
+import sqlite3
+import json
+import os
+
+# Creates the database of the SqliteRepository from NDJSON dumps or from a live Elasticsearch cluster.
+# Documents already in the database are replaced, so dumps can be loaded incrementally.
+#
+# Elasticsearch snapshots are a binary format that only a cluster can read, restore the snapshot into a cluster
+# and load from there, or dump the indices to NDJSON first (one '{"_index", "_id", "_source"}' object per line,
+# or the '_bulk' format of action and source line pairs).
+#
+# python -m searcher.repository.sqlite_loader --db searcher.db ndjson articles.ndjson topics.ndjson [--index articles]
+# python -m searcher.repository.sqlite_loader --db searcher.db elasticsearch
+
+# Elasticsearch index names, dumps of indices with a suffix (e.g. 'articles-2024.03') are also recognized
+INDICES = ["articles", "topic_batches", "topics", "categories"]
+
+
+def as_text(value) -> str:
+  # text fields are either strings or lists of strings in the documents
+  if value is None:
+    return ""
+  if isinstance(value, list):
+    return "\n".join(str(v) for v in value)
+  return str(value)
+
+
+class SqliteLoader:
+
+  def __init__(self, path: str, commit_every: int = 1000):
+    self.path = path
+    self.conn = sqlite3.connect(path)
+    self.conn.execute("PRAGMA synchronous = OFF")
+    self.conn.executescript(SCHEMA)
+
+    meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+    self.dims = int(meta["dims"]) if "dims" in meta else None
+
+    self.embeddings = open(embeddings_path(path), "r+b" if os.path.exists(embeddings_path(path)) else "w+b")
+    self.commit_every = commit_every
+    self.pending = 0
+    self.counts = {index: 0 for index in INDICES}
+    self.skipped_embeddings = 0
+
+  def add(self, index: str, id: str, source: dict):
+    base = next((i for i in INDICES if index == i or index.startswith(i + "-")), None)
+    if base is None:
+      raise ValueError(f"unknown index '{index}', expected one of {INDICES}")
+
+    if base == "articles":
+      self.add_article(id, source)
+    elif base == "topics":
+      self.add_topic(id, source)
+    elif base == "topic_batches":
+      self.add_topic_batch(id, source)
+    elif base == "categories":
+      self.add_category(id, source)
+    self.counts[base] += 1
+
+    self.pending += 1
+    if self.pending >= self.commit_every:
+      self.conn.commit()
+      self.pending = 0
+
+  def __upsert(self, table: str, id: str, columns: dict, fts: bool = True) -> int:
+    # keeps the row of replaced documents, the embeddings are stored by row
+    names = ["id"] + list(columns.keys())
+    values = [id] + list(columns.values())
+    existing = self.conn.execute(f"SELECT row FROM {table} WHERE id = ?", (id,)).fetchone()
+    if existing is not None:
+      assignments = ", ".join(f"{n} = ?" for n in names)
+      self.conn.execute(f"UPDATE {table} SET {assignments} WHERE row = ?", values + [existing[0]])
+      if fts:
+        self.conn.execute(f"DELETE FROM {table}_fts WHERE rowid = ?", (existing[0],))
+      return existing[0]
+
+    cursor = self.conn.execute(
+      f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+      values
+    )
+    return cursor.lastrowid
+
+  def add_article(self, id: str, source: dict):
+    article = source.get("article", {})
+    analyzer = source.get("analyzer", {})
+    embeddings = analyzer.get("embeddings", None)
+    has_embeddings = embeddings is not None and (self.dims is None or len(embeddings) == self.dims)
+    if embeddings is not None and not has_embeddings:
+      self.skipped_embeddings += 1
+
+    # the embeddings are only kept in the matrix, and only the first 3 paragraphs are ever returned
+    doc = dict(source)
+    doc["analyzer"] = {k: v for k, v in analyzer.items() if k != "embeddings"}
+    doc["article"] = dict(article)
+    if article.get("paragraphs", None) is not None:
+      doc["article"]["paragraphs"] = article["paragraphs"][:3]
+
+    publish_date = article.get("publish_date", None)
+    row = self.__upsert("articles", id, {
+      "publish_date": to_epoch_ms(publish_date) if publish_date is not None else None,
+      "has_embeddings": 1 if has_embeddings else 0,
+      "doc": json.dumps(doc),
+    })
+
+    self.conn.execute(
+      "INSERT INTO articles_fts (rowid, title, paragraphs, source, author, categories, topics) VALUES (?, ?, ?, ?, ?, ?, ?)",
+      (
+        row,
+        as_text(article.get("title", None)),
+        as_text(article.get("paragraphs", None)),
+        as_text(article.get("source", None)),
+        as_text(article.get("author", None)),
+        as_text(get_path(source, ["article", "categories", "names"])),
+        as_text(get_path(source, ["topics", "topic_names"])),
+      )
+    )
+
+    self.conn.execute("DELETE FROM article_category_ids WHERE row = ?", (row,))
+    self.conn.executemany(
+      "INSERT INTO article_category_ids (row, category_id) VALUES (?, ?)",
+      [(row, c) for c in get_path(source, ["article", "categories", "ids"]) or []]
+    )
+    self.conn.execute("DELETE FROM article_topic_ids WHERE row = ?", (row,))
+    self.conn.executemany(
+      "INSERT INTO article_topic_ids (row, topic_id) VALUES (?, ?)",
+      [(row, t) for t in get_path(source, ["topics", "topic_ids"]) or []]
+    )
+
+    if has_embeddings:
+      vector = np.asarray(embeddings, dtype=np.float32)
+      if self.dims is None:
+        self.dims = len(vector)
+      vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+      # rows without embeddings are left as holes, they read back as zeros
+      self.embeddings.seek((row - 1) * self.dims * 4)
+      self.embeddings.write(vector.tobytes())
+
+  def add_topic(self, id: str, source: dict):
+    start = get_path(source, ["batch_query", "publish_date", "start"])
+    end = get_path(source, ["batch_query", "publish_date", "end"])
+    row = self.__upsert("topics", id, {
+      "batch_id": source.get("batch_id", None),
+      "count": source.get("count", None),
+      "start": to_epoch_ms(start) if start is not None else None,
+      "end": to_epoch_ms(end) if end is not None else None,
+      "doc": json.dumps(source),
+    })
+    self.conn.execute("INSERT INTO topics_fts (rowid, topic) VALUES (?, ?)", (row, as_text(source.get("topic", None))))
+
+  def add_topic_batch(self, id: str, source: dict):
+    start = get_path(source, ["query", "publish_date", "start"])
+    end = get_path(source, ["query", "publish_date", "end"])
+    self.__upsert("topic_batches", id, {
+      "article_count": source.get("article_count", None),
+      "topic_count": source.get("topic_count", None),
+      "start": to_epoch_ms(start) if start is not None else None,
+      "end": to_epoch_ms(end) if end is not None else None,
+      "doc": json.dumps(source),
+    }, fts=False)
+
+  def add_category(self, id: str, source: dict):
+    row = self.__upsert("categories", id, {
+      "doc": json.dumps({"name": source.get("name", None)}),
+    })
+    self.conn.execute("INSERT INTO categories_fts (rowid, name) VALUES (?, ?)", (row, as_text(source.get("name", None))))
+
+  def finish(self):
+    rows = self.conn.execute("SELECT COALESCE(MAX(row), 0) FROM articles").fetchone()[0]
+    if self.dims is not None:
+      # the matrix covers every row, even if the last articles have no embeddings
+      self.embeddings.truncate(rows * self.dims * 4)
+      self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dims', ?)", (str(self.dims),))
+    self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('articles', ?)", (str(rows),))
+    self.conn.commit()
+
+    self.conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize')")
+    self.conn.execute("ANALYZE")
+    self.conn.commit()
+    self.conn.close()
+    self.embeddings.close()
+
+    print(f"loaded {self.counts} into {self.path}, {rows} articles in total")
+    if self.skipped_embeddings > 0:
+      print(f"skipped the embeddings of {self.skipped_embeddings} articles, their dimensions differ from {self.dims}")
+
+
+def load_ndjson(loader: SqliteLoader, path: str, index: str | None = None):
+  with open(path) as f:
+    action = None
+    for line in f:
+      line = line.strip()
+      if len(line) == 0:
+        continue
+      doc = json.loads(line)
+
+      # '_bulk' format, the action line is followed by the source
+      if action is not None:
+        loader.add(index or action["_index"], action["_id"], doc)
+        action = None
+        continue
+      if len(doc) == 1 and next(iter(doc)) in ("index", "create"):
+        action = next(iter(doc.values()))
+        continue
+
+      loader.add(index or doc["_index"], doc["_id"], doc["_source"])
+
+
+async def load_elasticsearch(loader: SqliteLoader):
+  from elasticsearch import AsyncElasticsearch, helpers
+  from dotenv import load_dotenv
+
+  load_dotenv()
+  es = AsyncElasticsearch(
+    os.environ.get('ELASTIC_HOST', 'https://localhost:9200'),
+    basic_auth=(os.environ.get('ELASTIC_USER', 'elastic'), os.environ.get('ELASTIC_PASSWORD', '')),
+    ca_certs=os.environ.get('ELASTIC_CA_PATH', 'certs/_data/ca/ca.crt'),
+    verify_certs=not bool(os.environ.get('ELASTIC_TLS_INSECURE', False)),
+  )
+  try:
+    for index in INDICES:
+      async for doc in helpers.async_scan(es, index=index, size=1000):
+        loader.add(index, doc["_id"], doc["_source"])
+  finally:
+    await es.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Create or update the database of the SQLite repository.")
+  parser.add_argument("--db", required=True, help="path of the SQLite database, the embeddings are stored next to it")
+  subparsers = parser.add_subparsers(dest="source", required=True)
+
+  ndjson_parser = subparsers.add_parser("ndjson", help="NDJSON dumps of the Elasticsearch indices")
+  ndjson_parser.add_argument("files", nargs="+")
+  ndjson_parser.add_argument("--index", help="index of every document, for dumps without '_index'")
+
+  subparsers.add_parser("elasticsearch", help="every document of a live cluster, configured with the same ELASTIC_* env vars as the service")
+
+  args = parser.parse_args()
+  loader = SqliteLoader(args.db)
+  if args.source == "ndjson":
+    for path in args.files:
+      load_ndjson(loader, path, index=args.index)
+  elif args.source == "elasticsearch":
+    import asyncio
+    asyncio.run(load_elasticsearch(loader))
+  loader.finish()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,625 @@
+from ..utils import log_utils
+from ..dto.article_query import ArticleQuery
+from ..dto.topic_query import TopicQuery
+from ..dto.topic_batch_query import TopicBatchQuery
+from ..dto.category_query import CategoryQuery
+from ..dto.article_facet_query import ArticleFacetQuery
+from ..dto.article_histogram_query import ArticleHistogramQuery
+from ..dto.sort_direction import SortDirection
+from ..domain.article import ArticleList
+from ..domain.topic import TopicList, TopicBatchList
+from ..domain.category import CategoryList
+from ..domain.facet import ArticleFacets
+from ..domain.histogram import ArticleHistogram
+from .repository import Repository
+from .document_mapping import *
+from .rank_fusion import combine_hits
+from .date_histogram import histogram_of_days, DAY_MS
+from .point_in_time import encode_cursor, decode_cursor
+from ..dto.exceptions import QueryValidationException
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import threading
+import sqlite3
+import logging
+import asyncio
+import json
+import os
+
+
+# same as the Elasticsearch repository, so both backends return the same results
+KNN_K = 15
+
+# the facets are counted on the values in the documents
+article_facet_keys_to_json_paths = {
+  "source": "$.article.source",
+  "categories": "$.article.categories.names",
+  "topics": "$.topics.topic_ids",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS articles (
+  row INTEGER PRIMARY KEY,
+  id TEXT NOT NULL UNIQUE,
+  publish_date INTEGER,
+  has_embeddings INTEGER NOT NULL,
+  doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_publish_date ON articles (publish_date);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5 (
+  title, paragraphs, source, author, categories, topics,
+  tokenize = 'unicode61'
+);
+
+CREATE TABLE IF NOT EXISTS article_category_ids (
+  row INTEGER NOT NULL,
+  category_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS article_category_ids_category_id ON article_category_ids (category_id);
+CREATE INDEX IF NOT EXISTS article_category_ids_row ON article_category_ids (row);
+
+CREATE TABLE IF NOT EXISTS article_topic_ids (
+  row INTEGER NOT NULL,
+  topic_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS article_topic_ids_topic_id ON article_topic_ids (topic_id);
+CREATE INDEX IF NOT EXISTS article_topic_ids_row ON article_topic_ids (row);
+
+CREATE TABLE IF NOT EXISTS topics (
+  row INTEGER PRIMARY KEY,
+  id TEXT NOT NULL UNIQUE,
+  batch_id TEXT,
+  count INTEGER,
+  start INTEGER,
+  end INTEGER,
+  doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS topics_batch_id ON topics (batch_id);
+CREATE INDEX IF NOT EXISTS topics_end ON topics (end);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS topics_fts USING fts5 (
+  topic,
+  tokenize = 'unicode61'
+);
+
+CREATE TABLE IF NOT EXISTS topic_batches (
+  row INTEGER PRIMARY KEY,
+  id TEXT NOT NULL UNIQUE,
+  article_count INTEGER,
+  topic_count INTEGER,
+  start INTEGER,
+  end INTEGER,
+  doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS topic_batches_end ON topic_batches (end);
+
+CREATE TABLE IF NOT EXISTS categories (
+  row INTEGER PRIMARY KEY,
+  id TEXT NOT NULL UNIQUE,
+  doc TEXT NOT NULL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS categories_fts USING fts5 (
+  name,
+  tokenize = 'unicode61'
+);
+"""
+
+# the embeddings of the articles are kept next to the database, as a unit-length float32 matrix indexed by 'row - 1'
+EMBEDDINGS_FILE_SUFFIX = ".embeddings.f32"
+
+# BM25 weights of the 'articles_fts' columns, the title is boosted like in the Elasticsearch query
+ARTICLES_FTS_WEIGHTS = "2.0, 1.0, 1.0, 1.0, 1.0, 1.0"
+
+topic_sort_keys_to_columns = {
+  "date_min": "t.start",
+  "date_max": "t.end",
+  "count": "t.count",
+}
+
+topic_batch_sort_keys_to_columns = {
+  "date_min": "b.start",
+  "date_max": "b.end",
+  "article_count": "b.article_count",
+  "topic_count": "b.topic_count",
+}
+
+
+def embeddings_path(db_path: str) -> str:
+  return db_path + EMBEDDINGS_FILE_SUFFIX
+
+
+def fts_any_of(columns: list[str], text: str) -> str | None:
+  # FTS5 expression matching any token of the text in any of the columns, like a 'match' query
+  tokens = tokenize(text)
+  if len(tokens) == 0:
+    return None
+  terms = " OR ".join('"' + t.replace('"', '""') + '"' for t in tokens)
+  return "{" + " ".join(columns) + "} : (" + terms + ")"
+
+
+def placeholders(values: list) -> str:
+  return ", ".join("?" for _ in values)
+
+
+class SqliteRepository(Repository):
+  """
+  Repository backed by an embedded SQLite database, for local load tests and small single-node installs.
+  Lexical search uses FTS5 with BM25, semantic search is an exact search over the memory-mapped embeddings.
+  The database is read-only for the service, it's created with 'python -m searcher.repository.sqlite_loader'.
+  """
+
+  def __init__(self, path: str, threads: int = 4, log_level: int = logging.INFO):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    self.path = path
+
+    # sqlite3 blocks, the queries run in worker threads, each with its own connection
+    self.pool = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="sqlite")
+    self.local = threading.local()
+    self.connections: list[sqlite3.Connection] = []
+    self.connections_lock = threading.Lock()
+
+    self.embeddings: np.ndarray | None = None
+    self.dates: np.ndarray | None = None
+    self.has_embeddings: np.ndarray | None = None
+
+  async def assert_indices(self):
+    if not os.path.exists(self.path):
+      raise FileNotFoundError(f"SQLite database '{self.path}' doesn't exist, create it with searcher.repository.sqlite_loader")
+
+  async def start(self):
+    await self.__run(self.__load_embeddings)
+
+  async def index_generations(self) -> dict[str, object]:
+    # the database is only written by the loader, every table changes with it
+    generation = os.stat(self.path).st_mtime_ns
+    return {name: generation for name in ["articles", "topics", "topic_batches", "categories"]}
+
+  def __load_embeddings(self):
+    conn = self.__connection()
+    meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    rows = int(meta.get("articles", 0))
+    dims = int(meta.get("dims", 0))
+
+    # publish dates and the rows with embeddings are kept in memory, the date filter of semantic search is a numpy mask
+    self.dates = np.full(rows, np.iinfo(np.int64).min, dtype=np.int64)
+    self.has_embeddings = np.zeros(rows, dtype=bool)
+    for row, publish_date, has_embeddings in conn.execute("SELECT row, publish_date, has_embeddings FROM articles"):
+      if publish_date is not None:
+        self.dates[row - 1] = publish_date
+      self.has_embeddings[row - 1] = has_embeddings == 1
+
+    if rows > 0 and dims > 0:
+      mapped = np.memmap(embeddings_path(self.path), dtype=np.float32, mode="r", shape=(rows, dims))
+      self.embeddings = np.asarray(mapped)
+    self.log.info(f"opened SQLite database '{self.path}', {rows} articles, {self.has_embeddings.sum()} with {dims} dim embeddings")
+
+  def __connection(self) -> sqlite3.Connection:
+    conn = getattr(self.local, "conn", None)
+    if conn is None:
+      conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+      self.local.conn = conn
+      with self.connections_lock:
+        self.connections.append(conn)
+    return conn
+
+  async def __run(self, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+  async def close(self):
+    self.log.info("closing SQLite connections")
+    self.pool.shutdown(wait=True)
+    with self.connections_lock:
+      for conn in self.connections:
+        conn.close()
+      self.connections = []
+    self.embeddings = None
+
+  def __hits(self, total: int | dict | None, rows: list[tuple[str, str]], includes: list[str] | None) -> dict:
+    # same shape as the 'hits' of an Elasticsearch response, so the same mapping functions can be used
+    hits = {
+      "hits": [{
+        "_id": id,
+        "_source": filter_source(json.loads(doc), includes),
+      } for id, doc in rows],
+    }
+    if total is not None:
+      hits["total"] = total if isinstance(total, dict) else {"value": total}
+    return hits
+
+  def __total(self, conn: sqlite3.Connection, source: str, where: str, params: list, track_total_hits: bool | int | None) -> dict | None:
+    # counted like 'track_total_hits' in Elasticsearch, exactly by default
+    if track_total_hits is False:
+      return None
+    if track_total_hits is None or track_total_hits is True:
+      count = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+      return {"value": count, "relation": "eq"}
+
+    count = conn.execute(
+      f"SELECT COUNT(*) FROM (SELECT 1 FROM {source} WHERE {where} LIMIT ?)",
+      params + [track_total_hits + 1]
+    ).fetchone()[0]
+    if count > track_total_hits:
+      return {"value": track_total_hits, "relation": "gte"}
+    return {"value": count, "relation": "eq"}
+
+  # cursor paging, the database doesn't change while it's open, so the cursors only keep the offset
+
+  def __offset(self, query: ArticleQuery | TopicQuery | TopicBatchQuery) -> int:
+    if query.cursor is None:
+      return query.page * query.page_size
+    offset = decode_cursor(query.cursor).get("offset", None)
+    if not isinstance(offset, int) or offset < 0:
+      raise QueryValidationException(f"Invalid 'cursor'.")
+    return offset
+
+  def __with_next_cursor(self, results, query: ArticleQuery | TopicQuery | TopicBatchQuery, res: dict):
+    returned = len(res['hits'])
+    if (query.use_cursor or query.cursor is not None) and returned > 0 and returned == query.page_size:
+      results.next_cursor = encode_cursor({"offset": self.__offset(query) + returned})
+    return results
+
+  # articles
+
+  async def search_articles_combined(self, search_options: ArticleQuery, embeddings: list, depth: int | None = None) -> ArticleList:
+    res_text, res_em = await asyncio.gather(
+      self.__run(self.__search_articles_text, search_options),
+      # like the Elasticsearch repository, only the result sessions get deeper semantic results
+      self.__run(self.__search_articles_embeddings, search_options, embeddings, max(KNN_K, depth) if depth is not None else None),
+    )
+    return map_to_articles(combine_hits(res_text, res_em, search_options.page_size))
+
+  async def search_articles_text(self, search_options: ArticleQuery) -> ArticleList:
+    res = await self.__run(self.__search_articles_text, search_options)
+    return self.__with_next_cursor(map_to_articles(res), search_options, res)
+
+  async def search_articles_embeddings(self, search_options: ArticleQuery, embeddings: list) -> ArticleList:
+    res = await self.__run(self.__search_articles_embeddings, search_options, embeddings)
+
+    # support paging manually, like the Elasticsearch repository
+    start = search_options.page * search_options.page_size
+    end = start + search_options.page_size
+    res['hits'] = res['hits'][start:end]
+    return map_to_articles(res)
+
+  def __build_article_filters(
+      self,
+      search_options: ArticleQuery,
+      text_query: bool,
+      date_filter: bool = True
+  ) -> tuple[list[str], list[str], list]:
+    # returns the FTS5 expressions which must all match, and the SQL filters with their parameters
+    matches = []
+    if text_query and search_options.query:
+      # either the paragraphs or the title must contain the searched query
+      matches.append(fts_any_of(["title", "paragraphs"], search_options.query))
+    if search_options.source:
+      matches.append(fts_any_of(["source"], search_options.source))
+    if search_options.author:
+      matches.append(fts_any_of(["author"], search_options.author))
+    if search_options.categories:
+      matches.append(fts_any_of(["categories"], search_options.categories))
+    if search_options.topic:
+      matches.append(fts_any_of(["topics"], search_options.topic))
+
+    filters = []
+    params = []
+    if date_filter and search_options.date_min is not None:
+      filters.append("a.publish_date >= ?")
+      params.append(to_epoch_ms(search_options.date_min))
+    if date_filter and search_options.date_max is not None:
+      filters.append("a.publish_date <= ?")
+      params.append(to_epoch_ms(search_options.date_max))
+
+    if search_options.ids and len(search_options.ids) > 0:
+      filters.append(f"a.id IN ({placeholders(search_options.ids)})")
+      params.extend(search_options.ids)
+
+    if search_options.category_ids:
+      filters.append(f"a.row IN (SELECT row FROM article_category_ids WHERE category_id IN ({placeholders(search_options.category_ids)}))")
+      params.extend(search_options.category_ids)
+
+    if search_options.topic_ids:
+      filters.append(f"a.row IN (SELECT row FROM article_topic_ids WHERE topic_id IN ({placeholders(search_options.topic_ids)}))")
+      params.extend(search_options.topic_ids)
+
+    return matches, filters, params
+
+  def __search_articles_text(self, search_options: ArticleQuery) -> dict:
+    matches, filters, params = self.__build_article_filters(search_options, text_query=True)
+
+    # a query without any token can't match anything
+    if None in matches:
+      return self.__hits(0, [], None)
+
+    if len(matches) > 0:
+      source = "articles_fts JOIN articles a ON a.row = articles_fts.rowid"
+      score = f"-bm25(articles_fts, {ARTICLES_FTS_WEIGHTS})"
+      filters = ["articles_fts MATCH ?"] + filters
+      params = [" AND ".join(matches)] + params
+    else:
+      source = "articles a"
+      score = "0.0"
+    where = " AND ".join(filters) if len(filters) > 0 else "1"
+
+    # like Elasticsearch, the direction only applies with a sort field, otherwise it's always descending
+    ascending = search_options.sort_field is not None and search_options.sort_dir == SortDirection.asc
+    direction = "ASC" if ascending else "DESC"
+    conn = self.__connection()
+    total = self.__total(conn, source, where, params, search_options.track_total_hits)
+    rows = conn.execute(
+      f"SELECT a.id, a.doc, {score} AS score FROM {source} WHERE {where} "
+      f"ORDER BY a.publish_date {direction}, score DESC LIMIT ? OFFSET ?",
+      params + [search_options.page_size, self.__offset(search_options)],
+    ).fetchall()
+
+    includes = map_keys(keys=search_options.return_attributes, mapping=article_search_keys_to_repo_model)
+    return self.__hits(total, [(id, doc) for id, doc, _ in rows], includes)
+
+  def __matching_articles(self, search_options: ArticleQuery) -> tuple[str, str, list] | None:
+    # the source and condition of the lexical matches, without scoring them, None if nothing can match
+    matches, filters, params = self.__build_article_filters(search_options, text_query=True)
+    if None in matches:
+      return None
+
+    source = "articles a"
+    if len(matches) > 0:
+      source = "articles_fts JOIN articles a ON a.row = articles_fts.rowid"
+      filters = ["articles_fts MATCH ?"] + filters
+      params = [" AND ".join(matches)] + params
+    where = " AND ".join(filters) if len(filters) > 0 else "1"
+    return source, where, params
+
+  async def histogram_articles(self, histogram_query: ArticleHistogramQuery) -> ArticleHistogram:
+    days = await self.__run(self.__count_articles_by_day, histogram_query)
+    return histogram_of_days(days, histogram_query.interval)
+
+  def __count_articles_by_day(self, search_options: ArticleQuery) -> dict[int, int]:
+    matching = self.__matching_articles(search_options)
+    if matching is None:
+      return {}
+    source, where, params = matching
+    rows = self.__connection().execute(
+      f"SELECT a.publish_date - a.publish_date % {DAY_MS} AS day, COUNT(*) FROM {source} "
+      f"WHERE {where} AND a.publish_date IS NOT NULL GROUP BY day",
+      params,
+    ).fetchall()
+    return dict(rows)
+
+  async def facet_articles(self, facet_query: ArticleFacetQuery) -> ArticleFacets:
+    return map_to_article_facets(await self.__run(self.__facet_articles, facet_query))
+
+  def __facet_articles(self, facet_query: ArticleFacetQuery) -> dict:
+    # same shape as an Elasticsearch response with 'terms' aggregations
+    matching = self.__matching_articles(facet_query)
+    if matching is None:
+      return {"hits": {"total": {"value": 0}}, "aggregations": {f: {"buckets": []} for f in facet_query.facets}}
+    source, where, params = matching
+
+    conn = self.__connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+    aggregations = {}
+    for facet in facet_query.facets:
+      # the values of an article are counted once, the most frequent first, then in order like Elasticsearch
+      rows = conn.execute(
+        f"SELECT v.value, COUNT(DISTINCT a.row) AS count FROM {source}, json_each(a.doc, '{article_facet_keys_to_json_paths[facet]}') v "
+        f"WHERE {where} GROUP BY v.value ORDER BY count DESC, v.value LIMIT ?",
+        params + [facet_query.facet_size],
+      ).fetchall()
+      aggregations[facet] = {"buckets": [{"key": value, "doc_count": count} for value, count in rows]}
+    return {"hits": {"total": {"value": total}}, "aggregations": aggregations}
+
+  def __search_articles_embeddings(self, search_options: ArticleQuery, embeddings: list, k: int | None = None) -> dict:
+    # 'k' results are returned if set, otherwise the same number as Elasticsearch returns
+    if self.embeddings is None:
+      return self.__hits(0, [], None)
+
+    matches, filters, params = self.__build_article_filters(search_options, text_query=False, date_filter=False)
+    if None in matches:
+      return self.__hits(0, [], None)
+
+    # the date range is applied in memory, the other filters select the candidate rows in SQLite
+    mask = self.has_embeddings.copy()
+    if search_options.date_min is not None:
+      mask &= self.dates >= to_epoch_ms(search_options.date_min)
+    if search_options.date_max is not None:
+      mask &= self.dates <= to_epoch_ms(search_options.date_max)
+
+    conn = self.__connection()
+    if len(matches) > 0 or len(filters) > 0:
+      if len(matches) > 0:
+        sql = "SELECT a.row FROM articles_fts JOIN articles a ON a.row = articles_fts.rowid WHERE articles_fts MATCH ?"
+        params = [" AND ".join(matches)] + params
+      else:
+        sql = "SELECT a.row FROM articles a WHERE 1"
+      for f in filters:
+        sql += f" AND {f}"
+      selected = np.array([r for r, in conn.execute(sql, params)], dtype=np.int64) - 1
+      selected_mask = np.zeros(len(mask), dtype=bool)
+      selected_mask[selected] = True
+      mask &= selected_mask
+
+    rows = np.flatnonzero(mask)
+    if len(rows) == 0:
+      return self.__hits(0, [], None)
+
+    query = np.asarray(embeddings, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    # the stored embeddings are unit-length, cosine similarity scored like Elasticsearch
+    scores = (1 + self.embeddings[rows] @ query) / 2
+
+    knn_k = k if k is not None else KNN_K
+    if len(rows) > knn_k:
+      top = np.argpartition(-scores, knn_k)[:knn_k]
+      rows = rows[top]
+      scores = scores[top]
+
+    # sorted like the kNN results of Elasticsearch, by publish date, then by score
+    dates = self.dates[rows]
+    descending = not (search_options.sort_field is not None and search_options.sort_dir == SortDirection.asc)
+    order = np.lexsort((-scores, -dates if descending else dates))
+    top_rows = [int(r) + 1 for r in rows[order][:k if k is not None else ES_DEFAULT_SIZE]]
+
+    docs = dict(
+      (row, (id, doc)) for row, id, doc in
+      conn.execute(f"SELECT row, id, doc FROM articles WHERE row IN ({placeholders(top_rows)})", top_rows)
+    )
+    includes = map_keys(keys=search_options.return_attributes, mapping=article_search_keys_to_repo_model)
+    return self.__hits(len(order), [docs[r] for r in top_rows], includes)
+
+  # topics
+
+  async def search_topics(self, topic_query: TopicQuery) -> TopicList:
+    res = await self.__run(self.__search_topics, topic_query)
+    return self.__with_next_cursor(map_to_topics(res), topic_query, res)
+
+  def __search_topics(self, topic_query: TopicQuery) -> dict:
+    filters = []
+    params = []
+    if topic_query.ids and len(topic_query.ids) > 0:
+      filters.append(f"t.id IN ({placeholders(topic_query.ids)})")
+      params.extend(topic_query.ids)
+
+    if topic_query.batch_ids and len(topic_query.batch_ids) > 0:
+      filters.append(f"t.batch_id IN ({placeholders(topic_query.batch_ids)})")
+      params.extend(topic_query.batch_ids)
+
+    if topic_query.count_min is not None:
+      filters.append("t.count >= ?")
+      params.append(topic_query.count_min)
+    if topic_query.count_max is not None:
+      filters.append("t.count <= ?")
+      params.append(topic_query.count_max)
+
+    # both the start and end is in the queried range
+    for column in ["t.start", "t.end"]:
+      if topic_query.date_min is not None:
+        filters.append(f"{column} >= ?")
+        params.append(to_epoch_ms(topic_query.date_min))
+      if topic_query.date_max is not None:
+        filters.append(f"{column} <= ?")
+        params.append(to_epoch_ms(topic_query.date_max))
+
+    source = "topics t"
+    score = "0.0"
+    if topic_query.topic is not None:
+      match = fts_any_of(["topic"], topic_query.topic)
+      if match is None:
+        return self.__hits(0, [], None)
+      source = "topics_fts JOIN topics t ON t.row = topics_fts.rowid"
+      score = "-bm25(topics_fts)"
+      filters.insert(0, "topics_fts MATCH ?")
+      params.insert(0, match)
+
+    order = "t.end DESC, t.count DESC"
+    if topic_query.sort_field is not None and topic_query.sort_dir is not None:
+      order = f"{topic_sort_keys_to_columns[topic_query.sort_field]} {topic_query.sort_dir.value.upper()}"
+
+    where = " AND ".join(filters) if len(filters) > 0 else "1"
+    conn = self.__connection()
+    total = self.__total(conn, source, where, params, topic_query.track_total_hits)
+    rows = conn.execute(
+      f"SELECT t.id, t.doc, {score} AS score FROM {source} WHERE {where} "
+      f"ORDER BY {order}, score DESC LIMIT ? OFFSET ?",
+      params + [topic_query.page_size, self.__offset(topic_query)],
+    ).fetchall()
+
+    includes = map_keys(keys=topic_query.return_attributes, mapping=topic_search_keys_to_repo_model)
+    return self.__hits(total, [(id, doc) for id, doc, _ in rows], includes)
+
+  async def get_topic_batches(self, topic_batch_query: TopicBatchQuery) -> TopicBatchList:
+    res = await self.__run(self.__get_topic_batches, topic_batch_query)
+    return self.__with_next_cursor(map_to_topic_batches(res), topic_batch_query, res)
+
+  def __get_topic_batches(self, topic_batch_query: TopicBatchQuery) -> dict:
+    filters = []
+    params = []
+    if topic_batch_query.ids and len(topic_batch_query.ids) > 0:
+      filters.append(f"b.id IN ({placeholders(topic_batch_query.ids)})")
+      params.extend(topic_batch_query.ids)
+
+    ranges = [
+      ("b.article_count", topic_batch_query.count_min, topic_batch_query.count_max),
+      ("b.topic_count", topic_batch_query.topic_count_min, topic_batch_query.topic_count_max),
+    ]
+    # both the start and end is in the queried range
+    for column in ["b.start", "b.end"]:
+      ranges.append((
+        column,
+        to_epoch_ms(topic_batch_query.date_min) if topic_batch_query.date_min is not None else None,
+        to_epoch_ms(topic_batch_query.date_max) if topic_batch_query.date_max is not None else None,
+      ))
+    for column, min, max in ranges:
+      if min is not None:
+        filters.append(f"{column} >= ?")
+        params.append(min)
+      if max is not None:
+        filters.append(f"{column} <= ?")
+        params.append(max)
+
+    # most recent topic batch, if end date is equal take the higher article count
+    order = "b.end DESC, b.article_count DESC"
+    if topic_batch_query.sort_field is not None and topic_batch_query.sort_dir is not None:
+      order = f"{topic_batch_sort_keys_to_columns[topic_batch_query.sort_field]} {topic_batch_query.sort_dir.value.upper()}"
+
+    where = " AND ".join(filters) if len(filters) > 0 else "1"
+    conn = self.__connection()
+    total = self.__total(conn, "topic_batches b", where, params, topic_batch_query.track_total_hits)
+    rows = conn.execute(
+      f"SELECT b.id, b.doc FROM topic_batches b WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+      params + [topic_batch_query.page_size, self.__offset(topic_batch_query)],
+    ).fetchall()
+
+    includes = map_keys(keys=topic_batch_query.return_attributes, mapping=topic_batch_search_keys_to_repo_model)
+    return self.__hits(total, rows, includes)
+
+  # categories
+
+  async def search_categories(self, category_query: CategoryQuery) -> CategoryList:
+    return map_to_categories(await self.__run(self.__search_categories, category_query))
+
+  def __search_categories(self, category_query: CategoryQuery) -> dict:
+    filters = []
+    params = []
+    if category_query.ids is not None and len(category_query.ids) > 0:
+      filters.append(f"c.id IN ({placeholders(category_query.ids)})")
+      params.extend(category_query.ids)
+
+    source = "categories c"
+    score = "0.0"
+    if category_query.query is not None:
+      match = fts_any_of(["name"], category_query.query)
+      if match is None:
+        return self.__hits(0, [], None)
+      source = "categories_fts JOIN categories c ON c.row = categories_fts.rowid"
+      score = "-bm25(categories_fts)"
+      filters.insert(0, "categories_fts MATCH ?")
+      params.insert(0, match)
+
+    where = " AND ".join(filters) if len(filters) > 0 else "1"
+    conn = self.__connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+    rows = conn.execute(
+      f"SELECT c.id, c.doc, {score} AS score FROM {source} WHERE {where} ORDER BY score DESC, c.row LIMIT ? OFFSET ?",
+      params + [category_query.page_size, category_query.page * category_query.page_size],
+    ).fetchall()
+    return self.__hits(total, [(id, doc) for id, doc, _ in rows], None)
+
+  def stats(self) -> dict:
+    return {
+      "sqlite": {
+        "path": self.path,
+        "articles": len(self.dates) if self.dates is not None else 0,
+        "articles_with_embeddings": int(self.has_embeddings.sum()) if self.has_embeddings is not None else 0,
+        "embeddings_bytes": self.embeddings.nbytes if self.embeddings is not None else 0,
+      }
+    }
@@ -0,0 +1,56 @@
+from .document_mapping import tokenize
+import bisect
+import math
+
+# BM25 parameters of Elasticsearch's defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class TokenIndex:
+  """
+  In-memory inverted index of a text field, scored with BM25 like Elasticsearch's 'match' queries.
+  The documents are the rows of 'texts', None texts don't match anything.
+  """
+
+  def __init__(self, texts: list[str | None]):
+    self.rows = len(texts)
+
+    # token -> rows containing it, with the number of times
+    self.postings: dict[str, dict[int, int]] = {}
+    self.lengths = []
+    for row, text in enumerate(texts):
+      tokens = tokenize(text) if text is not None else []
+      self.lengths.append(len(tokens))
+      for t in tokens:
+        rows = self.postings.setdefault(t, {})
+        rows[row] = rows.get(row, 0) + 1
+    indexed = [l for l in self.lengths if l > 0]
+    self.mean_length = sum(indexed) / len(indexed) if len(indexed) > 0 else 0.0
+
+    # sorted, the tokens with a prefix are a contiguous range
+    self.tokens = sorted(self.postings.keys())
+
+  def score(self, text: str, expand_prefixes: bool = False) -> dict[int, float]:
+    """The scores of the rows matching any token of 'text'."""
+    scores: dict[int, float] = {}
+    for token in tokenize(text):
+      expanded = [token]
+      if expand_prefixes and token not in self.postings:
+        expanded = self.__with_prefix(token)
+      for t in expanded:
+        postings = self.postings.get(t, None)
+        if postings is None:
+          continue
+        idf = math.log(1 + (self.rows - len(postings) + 0.5) / (len(postings) + 0.5))
+        for row, freq in postings.items():
+          norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[row] / max(self.mean_length, 1e-9))
+          scores[row] = scores.get(row, 0.0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+    return scores
+
+  def __with_prefix(self, prefix: str) -> list[str]:
+    start = bisect.bisect_left(self.tokens, prefix)
+    end = start
+    while end < len(self.tokens) and self.tokens[end].startswith(prefix):
+      end += 1
+    return self.tokens[start:end]
@@ -0,0 +1,381 @@
+from ..utils import log_utils
+from ..dto.topic_query import TopicQuery
+from ..dto.topic_batch_query import TopicBatchQuery
+from ..dto.sort_direction import SortDirection
+from ..domain.topic import TopicList, TopicBatchList
+from .delegating_repository import DelegatingRepository
+from .repository import Repository, BatchSearch, BatchSearchResult
+from .document_mapping import *
+from .token_index import TokenIndex
+from datetime import datetime, timezone
+import numpy as np
+import logging
+import asyncio
+import time
+
+
+# numeric and date fields of the documents, as columns for filtering and sorting
+TOPIC_COLUMNS = {
+  "start": ["batch_query", "publish_date", "start"],
+  "end": ["batch_query", "publish_date", "end"],
+  "count": ["count"],
+}
+TOPIC_BATCH_COLUMNS = {
+  "start": ["query", "publish_date", "start"],
+  "end": ["query", "publish_date", "end"],
+  "article_count": ["article_count"],
+  "topic_count": ["topic_count"],
+}
+
+topic_sort_keys_to_columns = {
+  "date_min": "start",
+  "date_max": "end",
+  "count": "count",
+}
+topic_batch_sort_keys_to_columns = {
+  "date_min": "start",
+  "date_max": "end",
+  "article_count": "article_count",
+  "topic_count": "topic_count",
+}
+
+
+def as_number(value) -> float:
+  # dates as epoch milliseconds, missing values as NaN, which never match a range
+  if value is None:
+    return np.nan
+  if isinstance(value, str):
+    return float(to_epoch_ms(value))
+  return float(value)
+
+
+def total_hits(count: int, track_total_hits: bool | int | None) -> dict | None:
+  # counted like 'track_total_hits' in Elasticsearch, exactly by default
+  if track_total_hits is False:
+    return None
+  if track_total_hits is None or track_total_hits is True or count <= track_total_hits:
+    return {"value": count, "relation": "eq"}
+  return {"value": track_total_hits, "relation": "gte"}
+
+
+class ReplicaTable:
+  """The documents of an index, with their numeric fields as columns."""
+
+  def __init__(self, docs: dict[str, dict], columns: dict[str, list[str]]):
+    self.ids = list(docs.keys())
+    self.sources = [docs[id] for id in self.ids]
+    self.id_to_row = {id: row for row, id in enumerate(self.ids)}
+    self.columns = {
+      name: np.array([as_number(get_path(s, path)) for s in self.sources], dtype=np.float64)
+      for name, path in columns.items()
+    }
+
+  def select(self, ids: list[str] | None, ranges: list[tuple[str, float | None, float | None]]) -> np.ndarray:
+    mask = np.ones(len(self.ids), dtype=bool)
+    if ids is not None and len(ids) > 0:
+      id_mask = np.zeros(len(self.ids), dtype=bool)
+      id_mask[[self.id_to_row[id] for id in ids if id in self.id_to_row]] = True
+      mask &= id_mask
+    for column, min, max in ranges:
+      # NaN compares false, documents without the field never match, like Elasticsearch's 'range'
+      if min is not None:
+        mask &= self.columns[column] >= min
+      if max is not None:
+        mask &= self.columns[column] <= max
+    return mask
+
+  def order(self, rows: np.ndarray, sort: list[tuple[str, bool]], scores: np.ndarray | None = None) -> np.ndarray:
+    # sorted by the columns (descending if True), then by score, then in index order
+    # documents without the field are last in both directions, like in Elasticsearch
+    keys = [rows]
+    if scores is not None:
+      keys.append(-scores)
+    for column, descending in reversed(sort):
+      values = self.columns[column][rows]
+      keys.append(np.where(np.isnan(values), np.inf, -values if descending else values))
+    return rows[np.lexsort(keys)]
+
+  def hits(self, rows: np.ndarray, total: dict | None, includes: list[str] | None) -> dict:
+    # same shape as the 'hits' of an Elasticsearch response, so the same mapping functions can be used
+    hits = {
+      "hits": [{
+        "_id": self.ids[row],
+        "_source": filter_source(self.sources[row], includes),
+      } for row in rows],
+    }
+    if total is not None:
+      hits["total"] = total
+    return hits
+
+
+class TopicsReplica:
+  """Every topic and topic batch, indexed by batch id, date range and counts, and the topics by their text."""
+
+  def __init__(self, topics: dict[str, dict], batches: dict[str, dict]):
+    self.topics = ReplicaTable(topics, TOPIC_COLUMNS)
+    self.batches = ReplicaTable(batches, TOPIC_BATCH_COLUMNS)
+
+    self.topic_rows_by_batch: dict[str, list[int]] = {}
+    for row, source in enumerate(self.topics.sources):
+      batch_id = source.get("batch_id", None)
+      if batch_id is not None:
+        self.topic_rows_by_batch.setdefault(batch_id, []).append(row)
+    self.topic_index = TokenIndex([source.get("topic", None) for source in self.topics.sources])
+
+  def __date_ranges(self, query: TopicQuery | TopicBatchQuery) -> list[tuple]:
+    # both the start and end is in the queried range
+    date_min = to_epoch_ms(query.date_min) if query.date_min is not None else None
+    date_max = to_epoch_ms(query.date_max) if query.date_max is not None else None
+    return [("start", date_min, date_max), ("end", date_min, date_max)]
+
+  def __topic_matches(self, topic_query: TopicQuery) -> tuple[np.ndarray, np.ndarray | None]:
+    mask = self.topics.select(topic_query.ids, [
+      ("count", topic_query.count_min, topic_query.count_max),
+      *self.__date_ranges(topic_query),
+    ])
+    if topic_query.batch_ids and len(topic_query.batch_ids) > 0:
+      batch_mask = np.zeros(len(self.topics.ids), dtype=bool)
+      for batch_id in topic_query.batch_ids:
+        batch_mask[self.topic_rows_by_batch.get(batch_id, [])] = True
+      mask &= batch_mask
+
+    if topic_query.topic is None:
+      return np.flatnonzero(mask), None
+
+    scores = np.zeros(len(self.topics.ids), dtype=np.float64)
+    text_mask = np.zeros(len(self.topics.ids), dtype=bool)
+    for row, score in self.topic_index.score(topic_query.topic).items():
+      scores[row] = score
+      text_mask[row] = True
+    rows = np.flatnonzero(mask & text_mask)
+    return rows, scores[rows]
+
+  def search_topics(self, topic_query: TopicQuery) -> TopicList:
+    rows, scores = self.__topic_matches(topic_query)
+
+    sort = [("end", True), ("count", True)]
+    if topic_query.sort_field is not None and topic_query.sort_dir is not None:
+      sort = [(topic_sort_keys_to_columns[topic_query.sort_field], topic_query.sort_dir == SortDirection.desc)]
+    ordered = self.topics.order(rows, sort, scores)
+
+    start = topic_query.page * topic_query.page_size
+    page = ordered[start:start + topic_query.page_size]
+    includes = map_keys(keys=topic_query.return_attributes, mapping=topic_search_keys_to_repo_model)
+    return map_to_topics(self.topics.hits(page, total_hits(len(rows), topic_query.track_total_hits), includes))
+
+  def count_topics(self, topic_query: TopicQuery) -> int:
+    rows, _ = self.__topic_matches(topic_query)
+    return len(rows)
+
+  def __batch_matches(self, topic_batch_query: TopicBatchQuery) -> np.ndarray:
+    return np.flatnonzero(self.batches.select(topic_batch_query.ids, [
+      ("article_count", topic_batch_query.count_min, topic_batch_query.count_max),
+      ("topic_count", topic_batch_query.topic_count_min, topic_batch_query.topic_count_max),
+      *self.__date_ranges(topic_batch_query),
+    ]))
+
+  def get_topic_batches(self, topic_batch_query: TopicBatchQuery) -> TopicBatchList:
+    rows = self.__batch_matches(topic_batch_query)
+
+    # most recent topic batch, if end date is equal take the higher article count
+    sort = [("end", True), ("article_count", True)]
+    if topic_batch_query.sort_field is not None and topic_batch_query.sort_dir is not None:
+      sort = [(topic_batch_sort_keys_to_columns[topic_batch_query.sort_field], topic_batch_query.sort_dir == SortDirection.desc)]
+    ordered = self.batches.order(rows, sort)
+
+    start = topic_batch_query.page * topic_batch_query.page_size
+    page = ordered[start:start + topic_batch_query.page_size]
+    includes = map_keys(keys=topic_batch_query.return_attributes, mapping=topic_batch_search_keys_to_repo_model)
+    return map_to_topic_batches(self.batches.hits(page, total_hits(len(rows), topic_batch_query.track_total_hits), includes))
+
+  def count_topic_batches(self, topic_batch_query: TopicBatchQuery) -> int:
+    return len(self.__batch_matches(topic_batch_query))
+
+
+class TopicsReplicaRepository(DelegatingRepository):
+  """
+  Serves topic and topic batch searches from an in-process replica of both indices.
+  They are written once per topic modeling run, so the replica is only updated when newer documents appear,
+  with the documents created since the last update. Every 'full_reload_seconds' it's reloaded entirely.
+  Cursor pages are passed on to the wrapped repository, they belong to its point in times.
+  """
+
+  def __init__(
+      self,
+      repo: Repository,
+      refresh_seconds: float = 30,
+      full_reload_seconds: float = 3600,
+      log_level: int = logging.INFO
+  ):
+    super().__init__(repo)
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    self.refresh_seconds = refresh_seconds
+    self.full_reload_seconds = full_reload_seconds
+
+    # id -> source of every replicated document
+    self.topics: dict[str, dict] = {}
+    self.batches: dict[str, dict] = {}
+    # latest 'create_time' of the replicated documents, in epoch milliseconds
+    self.latest: dict[str, int | None] = {"topics": None, "topic_batches": None}
+
+    self.replica: TopicsReplica | None = None
+    self.refresher: asyncio.Task | None = None
+    self.generation = 0
+    self.full_reload_at = 0.0
+
+    self.served = 0
+    self.passed_on = 0
+    self.updates = 0
+    self.failed_updates = 0
+    self.update_seconds = 0.0
+    self.updated_at: datetime | None = None
+
+  async def start(self):
+    await super().start()
+    # searches are passed on until the first load is done
+    self.refresher = asyncio.create_task(self.__refresh_periodically())
+
+  async def __refresh_periodically(self):
+    while True:
+      try:
+        await self.refresh()
+      except asyncio.CancelledError:
+        raise
+      except Exception as e:
+        self.failed_updates += 1
+        self.log.error("failed to update the topics replica", exc_info=e)
+      await asyncio.sleep(self.refresh_seconds)
+
+  async def refresh(self):
+    start = time.perf_counter()
+    full = self.replica is None or time.monotonic() >= self.full_reload_at
+
+    if full:
+      topics = {doc["_id"]: doc["_source"] async for doc in self.repo.scan_topics()}
+      batches = {doc["_id"]: doc["_source"] async for doc in self.repo.scan_topic_batches()}
+      changed = len(topics) + len(batches)
+      self.full_reload_at = time.monotonic() + self.full_reload_seconds
+    else:
+      # a single cheap request when nothing changed, which is almost always
+      latest = await self.repo.latest_create_times()
+      topics = dict(self.topics)
+      batches = dict(self.batches)
+      changed = 0
+      for name, docs, scan in [
+        ("topics", topics, self.repo.scan_topics),
+        ("topic_batches", batches, self.repo.scan_topic_batches),
+      ]:
+        if latest.get(name, None) is None or (self.latest[name] is not None and latest[name] <= self.latest[name]):
+          continue
+        # documents created in the same millisecond as the latest one are scanned again, and replaced
+        async for doc in scan(self.latest[name]):
+          docs[doc["_id"]] = doc["_source"]
+          changed += 1
+      if changed == 0:
+        return
+
+    replica = await asyncio.get_running_loop().run_in_executor(None, TopicsReplica, topics, batches)
+    self.topics = topics
+    self.batches = batches
+    self.latest = {
+      "topics": self.__latest_create_time(topics),
+      "topic_batches": self.__latest_create_time(batches),
+    }
+    self.replica = replica
+    self.generation += 1
+
+    self.updates += 1
+    self.update_seconds = time.perf_counter() - start
+    self.updated_at = datetime.now(timezone.utc)
+    self.log.info(
+      f"{'loaded' if full else 'updated'} topics replica with {changed} documents in {self.update_seconds:.3f}s, "
+      f"{len(topics)} topics and {len(batches)} topic batches"
+    )
+
+  def __latest_create_time(self, docs: dict[str, dict]) -> int | None:
+    times = [to_epoch_ms(s["create_time"]) for s in docs.values() if s.get("create_time", None) is not None]
+    return max(times) if len(times) > 0 else None
+
+  def __can_serve(self, query: TopicQuery | TopicBatchQuery) -> bool:
+    return self.replica is not None and not query.use_cursor and query.cursor is None
+
+  async def search_topics(self, topic_query: TopicQuery) -> TopicList:
+    if not self.__can_serve(topic_query):
+      self.passed_on += 1
+      return await self.repo.search_topics(topic_query)
+    self.served += 1
+    return self.replica.search_topics(topic_query)
+
+  async def get_topic_batches(self, topic_batch_query: TopicBatchQuery) -> TopicBatchList:
+    if not self.__can_serve(topic_batch_query):
+      self.passed_on += 1
+      return await self.repo.get_topic_batches(topic_batch_query)
+    self.served += 1
+    return self.replica.get_topic_batches(topic_batch_query)
+
+  async def count_topics(self, topic_query: TopicQuery) -> int:
+    if self.replica is None:
+      return await self.repo.count_topics(topic_query)
+    return self.replica.count_topics(topic_query)
+
+  async def count_topic_batches(self, topic_batch_query: TopicBatchQuery) -> int:
+    if self.replica is None:
+      return await self.repo.count_topic_batches(topic_batch_query)
+    return self.replica.count_topic_batches(topic_batch_query)
+
+  async def search_batch(self, searches: list[BatchSearch]) -> list[BatchSearchResult]:
+    results = [None] * len(searches)
+    passed_on = []
+    for i, (query, _) in enumerate(searches):
+      if isinstance(query, (TopicQuery, TopicBatchQuery)) and self.__can_serve(query):
+        try:
+          if isinstance(query, TopicQuery):
+            results[i] = await self.search_topics(query)
+          else:
+            results[i] = await self.get_topic_batches(query)
+        except Exception as e:
+          results[i] = e
+      else:
+        passed_on.append(i)
+
+    if len(passed_on) > 0:
+      passed_on_results = await self.repo.search_batch([searches[i] for i in passed_on])
+      for i, result in zip(passed_on, passed_on_results):
+        results[i] = result
+    return results
+
+  async def index_generations(self) -> dict[str, object]:
+    # the searches change when the replica is updated, which is later than the indices
+    generations = await self.repo.index_generations()
+    for name in ["topics", "topic_batches"]:
+      generations[name] = (generations.get(name, None), self.generation)
+    return generations
+
+  async def close(self):
+    if self.refresher is not None:
+      self.refresher.cancel()
+      try:
+        await self.refresher
+      except asyncio.CancelledError:
+        pass
+      self.refresher = None
+    await super().close()
+
+  def stats(self) -> dict:
+    replica = self.replica
+    stats = self.repo.stats()
+    stats["topics_replica"] = {
+      "ready": replica is not None,
+      "topics": len(replica.topics.ids) if replica is not None else 0,
+      "topic_batches": len(replica.batches.ids) if replica is not None else 0,
+      "updated_at": self.updated_at.isoformat() if self.updated_at is not None else None,
+      "update_seconds": self.update_seconds,
+      "updates": self.updates,
+      "failed_updates": self.failed_updates,
+      "served": self.served,
+      "passed_on": self.passed_on,
+    }
+    return stats
@@ -2,12 +2,18 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from .api import search
+from .api import stats
+from .api import health
+from .api import metrics
+from .utils.metrics import MetricsMiddleware
 from .api import exception_handlers
 from .searcher_setup import (
   CORS_ALLOWED_HEADERS, 
   CORS_ALLOWED_METHODS,
   CORS_ALLOWED_ORIGINS,
-  CORS_ALLOW_CREDENTIALS
+  CORS_ALLOW_CREDENTIALS,
+  ASSERT_INDICES,
+  EMBEDDINGS_LOAD_IN_BACKGROUND,
 )
 
 
@@ -15,19 +21,45 @@ tags_metadata = [
    {
       "name": "Search",
       "description": "Search various objects."
+   },
+   {
+      "name": "Stats",
+      "description": "Internal statistics of the search service."
+   },
+   {
+      "name": "Health",
+      "description": "Liveness and readiness probes."
    }
 ]
 
-# creates db indices and closes the async db when the app closes
+# creates db indices and closes the async db and the embeddings components when the app closes
 @asynccontextmanager
 async def ensure_db(app: FastAPI):
-  from .searcher_setup import repository
+  from .searcher_setup import repository, embeddings_model, embeddings_executor, embeddings_cache, result_cache, search_warmup
   # startup
-  await repository.assert_indices()
+  if EMBEDDINGS_LOAD_IN_BACKGROUND:
+    # loads while the indices are asserted, and after the server started listening
+    embeddings_model.start()
+  if ASSERT_INDICES:
+    await repository.assert_indices()
+  await repository.start()
+  if result_cache is not None:
+    await result_cache.start()
+  if search_warmup is not None:
+    # in the background, '/health/ready' reports ready when it's done
+    search_warmup.start()
 
   yield
 
   # shutdown
+  if search_warmup is not None:
+    await search_warmup.close()
+  if result_cache is not None:
+    await result_cache.close()
+  await embeddings_executor.close()
+  embeddings_model.close()
+  if embeddings_cache is not None:
+    await embeddings_cache.close()
   await repository.close()
 
 
@@ -47,4 +79,10 @@ app.add_middleware(
   allow_headers=CORS_ALLOWED_HEADERS,
 )
 
+# added last, so it's the outermost one and the recorded latency includes the other middlewares
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(router=search.router)
+app.include_router(router=stats.router)
+app.include_router(router=health.router)
+app.include_router(router=metrics.router)
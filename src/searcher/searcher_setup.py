@@ -1,8 +1,15 @@
 import os
 from dotenv import load_dotenv
-from .embeddings import EmbeddingsModelContainer, EmbeddingsModel
+from .embeddings import load_embeddings_model, EmbeddingsExecutor, EmbeddingsCache, EmbeddingsProcessPool, DeferredEmbeddingsModel
 from .repository.elasticsearch_repository import ElasticsearchRepository
-from .service import SearchService
+from .repository.elasticsearch_options import VectorIndexOptions, TransportOptions, ArticleIndexOptions
+from .repository.hot_window_repository import HotWindowRepository
+from .repository.categories_snapshot_repository import CategoriesSnapshotRepository
+from .repository.topics_replica_repository import TopicsReplicaRepository
+from .repository.article_rollup_repository import ArticleRollupRepository
+from .repository.sqlite_repository import SqliteRepository
+from .service import SearchService, ResultSessions, ResultCache, SingleFlight, SearchWarmup
+from .dto.utils import parse_track_total_hits
 from .repository import Repository
 
 
@@ -16,29 +23,308 @@ def check_env(name: str, default=None) -> str:
 
 
 EMBEDDINGS_MODEL_PATH = check_env('EMBEDDINGS_MODEL_PATH')
+# 'torch' (pickled container or container directory), 'onnx' or 'onnx-int8' (exported directory)
+EMBEDDINGS_BACKEND = check_env('EMBEDDINGS_BACKEND', 'torch')
+# inference threads used by the backend, 0 means the backend's default
+EMBEDDINGS_THREADS = int(check_env('EMBEDDINGS_THREADS', 0))
+
+# concurrent 'encode' calls are merged into batches of at most this many docs
+EMBEDDINGS_MAX_BATCH_SIZE = int(check_env('EMBEDDINGS_MAX_BATCH_SIZE', 32))
+# how long a batch waits for more requests to join, before being sent to the model
+EMBEDDINGS_MAX_WAIT_MS = float(check_env('EMBEDDINGS_MAX_WAIT_MS', 2))
+# number of threads running inference
+EMBEDDINGS_WORKERS = int(check_env('EMBEDDINGS_WORKERS', 1))
+
+# run the embeddings model in this many worker processes instead of the server process, 0 disables it
+EMBEDDINGS_PROCESSES = int(check_env('EMBEDDINGS_PROCESSES', 0))
+# inference threads in each worker process
+EMBEDDINGS_PROCESS_THREADS = int(check_env('EMBEDDINGS_PROCESS_THREADS', 1))
+EMBEDDINGS_PROCESS_RESTART_ON_CRASH = bool(check_env('EMBEDDINGS_PROCESS_RESTART_ON_CRASH', 'true') == 'true')
+EMBEDDINGS_PROCESS_TIMEOUT_SECONDS = float(check_env('EMBEDDINGS_PROCESS_TIMEOUT_SECONDS', 60))
+
+# load the embeddings model in the background after startup, semantic and combined searches return 503 until it's loaded
+EMBEDDINGS_LOAD_IN_BACKGROUND = bool(check_env('EMBEDDINGS_LOAD_IN_BACKGROUND', 'false') == 'true')
+# create the missing indices and check their mappings at startup, can be skipped when they're managed elsewhere
+ASSERT_INDICES = bool(check_env('ASSERT_INDICES', 'true') == 'true')
+# '/health/ready' also waits for the embeddings model, otherwise only for the repository
+READINESS_REQUIRES_EMBEDDINGS = bool(check_env('READINESS_REQUIRES_EMBEDDINGS', 'false') == 'true')
+
+# in-process query embeddings cache, 0 disables it
+EMBEDDINGS_CACHE_SIZE = int(check_env('EMBEDDINGS_CACHE_SIZE', 10000))
+EMBEDDINGS_CACHE_TTL_SECONDS = float(check_env('EMBEDDINGS_CACHE_TTL_SECONDS', 3600))
+# optional shared query embeddings cache, e.g. redis://localhost:6379/0
+EMBEDDINGS_CACHE_REDIS_URL = os.environ.get('EMBEDDINGS_CACHE_REDIS_URL', None)
+EMBEDDINGS_CACHE_REDIS_TTL_SECONDS = int(check_env('EMBEDDINGS_CACHE_REDIS_TTL_SECONDS', 86400))
+
+# 'elasticsearch' or 'sqlite'
+REPOSITORY_BACKEND = check_env('REPOSITORY_BACKEND', 'elasticsearch')
+if REPOSITORY_BACKEND not in ('elasticsearch', 'sqlite'):
+  raise ValueError(f"REPOSITORY_BACKEND must be 'elasticsearch' or 'sqlite', got '{REPOSITORY_BACKEND}'")
+
+# database of the 'sqlite' repository, created with 'python -m searcher.repository.sqlite_loader'
+SQLITE_PATH = check_env('SQLITE_PATH', 'searcher.db')
+# threads running the SQLite queries
+SQLITE_THREADS = int(check_env('SQLITE_THREADS', 4))
 
 ELASTIC_USER = check_env('ELASTIC_USER', 'elastic')
-ELASTIC_PASSWORD = check_env('ELASTIC_PASSWORD')
+ELASTIC_PASSWORD = check_env('ELASTIC_PASSWORD') if REPOSITORY_BACKEND == 'elasticsearch' else os.environ.get('ELASTIC_PASSWORD', None)
 ELASTIC_CONN = check_env('ELASTIC_HOST', 'https://localhost:9200')
 ELASTIC_CA_PATH = check_env('ELASTIC_CA_PATH', 'certs/_data/ca/ca.crt')
 ELASTIC_TLS_INSECURE = bool(check_env('ELASTIC_TLS_INSECURE', False))
 
+# transport of the Elasticsearch client, unset options are left to the client's defaults
+ELASTIC_CONNECTIONS_PER_NODE = os.environ.get('ELASTIC_CONNECTIONS_PER_NODE', None)
+# 'aiohttp' or 'httpxasync' (needs elastic-transport 8.13+)
+ELASTIC_NODE_CLASS = os.environ.get('ELASTIC_NODE_CLASS', None)
+ELASTIC_REQUEST_TIMEOUT_SECONDS = os.environ.get('ELASTIC_REQUEST_TIMEOUT_SECONDS', None)
+# only with the 'aiohttp' node class, includes waiting for a free connection of the pool
+ELASTIC_CONNECT_TIMEOUT_SECONDS = os.environ.get('ELASTIC_CONNECT_TIMEOUT_SECONDS', None)
+ELASTIC_MAX_RETRIES = os.environ.get('ELASTIC_MAX_RETRIES', None)
+ELASTIC_RETRY_ON_TIMEOUT = os.environ.get('ELASTIC_RETRY_ON_TIMEOUT', None)
+# space separated status codes, e.g. '429 502 503 504'
+ELASTIC_RETRY_ON_STATUS = os.environ.get('ELASTIC_RETRY_ON_STATUS', None)
+ELASTIC_HTTP_COMPRESS = os.environ.get('ELASTIC_HTTP_COMPRESS', None)
+# discover the cluster's nodes, their publish addresses must be reachable
+ELASTIC_SNIFF = bool(check_env('ELASTIC_SNIFF', 'false') == 'true')
+# also re-discover the nodes before requests, at most this often
+ELASTIC_SNIFF_INTERVAL_SECONDS = os.environ.get('ELASTIC_SNIFF_INTERVAL_SECONDS', None)
+# connections opened at startup, 0 disables it
+ELASTIC_WARMUP_CONNECTIONS = int(check_env('ELASTIC_WARMUP_CONNECTIONS', 4))
+
+# dense_vector mapping of the article embeddings, only applied when the articles index is created
+# unset options are left to Elasticsearch's defaults
+ELASTIC_EMBEDDINGS_DIMS = int(check_env('ELASTIC_EMBEDDINGS_DIMS', 384))
+# 'cosine', 'dot_product' (needs normalized embeddings), 'l2_norm' or 'max_inner_product'
+ELASTIC_EMBEDDINGS_SIMILARITY = os.environ.get('ELASTIC_EMBEDDINGS_SIMILARITY', None)
+# 'hnsw' or 'int8_hnsw'
+ELASTIC_EMBEDDINGS_INDEX_TYPE = os.environ.get('ELASTIC_EMBEDDINGS_INDEX_TYPE', None)
+ELASTIC_EMBEDDINGS_HNSW_M = os.environ.get('ELASTIC_EMBEDDINGS_HNSW_M', None)
+ELASTIC_EMBEDDINGS_HNSW_EF_CONSTRUCTION = os.environ.get('ELASTIC_EMBEDDINGS_HNSW_EF_CONSTRUCTION', None)
+
+# 'client' (2 requests fused in the service), 'linear' or 'rrf' (a single request), see ElasticsearchRepository
+ELASTIC_COMBINED_SEARCH_MODE = check_env('ELASTIC_COMBINED_SEARCH_MODE', 'client')
+# how many hits are counted for the totals of the searches without 'track_total_hits':
+# 'exact', 'off', or count exactly up to this many, above it the total is a lower bound (Elasticsearch's default is 10000)
+ELASTIC_TRACK_TOTAL_HITS = parse_track_total_hits(check_env('ELASTIC_TRACK_TOTAL_HITS', '10000'))
+# 'source' (every paragraph is fetched, and trimmed in the service) or 'script' (only the returned paragraphs are fetched)
+ELASTIC_ARTICLE_PROJECTION = check_env('ELASTIC_ARTICLE_PROJECTION', 'source')
+
+# 'none' (a single 'articles' index) or 'monthly' (an index per month behind the 'articles' alias, see ArticleIndexOptions)
+ELASTIC_ARTICLE_PARTITIONING = check_env('ELASTIC_ARTICLE_PARTITIONING', 'none')
+# settings of the created article indices, Elasticsearch's defaults if not set
+ELASTIC_ARTICLE_SHARDS = os.environ.get('ELASTIC_ARTICLE_SHARDS', None)
+ELASTIC_ARTICLE_REPLICAS = os.environ.get('ELASTIC_ARTICLE_REPLICAS', None)
+ELASTIC_ARTICLE_REFRESH_INTERVAL = os.environ.get('ELASTIC_ARTICLE_REFRESH_INTERVAL', None)
+# the monthly indices created by the writers are searched after they're listed again
+ELASTIC_ARTICLE_PARTITIONS_REFRESH_SECONDS = float(check_env('ELASTIC_ARTICLE_PARTITIONS_REFRESH_SECONDS', 60))
+
+# cursor paging ('use_cursor') keeps a point in time open for this long after the last page request
+ELASTIC_PIT_KEEP_ALIVE_SECONDS = int(check_env('ELASTIC_PIT_KEEP_ALIVE_SECONDS', 120))
+# the least recently used point in times are closed above this, their cursors expire
+ELASTIC_PIT_MAX_OPEN = int(check_env('ELASTIC_PIT_MAX_OPEN', 200))
+
+# semantic searches over the articles of the last this many days are served from an in-process index, 0 disables it
+HOT_WINDOW_DAYS = float(check_env('HOT_WINDOW_DAYS', 0))
+# how often the index is rebuilt from Elasticsearch, new articles are missing from it until then
+HOT_WINDOW_REFRESH_SECONDS = float(check_env('HOT_WINDOW_REFRESH_SECONDS', 60))
+# keep the embeddings as int8 instead of float32, ~4x less memory
+HOT_WINDOW_QUANTIZE = bool(check_env('HOT_WINDOW_QUANTIZE', 'false') == 'true')
+# directory of the memory-mapped embeddings, a temporary directory by default
+HOT_WINDOW_DIR = os.environ.get('HOT_WINDOW_DIR', None)
+
+# category searches are served from an in-memory copy of the categories, reloaded this often, 0 disables it
+CATEGORIES_SNAPSHOT_REFRESH_SECONDS = float(check_env('CATEGORIES_SNAPSHOT_REFRESH_SECONDS', 300))
+
+# topic and topic batch searches are served from an in-process replica of both indices,
+# checked for new documents this often, 0 disables it
+TOPICS_REPLICA_REFRESH_SECONDS = float(check_env('TOPICS_REPLICA_REFRESH_SECONDS', 0))
+# the replica is reloaded entirely this often, to drop the deleted documents
+TOPICS_REPLICA_FULL_RELOAD_SECONDS = float(check_env('TOPICS_REPLICA_FULL_RELOAD_SECONDS', 3600))
+
+# article histograms are served from daily rollups, checked for newly closed days this often, 0 disables them
+ARTICLE_ROLLUP_REFRESH_SECONDS = float(check_env('ARTICLE_ROLLUP_REFRESH_SECONDS', 300))
+# a day is rolled up this long after it ended, the articles indexed later are only counted after a rebuild
+ARTICLE_ROLLUP_CLOSE_DELAY_SECONDS = float(check_env('ARTICLE_ROLLUP_CLOSE_DELAY_SECONDS', 3600))
+ARTICLE_ROLLUP_REBUILD_SECONDS = float(check_env('ARTICLE_ROLLUP_REBUILD_SECONDS', 86400))
+
+# combined searches with 'use_cursor' fuse this many results once, the pages are served from them
+COMBINED_SESSION_DEPTH = int(check_env('COMBINED_SESSION_DEPTH', 100))
+# number of result lists kept in memory, the least recently used ones are dropped first, 0 disables the cursors
+COMBINED_SESSION_MAX = int(check_env('COMBINED_SESSION_MAX', 1000))
+COMBINED_SESSION_TTL_SECONDS = float(check_env('COMBINED_SESSION_TTL_SECONDS', 600))
+
+# search results kept in memory, keyed by the query, 0 disables the cache
+RESULT_CACHE_SIZE = int(check_env('RESULT_CACHE_SIZE', 10000))
+RESULT_CACHE_TTL_SECONDS = float(check_env('RESULT_CACHE_TTL_SECONDS', 60))
+# how often the indices are checked for changes, the entries of the changed ones are dropped
+RESULT_CACHE_POLL_SECONDS = float(check_env('RESULT_CACHE_POLL_SECONDS', 5))
+# identical concurrent searches are run once, and share the result
+SINGLE_FLIGHT = bool(check_env('SINGLE_FLIGHT', 'true') == 'true')
+# an unset 'date_max' is now, rounded up to this many seconds,
+# so the queries up to "now" are the same and can be cached and coalesced, 0 disables the rounding
+SEARCH_DATE_GRANULARITY_SECONDS = float(check_env('SEARCH_DATE_GRANULARITY_SECONDS', 60))
+
+# JSON lines file of the most frequent recent queries, replayed at startup before '/health/ready' reports ready,
+# see SearchWarmup, unset disables the warm-up
+WARMUP_QUERIES_PATH = os.environ.get('WARMUP_QUERIES_PATH', None)
+# queries replayed at the same time
+WARMUP_CONCURRENCY = int(check_env('WARMUP_CONCURRENCY', 4))
+# only the first this many queries of the file are replayed, 0 replays all of them
+WARMUP_MAX_QUERIES = int(check_env('WARMUP_MAX_QUERIES', 0))
+# the service is ready after this long even if the warm-up isn't done
+WARMUP_TIMEOUT_SECONDS = float(check_env('WARMUP_TIMEOUT_SECONDS', 120))
+
 CORS_ALLOWED_ORIGINS = check_env('CORS_ALLOWED_ORIGINS', 'http://localhost').split(' ')
 CORS_ALLOWED_METHODS = check_env('CORS_ALLOWED_METHODS', '*').split(' ')
 CORS_ALLOWED_HEADERS = check_env('CORS_ALLOWED_HEADERS', '*').split(' ')
 CORS_ALLOW_CREDENTIALS = bool(check_env('CORS_ALLOW_CREDENTIALS', 'true') == 'true')
 
-embeddings_model = EmbeddingsModel(EmbeddingsModelContainer.load(EMBEDDINGS_MODEL_PATH))
+def create_embeddings_model():
+  if EMBEDDINGS_PROCESSES > 0:
+    pool = EmbeddingsProcessPool(
+      EMBEDDINGS_MODEL_PATH,
+      backend=EMBEDDINGS_BACKEND,
+      processes=EMBEDDINGS_PROCESSES,
+      threads=EMBEDDINGS_PROCESS_THREADS,
+      capacity=EMBEDDINGS_MAX_BATCH_SIZE,
+      restart_on_crash=EMBEDDINGS_PROCESS_RESTART_ON_CRASH,
+      request_timeout=EMBEDDINGS_PROCESS_TIMEOUT_SECONDS,
+    )
+    pool.start()
+    return pool
+  return load_embeddings_model(
+    EMBEDDINGS_MODEL_PATH,
+    backend=EMBEDDINGS_BACKEND,
+    threads=EMBEDDINGS_THREADS,
+  )
 
-repository: Repository = ElasticsearchRepository(
-  ELASTIC_CONN, 
-  ELASTIC_USER, 
-  ELASTIC_PASSWORD, 
-  ELASTIC_CA_PATH, 
-  not ELASTIC_TLS_INSECURE
+if EMBEDDINGS_LOAD_IN_BACKGROUND:
+  # started in the app's lifespan
+  embeddings_model = DeferredEmbeddingsModel(create_embeddings_model)
+else:
+  embeddings_model = create_embeddings_model()
+
+embeddings_executor = EmbeddingsExecutor(
+  embeddings_model,
+  max_batch_size=EMBEDDINGS_MAX_BATCH_SIZE,
+  max_wait_ms=EMBEDDINGS_MAX_WAIT_MS,
+  # one thread per process keeps every worker process busy
+  workers=EMBEDDINGS_PROCESSES if EMBEDDINGS_PROCESSES > 0 else EMBEDDINGS_WORKERS,
 )
 
+embeddings_cache = None
+if EMBEDDINGS_CACHE_SIZE > 0 or EMBEDDINGS_CACHE_REDIS_URL is not None:
+  embeddings_cache = EmbeddingsCache(
+    # the name of a model loaded in the background is only known later
+    (lambda: embeddings_model.name) if EMBEDDINGS_LOAD_IN_BACKGROUND else embeddings_model.name,
+    max_entries=EMBEDDINGS_CACHE_SIZE,
+    ttl_seconds=EMBEDDINGS_CACHE_TTL_SECONDS,
+    redis_url=EMBEDDINGS_CACHE_REDIS_URL,
+    redis_ttl_seconds=EMBEDDINGS_CACHE_REDIS_TTL_SECONDS,
+  )
+
+if REPOSITORY_BACKEND == 'sqlite':
+  repository: Repository = SqliteRepository(SQLITE_PATH, threads=SQLITE_THREADS)
+else:
+  repository: Repository = ElasticsearchRepository(
+    ELASTIC_CONN, 
+    ELASTIC_USER, 
+    ELASTIC_PASSWORD, 
+    ELASTIC_CA_PATH, 
+    not ELASTIC_TLS_INSECURE,
+    vector_index_options=VectorIndexOptions(
+      dims=ELASTIC_EMBEDDINGS_DIMS,
+      similarity=ELASTIC_EMBEDDINGS_SIMILARITY,
+      index_type=ELASTIC_EMBEDDINGS_INDEX_TYPE,
+      m=ELASTIC_EMBEDDINGS_HNSW_M,
+      ef_construction=ELASTIC_EMBEDDINGS_HNSW_EF_CONSTRUCTION,
+    ),
+    combined_search_mode=ELASTIC_COMBINED_SEARCH_MODE,
+    pit_keep_alive_seconds=ELASTIC_PIT_KEEP_ALIVE_SECONDS,
+    pit_max_open=ELASTIC_PIT_MAX_OPEN,
+    track_total_hits=ELASTIC_TRACK_TOTAL_HITS,
+    article_projection=ELASTIC_ARTICLE_PROJECTION,
+    transport_options=TransportOptions(
+      connections_per_node=ELASTIC_CONNECTIONS_PER_NODE,
+      node_class=ELASTIC_NODE_CLASS,
+      request_timeout=ELASTIC_REQUEST_TIMEOUT_SECONDS,
+      connect_timeout=ELASTIC_CONNECT_TIMEOUT_SECONDS,
+      max_retries=ELASTIC_MAX_RETRIES,
+      retry_on_timeout=ELASTIC_RETRY_ON_TIMEOUT,
+      retry_on_status=ELASTIC_RETRY_ON_STATUS.split(' ') if ELASTIC_RETRY_ON_STATUS is not None else None,
+      http_compress=ELASTIC_HTTP_COMPRESS,
+      sniff=ELASTIC_SNIFF,
+      sniff_interval=ELASTIC_SNIFF_INTERVAL_SECONDS,
+      warmup_connections=ELASTIC_WARMUP_CONNECTIONS,
+    ),
+    article_index_options=ArticleIndexOptions(
+      partitioning=ELASTIC_ARTICLE_PARTITIONING,
+      shards=ELASTIC_ARTICLE_SHARDS,
+      replicas=ELASTIC_ARTICLE_REPLICAS,
+      refresh_interval=ELASTIC_ARTICLE_REFRESH_INTERVAL,
+      partitions_refresh_seconds=ELASTIC_ARTICLE_PARTITIONS_REFRESH_SECONDS,
+    ),
+  )
+
+  if HOT_WINDOW_DAYS > 0:
+    repository = HotWindowRepository(
+      repository,
+      window_days=HOT_WINDOW_DAYS,
+      refresh_seconds=HOT_WINDOW_REFRESH_SECONDS,
+      quantize=HOT_WINDOW_QUANTIZE,
+      directory=HOT_WINDOW_DIR,
+    )
+
+  if CATEGORIES_SNAPSHOT_REFRESH_SECONDS > 0:
+    repository = CategoriesSnapshotRepository(
+      repository,
+      refresh_seconds=CATEGORIES_SNAPSHOT_REFRESH_SECONDS,
+    )
+
+  if TOPICS_REPLICA_REFRESH_SECONDS > 0:
+    repository = TopicsReplicaRepository(
+      repository,
+      refresh_seconds=TOPICS_REPLICA_REFRESH_SECONDS,
+      full_reload_seconds=TOPICS_REPLICA_FULL_RELOAD_SECONDS,
+    )
+
+  if ARTICLE_ROLLUP_REFRESH_SECONDS > 0:
+    repository = ArticleRollupRepository(
+      repository,
+      refresh_seconds=ARTICLE_ROLLUP_REFRESH_SECONDS,
+      close_delay_seconds=ARTICLE_ROLLUP_CLOSE_DELAY_SECONDS,
+      rebuild_seconds=ARTICLE_ROLLUP_REBUILD_SECONDS,
+    )
+
+result_cache = None
+if RESULT_CACHE_SIZE > 0:
+  result_cache = ResultCache(
+    repository.index_generations,
+    max_entries=RESULT_CACHE_SIZE,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    poll_seconds=RESULT_CACHE_POLL_SECONDS,
+  )
+
 search_service = SearchService(
   repo=repository,
-  em=embeddings_model,
-)
\ No newline at end of file
+  em=embeddings_executor,
+  embeddings_cache=embeddings_cache,
+  result_sessions=ResultSessions(
+    max_sessions=COMBINED_SESSION_MAX,
+    ttl_seconds=COMBINED_SESSION_TTL_SECONDS,
+  ) if COMBINED_SESSION_MAX > 0 else None,
+  combined_session_depth=COMBINED_SESSION_DEPTH,
+  result_cache=result_cache,
+  single_flight=SingleFlight() if SINGLE_FLIGHT else None,
+  date_granularity_seconds=SEARCH_DATE_GRANULARITY_SECONDS,
+)
+
+search_warmup = None
+if WARMUP_QUERIES_PATH is not None:
+  search_warmup = SearchWarmup(
+    search_service,
+    WARMUP_QUERIES_PATH,
+    concurrency=WARMUP_CONCURRENCY,
+    max_queries=WARMUP_MAX_QUERIES if WARMUP_MAX_QUERIES > 0 else None,
+    timeout_seconds=WARMUP_TIMEOUT_SECONDS,
+  )
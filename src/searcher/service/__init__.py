@@ -1 +1,5 @@
-from .search import SearchService
\ No newline at end of file
+from .search import SearchService
+from .result_sessions import ResultSessions
+from .result_cache import ResultCache
+from .single_flight import SingleFlight
+from .warmup import SearchWarmup, WARMUP_KINDS
@@ -0,0 +1,25 @@
+from datetime import datetime
+import pydantic
+import math
+import json
+
+
+def fill_date_max(query: pydantic.BaseModel, granularity_seconds: float) -> pydantic.BaseModel:
+  # an unset 'date_max' is now, rounded up, otherwise no 2 queries up to now would be the same
+  # a 'date_max' set by the client is kept exact
+  if "date_max" not in type(query).model_fields or query.date_max is not None:
+    return query
+  now = datetime.now()
+  if granularity_seconds > 0:
+    now = datetime.fromtimestamp(math.ceil(now.timestamp() / granularity_seconds) * granularity_seconds)
+  return query.model_copy(update={"date_max": now})
+
+
+def query_key(kind: str, query: pydantic.BaseModel) -> str:
+  # the canonical form of a query, the order of the listed ids and attributes doesn't change the results,
+  # and an empty list filters nothing, like None (the API sends empty lists, the batch and warm-up queries None)
+  canonical = {
+    k: (sorted(v) if len(v) > 0 else None) if isinstance(v, list) else v
+    for k, v in query.model_dump(mode="json").items()
+  }
+  return kind + ":" + json.dumps(canonical, sort_keys=True, separators=(",", ":"))
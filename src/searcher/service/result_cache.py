@@ -0,0 +1,145 @@
+from ..utils import log_utils
+from collections import OrderedDict
+from typing import Awaitable, Callable
+import pydantic
+import asyncio
+import logging
+import time
+
+
+class ResultCache:
+  """
+  Caches search results, keyed by the canonical form of the queries (see 'query_key'), and the index they search.
+  Entries expire 'ttl_seconds' after they were stored, the least recently used ones are evicted when full.
+  The generations of the indices are polled every 'poll_seconds', the entries of an index are dropped when it changes.
+  """
+
+  def __init__(
+      self,
+      generations: Callable[[], Awaitable[dict]],
+      max_entries: int = 10000,
+      ttl_seconds: float = 60,
+      poll_seconds: float = 5,
+      log_level: int = logging.INFO
+  ):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    self.generations = generations
+    self.max_entries = max(1, max_entries)
+    self.ttl = ttl_seconds
+    self.poll_seconds = poll_seconds
+
+    # key -> (expiry time, index, approximate size in bytes, result)
+    self.entries: OrderedDict[str, tuple[float, str, int, object]] = OrderedDict()
+    self.bytes = 0
+
+    # index -> last polled generation, and the number of times its entries were dropped
+    self.index_generations: dict[str, object] = {}
+    self.epochs: dict[str, int] = {}
+    # indices which changed at the last poll, see '__poll'
+    self.settling: set[str] = set()
+    self.poller: asyncio.Task | None = None
+
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+    self.invalidations = 0
+    self.poll_errors = 0
+
+  async def start(self):
+    if self.poller is None:
+      await self.__poll_once()
+      self.poller = asyncio.create_task(self.__poll())
+
+  async def close(self):
+    if self.poller is not None:
+      self.poller.cancel()
+      self.poller = None
+
+  def epoch(self, index: str) -> int:
+    return self.epochs.get(index, 0)
+
+  def get(self, key: str):
+    entry = self.entries.get(key, None)
+    if entry is None:
+      self.misses += 1
+      return None
+
+    expiry, _, _, result = entry
+    if expiry < time.monotonic():
+      self.__remove(key)
+      self.expirations += 1
+      self.misses += 1
+      return None
+
+    self.entries.move_to_end(key)
+    self.hits += 1
+    return result
+
+  def put(self, key: str, index: str, epoch: int, result: pydantic.BaseModel):
+    # the result was searched before the entries of the index were dropped, it may be outdated
+    if epoch != self.epoch(index):
+      return
+
+    if key in self.entries:
+      self.__remove(key)
+    size = len(result.model_dump_json())
+    self.entries[key] = (time.monotonic() + self.ttl, index, size, result)
+    self.bytes += size
+
+    while len(self.entries) > self.max_entries:
+      self.__remove(next(iter(self.entries)))
+      self.evictions += 1
+
+  def invalidate(self, index: str):
+    self.epochs[index] = self.epoch(index) + 1
+    for key in [k for k, entry in self.entries.items() if entry[1] == index]:
+      self.__remove(key)
+    self.invalidations += 1
+
+  def __remove(self, key: str):
+    _, _, size, _ = self.entries.pop(key)
+    self.bytes -= size
+
+  async def __poll(self):
+    while True:
+      await asyncio.sleep(self.poll_seconds)
+      await self.__poll_once()
+
+  async def __poll_once(self):
+    try:
+      generations = await self.generations()
+    except Exception as e:
+      # the entries still expire
+      self.poll_errors += 1
+      self.log.warning(f"failed to get the generations of the indices: {e}")
+      return
+
+    # a change can be polled before it's visible to searches (before the index is refreshed),
+    # so the entries searched in between are dropped at the next poll too
+    changed = set()
+    for index, generation in generations.items():
+      if index in self.index_generations and self.index_generations[index] != generation:
+        changed.add(index)
+      self.index_generations[index] = generation
+
+    for index in changed | self.settling:
+      self.invalidate(index)
+    self.settling = changed
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "entries": len(self.entries),
+      "bytes": self.bytes,
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_rate": self.hits / lookups if lookups > 0 else None,
+      "evictions": self.evictions,
+      "expirations": self.expirations,
+      "invalidations": self.invalidations,
+      "poll_errors": self.poll_errors,
+    }
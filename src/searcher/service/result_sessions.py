@@ -0,0 +1,70 @@
+from collections import OrderedDict
+import secrets
+import time
+
+
+def session_cursor(session_id: str, start: int) -> str:
+  # the position is in the cursor, every page gets a new one
+  return f"{session_id}.{start}"
+
+
+def parse_session_cursor(cursor: str) -> tuple[str, int] | None:
+  session_id, _, start = cursor.rpartition(".")
+  if session_id == "" or not start.isdigit():
+    return None
+  return session_id, int(start)
+
+
+class ResultSessions:
+  """
+  Bounded store of search results, keyed by opaque random session ids.
+  The cursors of the pages are the session id, and the position of the page in the results.
+  Sessions expire 'ttl_seconds' after they were created, the least recently used ones are evicted when full.
+  """
+
+  def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 600):
+    self.max_sessions = max(1, max_sessions)
+    self.ttl = ttl_seconds
+
+    # session id -> (expiry time, results)
+    self.sessions: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    self.created = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def put(self, results) -> str:
+    session_id = secrets.token_urlsafe(16)
+    self.sessions[session_id] = (time.monotonic() + self.ttl, results)
+    self.created += 1
+
+    while len(self.sessions) > self.max_sessions:
+      self.sessions.popitem(last=False)
+      self.evictions += 1
+    return session_id
+
+  def get(self, session_id: str):
+    entry = self.sessions.get(session_id, None)
+    if entry is None:
+      self.misses += 1
+      return None
+
+    expiry, results = entry
+    if expiry < time.monotonic():
+      del self.sessions[session_id]
+      self.misses += 1
+      return None
+
+    self.sessions.move_to_end(session_id)
+    self.hits += 1
+    return results
+
+  def stats(self) -> dict:
+    return {
+      "sessions": len(self.sessions),
+      "created": self.created,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+    }
@@ -6,111 +6,414 @@ from ..dto.topic_query import *
 from ..dto.topic_result import *
 from ..dto.category_query import *
 from ..dto.category_result import *
+from ..dto.count_result import *
+from ..dto.article_facet_query import *
+from ..dto.article_facet_result import *
+from ..dto.article_histogram_query import *
+from ..dto.article_histogram_result import *
+from ..dto.batch_query import *
+from ..dto.batch_result import *
 from ..domain.article import *
 from ..domain.category import *
 from ..domain.topic import *
+from ..domain.facet import *
+from ..domain.histogram import *
 from ..repository import Repository
-from ..embeddings import EmbeddingsModel
+from ..embeddings import EmbeddingsExecutor, EmbeddingsCache, EmbeddingsNotReadyException
+from ..dto.exceptions import QueryValidationException
+from .result_sessions import ResultSessions, session_cursor, parse_session_cursor
+from .result_cache import ResultCache
+from .single_flight import SingleFlight
+from .query_keys import fill_date_max, query_key
 from ..utils import log_utils
+from ..utils.metrics import MAPPING_SECONDS
+from typing import Awaitable, Callable
 import logging
+import asyncio
 
 
 class SearchService:
 
-  def __init__(self, repo: Repository, em: EmbeddingsModel, log_level: int = logging.INFO):
+  def __init__(
+      self, 
+      repo: Repository, 
+      em: EmbeddingsExecutor, 
+      embeddings_cache: EmbeddingsCache | None = None,
+      result_sessions: ResultSessions | None = None,
+      combined_session_depth: int = 100,
+      result_cache: ResultCache | None = None,
+      single_flight: SingleFlight | None = None,
+      date_granularity_seconds: float = 60,
+      log_level: int = logging.INFO
+  ):
     self.log = log_utils.create_console_logger(
       name=self.__class__.__name__,
       level=log_level
     )
     self.repo = repo
     self.em = em
+    self.embeddings_cache = embeddings_cache
+    self.result_sessions = result_sessions
+    self.combined_session_depth = combined_session_depth
+    self.result_cache = result_cache
+    self.single_flight = single_flight
+    # an unset 'date_max' is now, rounded up to this, so the searches up to now can be cached and coalesced
+    self.date_granularity_seconds = date_granularity_seconds
+
+  def stats(self) -> dict:
+    stats = {
+      "embeddings": self.em.stats(),
+    }
+    if self.embeddings_cache is not None:
+      stats["embeddings_cache"] = self.embeddings_cache.stats()
+    if self.result_sessions is not None:
+      stats["result_sessions"] = self.result_sessions.stats()
+    if self.result_cache is not None:
+      stats["result_cache"] = self.result_cache.stats()
+    if self.single_flight is not None:
+      stats["single_flight"] = self.single_flight.stats()
+    repo_stats = self.repo.stats()
+    if len(repo_stats) > 0:
+      stats["repository"] = repo_stats
+    return stats
+
+  async def readiness(self) -> dict[str, bool]:
+    # text searches only need the repository, semantic and combined ones the embeddings model too
+    return {
+      "repository": await self.repo.ping(),
+      "embeddings": self.em.ready,
+    }
+
+  async def __encode(self, queries: list[str]) -> list:
+    # before the cache, its keys need the name of the model
+    if not self.em.ready:
+      raise EmbeddingsNotReadyException("the embeddings model is still loading")
+
+    # only encode the queries whose embeddings aren't cached
+    if self.embeddings_cache is None:
+      return list(await self.em.encode(queries))
+
+    embeddings = await self.embeddings_cache.get_many(queries)
+    missing = [i for i, e in enumerate(embeddings) if e is None]
+    if len(missing) == 0:
+      return embeddings
+
+    missing_queries = [queries[i] for i in missing]
+    encoded = await self.em.encode(missing_queries)
+    await self.embeddings_cache.set_many(missing_queries, encoded)
+    for i, e in zip(missing, encoded):
+      embeddings[i] = e
+    return embeddings
+
+  async def __shared(self, index: str, kind: str, query, search: Callable[[object], Awaitable]):
+    query = fill_date_max(query, self.date_granularity_seconds)
+
+    # identical searches share a cached result, or a search in flight
+    # the cursor pages continue a search, they aren't shared
+    if getattr(query, "use_cursor", False) or getattr(query, "cursor", None) is not None:
+      return await search(query)
+    if self.result_cache is None and self.single_flight is None:
+      return await search(query)
+
+    key = query_key(kind, query)
+    if self.result_cache is not None:
+      result = self.result_cache.get(key)
+      if result is not None:
+        return result
+      epoch = self.result_cache.epoch(index)
+
+    async def search_and_cache():
+      result = await search(query)
+      if self.result_cache is not None:
+        self.result_cache.put(key, index, epoch, result)
+      return result
+
+    if self.single_flight is None:
+      return await search_and_cache()
+    return await self.single_flight.run(key, search_and_cache)
 
   async def search_articles(self, article_query: ArticleQuery) -> ArticleResults:
     self.log.info(f"searching for articles: {article_query}")
+    return await self.__shared("articles", "articles", article_query, self.__search_articles)
 
+  async def __search_articles(self, article_query: ArticleQuery) -> ArticleResults:
     search = article_query.search_type
 
     if search == ArticleQueryType.text:
       article_list = await self.repo.search_articles_text(article_query)
     elif search == ArticleQueryType.semantic:
-      embeddings = self.em.encode([article_query.query])[0]
+      embeddings = (await self.__encode([article_query.query]))[0]
       article_list = await self.repo.search_articles_embeddings(article_query, embeddings)
     elif search == ArticleQueryType.combined:
-      embeddings = self.em.encode([article_query.query])[0]
+      if article_query.use_cursor or article_query.cursor is not None:
+        return await self.__search_articles_combined_session(article_query)
+      embeddings = (await self.__encode([article_query.query]))[0]
       article_list = await self.repo.search_articles_combined(article_query, embeddings)
     
     results = self.__map_to_article_results(article_list) 
     return results
+
+  async def __search_articles_combined_session(self, article_query: ArticleQuery, embeddings: list | None = None) -> ArticleResults:
+    # the fused results are only consistent across pages if they are fused once,
+    # so a deeper list is kept on the server, and the pages are slices of it
+    if self.result_sessions is None:
+      raise QueryValidationException(f"'cursor' and 'use_cursor' aren't supported, result sessions are disabled.")
+
+    if article_query.cursor is not None:
+      # the page continues where the cursor's page ended, 'page' is ignored
+      parsed = parse_session_cursor(article_query.cursor)
+      article_list = self.result_sessions.get(parsed[0]) if parsed is not None else None
+      if article_list is None:
+        raise QueryValidationException(f"'cursor' is unknown or expired, repeat the search without it.")
+      session_id, start = parsed
+    else:
+      if embeddings is None:
+        embeddings = (await self.__encode([article_query.query]))[0]
+      deep_query = article_query.model_copy(update={
+        "use_cursor": False,
+        "cursor": None,
+        "page": 0,
+        "page_size": max(self.combined_session_depth, article_query.page_size),
+      })
+      article_list = await self.repo.search_articles_combined(deep_query, embeddings, deep_query.page_size)
+      session_id = self.result_sessions.put(article_list)
+      start = 0
+
+    end = start + article_query.page_size
+    results = self.__map_to_article_results(ArticleList(
+      total_count=article_list.total_count,
+      total_relation=article_list.total_relation,
+      articles=article_list.articles[start:end],
+    ))
+    if end < len(article_list.articles):
+      results.next_cursor = session_cursor(session_id, end)
+    return results
     
   def __map_to_article_results(self, article_list: ArticleList) -> ArticleResults:
-    return ArticleResults(
-      total=article_list.total_count,
-      results=[ArticleResult(
-        id=art.id,
-        categories=[art.model_dump() for art in art.categories] if art.categories is not None else None, 
-        topics=[t.model_dump() for t in art.topics] if art.topics is not None else None, 
-        url=art.url,
-        publish_date=art.publish_date,
-        source=art.source,
-        image=art.image,
-        author=art.author,
-        title=art.title,
-        paragraphs=art.paragraphs,
-      ) for art in article_list.articles],
-    )
+    with MAPPING_SECONDS.time():
+      return ArticleResults(
+        total=article_list.total_count,
+        total_relation=article_list.total_relation,
+        next_cursor=article_list.next_cursor,
+        results=[ArticleResult(
+          id=art.id,
+          categories=[art.model_dump() for art in art.categories] if art.categories is not None else None, 
+          topics=[t.model_dump() for t in art.topics] if art.topics is not None else None, 
+          url=art.url,
+          publish_date=art.publish_date,
+          source=art.source,
+          image=art.image,
+          author=art.author,
+          title=art.title,
+          paragraphs=art.paragraphs,
+        ) for art in article_list.articles],
+      )
+
+  async def search_batch(self, batch_query: BatchQuery) -> BatchResults:
+    self.log.info(f"searching a batch of {len(batch_query.searches)} searches")
+    batch_query = batch_query.model_copy(update={"searches": [
+      s.model_copy(update={"query": fill_date_max(s.query, self.date_granularity_seconds)}) for s in batch_query.searches
+    ]})
+
+    # the embeddings of every query in a single call
+    queries = list(dict.fromkeys(
+      s.query.query for s in batch_query.searches 
+      if isinstance(s, ArticleSearch) and self.__needs_embeddings(s.query)
+    ))
+    embeddings = {}
+    encode_error = None
+    if len(queries) > 0:
+      try:
+        embeddings = dict(zip(queries, await self.__encode(queries)))
+      except Exception as e:
+        # only the searches which need the embeddings fail, e.g. while the model is loading
+        encode_error = e
+
+    # the paged combined searches are served from the result sessions, the rest in a single batch by the repository
+    repo_searches = []
+    session_searches = []
+    failed_searches = []
+    for i, s in enumerate(batch_query.searches):
+      if encode_error is not None and isinstance(s, ArticleSearch) and self.__needs_embeddings(s.query):
+        failed_searches.append(i)
+      elif isinstance(s, ArticleSearch) and s.query.search_type == ArticleQueryType.combined and (
+        s.query.use_cursor or s.query.cursor is not None
+      ):
+        session_searches.append(i)
+      else:
+        repo_searches.append(i)
+
+    async def search_sessions() -> list:
+      return await asyncio.gather(*[
+        self.__search_articles_combined_session(
+          batch_query.searches[i].query, 
+          embeddings.get(batch_query.searches[i].query.query, None)
+        ) for i in session_searches
+      ], return_exceptions=True)
+
+    async def search_repo() -> list:
+      if len(repo_searches) == 0:
+        return []
+      return await self.repo.search_batch([(
+        batch_query.searches[i].query,
+        embeddings.get(batch_query.searches[i].query.query, None) if isinstance(batch_query.searches[i], ArticleSearch) else None,
+      ) for i in repo_searches])
+
+    session_results, repo_results = await asyncio.gather(search_sessions(), search_repo())
+
+    results = [None] * len(batch_query.searches)
+    for i in failed_searches:
+      results[i] = self.__map_to_batch_result(batch_query.searches[i], encode_error)
+    for i, result in zip(session_searches, session_results):
+      results[i] = self.__map_to_batch_result(batch_query.searches[i], result)
+    for i, result in zip(repo_searches, repo_results):
+      results[i] = self.__map_to_batch_result(batch_query.searches[i], result)
+    return BatchResults(results=results)
+
+  def __needs_embeddings(self, article_query: ArticleQuery) -> bool:
+    if article_query.search_type == ArticleQueryType.semantic:
+      return True
+    # the pages of the result sessions are already fused
+    return article_query.search_type == ArticleQueryType.combined and article_query.cursor is None
+
+  def __map_to_batch_result(self, search, result):
+    result_type = {
+      "articles": ArticleSearchResult,
+      "topics": TopicSearchResult,
+      "topic-batches": TopicBatchSearchResult,
+      "categories": CategorySearchResult,
+    }[search.type]
+
+    if isinstance(result, (QueryValidationException, EmbeddingsNotReadyException)):
+      return result_type(error=result.message)
+    if isinstance(result, BaseException):
+      # the details of unexpected errors are only logged, like for the other endpoints
+      self.log.error(f"{search.type} search of batch failed: {result!r}")
+      return result_type(error="search failed")
+
+    if isinstance(result, ArticleList):
+      result = self.__map_to_article_results(result)
+    elif isinstance(result, TopicList):
+      result = self.__map_to_topic_results(result)
+    elif isinstance(result, TopicBatchList):
+      result = self.__map_to_topic_batch_results(result)
+    elif isinstance(result, CategoryList):
+      result = self.__map_to_category_results(result)
+    return result_type(result=result)
+
+  async def count_articles(self, article_query: ArticleQuery) -> CountResult:
+    self.log.info(f"counting articles: {article_query}")
+    return await self.__shared("articles", "articles-count", article_query, self.__count_articles)
+
+  async def __count_articles(self, article_query: ArticleQuery) -> CountResult:
+    return CountResult(count=await self.repo.count_articles(article_query))
+
+  async def facet_articles(self, facet_query: ArticleFacetQuery) -> ArticleFacetResults:
+    self.log.info(f"counting article facets: {facet_query}")
+    return await self.__shared("articles", "articles-facets", facet_query, self.__facet_articles)
+
+  async def __facet_articles(self, facet_query: ArticleFacetQuery) -> ArticleFacetResults:
+    article_facets = await self.repo.facet_articles(facet_query)
+    with MAPPING_SECONDS.time():
+      return ArticleFacetResults(
+        total=article_facets.total_count,
+        facets={
+          facet: [FacetValueResult(value=v.value, count=v.count) for v in values]
+          for facet, values in article_facets.facets.items()
+        },
+      )
+
+  async def histogram_articles(self, histogram_query: ArticleHistogramQuery) -> ArticleHistogramResults:
+    self.log.info(f"counting articles by date: {histogram_query}")
+    return await self.__shared("articles", "articles-histogram", histogram_query, self.__histogram_articles)
+
+  async def __histogram_articles(self, histogram_query: ArticleHistogramQuery) -> ArticleHistogramResults:
+    histogram = await self.repo.histogram_articles(histogram_query)
+    with MAPPING_SECONDS.time():
+      return ArticleHistogramResults(
+        interval=histogram_query.interval.value,
+        buckets=[HistogramBucketResult(date=b.start, count=b.count) for b in histogram.buckets],
+      )
+
+  async def count_topics(self, topic_query: TopicQuery) -> CountResult:
+    self.log.info(f"counting topics: {topic_query}")
+    return await self.__shared("topics", "topics-count", topic_query, self.__count_topics)
+
+  async def __count_topics(self, topic_query: TopicQuery) -> CountResult:
+    return CountResult(count=await self.repo.count_topics(topic_query))
+
+  async def count_topic_batches(self, topic_batch_query: TopicBatchQuery) -> CountResult:
+    self.log.info(f"counting topic batches: {topic_batch_query}")
+    return await self.__shared("topic_batches", "topic-batches-count", topic_batch_query, self.__count_topic_batches)
+
+  async def __count_topic_batches(self, topic_batch_query: TopicBatchQuery) -> CountResult:
+    return CountResult(count=await self.repo.count_topic_batches(topic_batch_query))
 
   async def search_topic_batches(self, topic_batch_query: TopicBatchQuery) -> TopicBatchResults:
     self.log.info(f"searching for topic batches: {topic_batch_query}")
+    return await self.__shared("topic_batches", "topic-batches", topic_batch_query, self.__search_topic_batches)
 
+  async def __search_topic_batches(self, topic_batch_query: TopicBatchQuery) -> TopicBatchResults:
     topic_batch_list = await self.repo.get_topic_batches(topic_batch_query)
     results = self.__map_to_topic_batch_results(topic_batch_list)
     return results
     
   def __map_to_topic_batch_results(self, topic_batch_list: TopicBatchList) -> TopicBatchResults:
-    return TopicBatchResults(
-      total=topic_batch_list.total_count,
-      results=[TopicBatchResult(
-        id=tb.id,
-        query=tb.query.model_dump() if tb.query is not None else None,
-        article_count=tb.article_count,
-        topic_count=tb.topic_count,
-      ) for tb in topic_batch_list.batches]
-    )
+    with MAPPING_SECONDS.time():
+      return TopicBatchResults(
+        total=topic_batch_list.total_count,
+        total_relation=topic_batch_list.total_relation,
+        next_cursor=topic_batch_list.next_cursor,
+        results=[TopicBatchResult(
+          id=tb.id,
+          query=tb.query.model_dump() if tb.query is not None else None,
+          article_count=tb.article_count,
+          topic_count=tb.topic_count,
+        ) for tb in topic_batch_list.batches]
+      )
 
   async def search_topics(self, topic_query: TopicQuery) -> TopicResults:
     self.log.info(f"searching for topics: {topic_query}")
+    return await self.__shared("topics", "topics", topic_query, self.__search_topics)
 
+  async def __search_topics(self, topic_query: TopicQuery) -> TopicResults:
     topic_list = await self.repo.search_topics(topic_query)
     results = self.__map_to_topic_results(topic_list)
     return results
     
   def __map_to_topic_results(self, topic_list: TopicList) -> TopicResults:
-    return TopicResults(
-      total=topic_list.total_count,
-      results=[TopicResult(
-        id=t.id,
-        batch_id=t.batch_id,
-        batch_query=t.batch_query.model_dump() if t.batch_query is not None else None,
-        topic=t.topic,
-        count=t.count,
-        representative_articles=[
-            ta.model_dump() for ta in t.representative_articles
-        ] if t.representative_articles is not None else None,
-      ) for t in topic_list.topics]
-    )
+    with MAPPING_SECONDS.time():
+      return TopicResults(
+        total=topic_list.total_count,
+        total_relation=topic_list.total_relation,
+        next_cursor=topic_list.next_cursor,
+        results=[TopicResult(
+          id=t.id,
+          batch_id=t.batch_id,
+          batch_query=t.batch_query.model_dump() if t.batch_query is not None else None,
+          topic=t.topic,
+          count=t.count,
+          representative_articles=[
+              ta.model_dump() for ta in t.representative_articles
+          ] if t.representative_articles is not None else None,
+        ) for t in topic_list.topics]
+      )
 
   async def search_categories(self, category_query: CategoryQuery) -> CategoryResults:
     self.log.info(f"searching for categories: {category_query}")
+    return await self.__shared("categories", "categories", category_query, self.__search_categories)
 
+  async def __search_categories(self, category_query: CategoryQuery) -> CategoryResults:
     category_list = await self.repo.search_categories(category_query)  
     results = self.__map_to_category_results(category_list)
     return results
 
   def __map_to_category_results(self, category_list: CategoryList) -> CategoryResults:
-    return CategoryResults(
-      total=category_list.total_count,
-      results=[CategoryResult(
-        id=cat.id,
-        name=cat.name,
-      ) for cat in category_list.categories]
-    )
\ No newline at end of file
+    with MAPPING_SECONDS.time():
+      return CategoryResults(
+        total=category_list.total_count,
+        results=[CategoryResult(
+          id=cat.id,
+          name=cat.name,
+        ) for cat in category_list.categories]
+      )
\ No newline at end of file
@@ -0,0 +1,70 @@
+from typing import Awaitable, Callable
+import asyncio
+
+
+class SingleFlight:
+  """
+  Runs identical concurrent searches once, every caller with the same key waits for the same result (or error).
+  A caller leaving (cancelled, e.g. its client disconnected) doesn't stop the search for the others,
+  the search is only cancelled when every caller left.
+  """
+
+  def __init__(self):
+    # key -> (the shared search, number of waiting callers)
+    self.flights: dict[str, tuple[asyncio.Task, int]] = {}
+
+    self.executed = 0
+    self.coalesced = 0
+    self.cancelled = 0
+    self.max_waiters = 0
+
+  async def run(self, key: str, search: Callable[[], Awaitable]):
+    flight = self.flights.get(key, None)
+    if flight is None:
+      task = asyncio.ensure_future(search())
+      task.add_done_callback(lambda t: self.__land(key, t))
+      self.flights[key] = (task, 1)
+      self.executed += 1
+    else:
+      task, waiters = flight
+      self.flights[key] = (task, waiters + 1)
+      self.coalesced += 1
+      self.max_waiters = max(self.max_waiters, waiters + 1)
+
+    try:
+      # the other callers' search isn't cancelled with this caller
+      return await asyncio.shield(task)
+    except asyncio.CancelledError:
+      self.__leave(key, task)
+      raise
+
+  def __leave(self, key: str, task: asyncio.Task):
+    flight = self.flights.get(key, None)
+    if flight is None or flight[0] is not task:
+      return
+    waiters = flight[1] - 1
+    if waiters > 0:
+      self.flights[key] = (task, waiters)
+      return
+
+    del self.flights[key]
+    if not task.done():
+      task.cancel()
+      self.cancelled += 1
+
+  def __land(self, key: str, task: asyncio.Task):
+    flight = self.flights.get(key, None)
+    if flight is not None and flight[0] is task:
+      del self.flights[key]
+    if not task.cancelled():
+      # retrieved, so it isn't reported as never retrieved if every caller left
+      task.exception()
+
+  def stats(self) -> dict:
+    return {
+      "in_flight": len(self.flights),
+      "executed": self.executed,
+      "coalesced": self.coalesced,
+      "cancelled": self.cancelled,
+      "max_waiters": self.max_waiters,
+    }
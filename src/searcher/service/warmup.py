@@ -0,0 +1,163 @@
+from ..dto.article_query import ArticleQuery, ArticleQueryType
+from ..dto.article_facet_query import ArticleFacetQuery
+from ..dto.article_histogram_query import ArticleHistogramQuery
+from ..dto.topic_query import TopicQuery
+from ..dto.topic_batch_query import TopicBatchQuery
+from ..dto.category_query import CategoryQuery
+from ..dto.exceptions import QueryValidationException
+from .search import SearchService
+from ..utils import log_utils
+from datetime import datetime, timezone
+import logging
+import asyncio
+import json
+import time
+
+
+# kind of the recorded query -> its query model, and the SearchService method replaying it
+# the kinds are the same as the ones of the result cache keys
+WARMUP_KINDS = {
+  "articles": (ArticleQuery, SearchService.search_articles),
+  "articles-count": (ArticleQuery, SearchService.count_articles),
+  "articles-facets": (ArticleFacetQuery, SearchService.facet_articles),
+  "articles-histogram": (ArticleHistogramQuery, SearchService.histogram_articles),
+  "topics": (TopicQuery, SearchService.search_topics),
+  "topics-count": (TopicQuery, SearchService.count_topics),
+  "topic-batches": (TopicBatchQuery, SearchService.search_topic_batches),
+  "topic-batches-count": (TopicBatchQuery, SearchService.count_topic_batches),
+  "categories": (CategoryQuery, SearchService.search_categories),
+}
+
+
+class SearchWarmup:
+  """
+  Replays the most frequent recent queries through the SearchService after startup,
+  so the first real requests find the Elasticsearch caches, the embeddings model and the service's caches warm.
+  The queries are read from a JSON lines file, most frequent first, e.g.
+  {"kind": "articles", "query": {"query": "election", "search_type": "semantic"}}
+  where 'query' has the fields of the kind's query model, the omitted ones get their defaults, like in the API.
+  Readiness waits for the warm-up, which stops after 'timeout_seconds' in any case.
+  """
+
+  def __init__(
+      self,
+      search_service: SearchService,
+      path: str,
+      concurrency: int = 4,
+      max_queries: int | None = None,
+      timeout_seconds: float = 120,
+      log_level: int = logging.INFO
+  ):
+    self.log = log_utils.create_console_logger(
+      name=self.__class__.__name__,
+      level=log_level
+    )
+    self.search_service = search_service
+    self.path = path
+    self.concurrency = concurrency
+    self.max_queries = max_queries
+    self.timeout_seconds = timeout_seconds
+
+    self.task: asyncio.Task | None = None
+    self.done = False
+    self.timed_out = False
+
+    self.queries = 0
+    self.replayed = 0
+    self.failed = 0
+    self.skipped = 0
+    self.seconds = 0.0
+    self.finished_at: datetime | None = None
+
+  def start(self):
+    self.task = asyncio.create_task(self.__run_with_timeout())
+
+  async def __run_with_timeout(self):
+    start = time.perf_counter()
+    try:
+      await asyncio.wait_for(self.run(), timeout=self.timeout_seconds)
+    except asyncio.TimeoutError:
+      self.timed_out = True
+      self.log.warning(f"stopped the warm-up after {self.timeout_seconds:.0f}s")
+    except Exception as e:
+      # a failed warm-up only means cold caches, it doesn't keep the service from being ready
+      self.log.error("failed to warm up", exc_info=e)
+    finally:
+      self.seconds = time.perf_counter() - start
+      self.finished_at = datetime.now(timezone.utc)
+      self.done = True
+
+    self.log.info(
+      f"warmed up with {self.replayed} of {self.queries} queries in {self.seconds:.3f}s, "
+      f"{self.failed} failed, {self.skipped} skipped"
+    )
+
+  def read_queries(self) -> list[tuple[str, object]]:
+    queries = []
+    with open(self.path) as f:
+      for line_number, line in enumerate(f, start=1):
+        if self.max_queries is not None and len(queries) >= self.max_queries:
+          break
+        if line.strip() == "":
+          continue
+        try:
+          record = json.loads(line)
+          query_model, _ = WARMUP_KINDS[record["kind"]]
+          queries.append((record["kind"], query_model(**record.get("query", {}))))
+        except (ValueError, KeyError, TypeError, QueryValidationException) as e:
+          # not JSON, an unknown kind, or an invalid query, pydantic's ValidationError is a ValueError
+          self.skipped += 1
+          self.log.warning(f"skipping line {line_number} of {self.path}: {e!r}")
+    return queries
+
+  async def run(self):
+    queries = self.read_queries()
+    self.queries = len(queries)
+    self.log.info(f"warming up with {self.queries} queries from {self.path}, {self.concurrency} at a time")
+
+    semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def replay(kind: str, query):
+      if self.__needs_embeddings(kind, query):
+        # the model can still be loading in the background, the other queries don't wait for it
+        while not self.search_service.em.ready:
+          await asyncio.sleep(0.1)
+      async with semaphore:
+        await self.__replay(kind, query)
+
+    await asyncio.gather(*[replay(kind, query) for kind, query in queries])
+
+  async def __replay(self, kind: str, query):
+    _, method = WARMUP_KINDS[kind]
+    try:
+      await method(self.search_service, query)
+      self.replayed += 1
+    except asyncio.CancelledError:
+      raise
+    except Exception as e:
+      self.failed += 1
+      self.log.warning(f"failed to replay a '{kind}' query: {e!r}")
+
+  def __needs_embeddings(self, kind: str, query) -> bool:
+    return kind == "articles" and query.search_type != ArticleQueryType.text
+
+  async def close(self):
+    if self.task is not None:
+      self.task.cancel()
+      try:
+        await self.task
+      except asyncio.CancelledError:
+        pass
+      self.task = None
+
+  def stats(self) -> dict:
+    return {
+      "done": self.done,
+      "timed_out": self.timed_out,
+      "queries": self.queries,
+      "replayed": self.replayed,
+      "failed": self.failed,
+      "skipped": self.skipped,
+      "seconds": self.seconds,
+      "finished_at": self.finished_at.isoformat() if self.finished_at is not None else None,
+    }
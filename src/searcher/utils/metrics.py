@@ -0,0 +1,158 @@
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from typing import Awaitable, Callable
+import time
+
+# Prometheus metrics of the service, exposed on '/metrics'.
+# Recording is a lock and a few additions per observation, the label values are bound once where possible,
+# the cache counters are only read from the components' stats when scraped.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram(
+  "searcher_request_seconds",
+  "Time to handle an HTTP request, by route.",
+  ["method", "route"],
+  buckets=LATENCY_BUCKETS,
+)
+REQUEST_ERRORS = Counter(
+  "searcher_request_errors_total",
+  "HTTP responses with a 4xx or 5xx status, by route.",
+  ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+  "searcher_requests_in_flight",
+  "HTTP requests being handled.",
+)
+
+STAGE_SECONDS = Histogram(
+  "searcher_stage_seconds",
+  "Time spent in a stage of the searches.",
+  ["stage"],
+  buckets=LATENCY_BUCKETS,
+)
+# building the query models from the request parameters
+VALIDATION_SECONDS = STAGE_SECONDS.labels(stage="validation")
+# a batch of the embeddings model, in its worker thread
+ENCODE_SECONDS = STAGE_SECONDS.labels(stage="encode")
+# reciprocal rank fusion of the combined searches fused in the service
+RRF_SECONDS = STAGE_SECONDS.labels(stage="rrf")
+# domain objects to the response models
+MAPPING_SECONDS = STAGE_SECONDS.labels(stage="mapping")
+
+ES_REQUEST_SECONDS = Histogram(
+  "searcher_es_request_seconds",
+  "Round trip of an Elasticsearch request, measured by the client.",
+  ["operation"],
+  buckets=LATENCY_BUCKETS,
+)
+ES_TOOK_SECONDS = Histogram(
+  "searcher_es_took_seconds",
+  "Time of an Elasticsearch request reported by Elasticsearch ('took'), without the transport and queueing.",
+  ["operation"],
+  buckets=LATENCY_BUCKETS,
+)
+ES_ERRORS = Counter(
+  "searcher_es_errors_total",
+  "Failed Elasticsearch requests.",
+  ["operation"],
+)
+
+
+async def observe_es(operation: str, request: Awaitable):
+  """Awaits an Elasticsearch request, and records its round trip, and its 'took' if the response has one."""
+  start = time.perf_counter()
+  try:
+    res = await request
+  except Exception:
+    ES_ERRORS.labels(operation).inc()
+    raise
+  finally:
+    ES_REQUEST_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+  if "took" in res:
+    ES_TOOK_SECONDS.labels(operation).observe(res["took"] / 1000)
+  return res
+
+
+class MetricsMiddleware:
+  """
+  ASGI middleware recording the latency, the errors and the number of in-flight HTTP requests.
+  The requests are labelled by their route's path template, not the requested path, so the label values are bounded.
+  """
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    status = 500
+
+    async def send_with_status(message):
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+      await send(message)
+
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+      await self.app(scope, receive, send_with_status)
+    finally:
+      seconds = time.perf_counter() - start
+      REQUESTS_IN_FLIGHT.dec()
+      # set by the router on the same scope, missing if no route matched
+      route = scope.get("route", None)
+      path = getattr(route, "path", "unmatched")
+      REQUEST_SECONDS.labels(scope["method"], path).observe(seconds)
+      if status >= 400:
+        REQUEST_ERRORS.labels(scope["method"], path, str(status)).inc()
+
+
+class StatsCollector:
+  """
+  Exposes the counters of the caches from the service's stats, read when the metrics are scraped,
+  so the caches don't record anything twice.
+  """
+
+  def __init__(self, stats: Callable[[], dict]):
+    self.stats = stats
+
+  def collect(self):
+    stats = self.stats()
+
+    result_cache = stats.get("result_cache", None)
+    if result_cache is not None:
+      yield self.__counter("searcher_result_cache_hits", "Searches served from the result cache.", result_cache["hits"])
+      yield self.__counter("searcher_result_cache_misses", "Searches not found in the result cache.", result_cache["misses"])
+      yield self.__counter("searcher_result_cache_evictions", "Results evicted from the result cache.", result_cache["evictions"])
+      yield self.__counter("searcher_result_cache_invalidations", "Results dropped because their index changed.", result_cache["invalidations"])
+      yield self.__gauge("searcher_result_cache_entries", "Results in the result cache.", result_cache["entries"])
+
+    embeddings_cache = stats.get("embeddings_cache", None)
+    if embeddings_cache is not None:
+      hits = CounterMetricFamily("searcher_embeddings_cache_hits", "Query embeddings found in the cache, by tier.", labels=["tier"])
+      hits.add_metric(["local"], embeddings_cache["local_hits"])
+      hits.add_metric(["redis"], embeddings_cache["redis_hits"])
+      yield hits
+      yield self.__counter("searcher_embeddings_cache_misses", "Query embeddings encoded by the model.", embeddings_cache["misses"])
+      yield self.__gauge("searcher_embeddings_cache_entries", "Query embeddings in the local cache.", embeddings_cache["entries"])
+
+    single_flight = stats.get("single_flight", None)
+    if single_flight is not None:
+      yield self.__counter("searcher_single_flight_executed", "Searches run by the single flight.", single_flight["executed"])
+      yield self.__counter("searcher_single_flight_coalesced", "Searches which waited for an identical one in flight.", single_flight["coalesced"])
+
+    embeddings = stats.get("embeddings", None)
+    if embeddings is not None:
+      yield self.__gauge("searcher_embeddings_queue_depth", "Query embeddings waiting for the model.", embeddings["queue_depth"])
+      yield self.__counter("searcher_embeddings_failed_batches", "Failed batches of the embeddings model.", embeddings["failed_batches"])
+
+  def __counter(self, name: str, documentation: str, value: float) -> CounterMetricFamily:
+    return CounterMetricFamily(name, documentation, value=value)
+
+  def __gauge(self, name: str, documentation: str, value: float) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, documentation, value=value)